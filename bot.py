@@ -3,6 +3,10 @@ from discord.ext import commands
 import asyncio
 import logging
 
+from db.async_database import AsyncDatabase
+from db.metrics import current_command
+from db.migrations import check_schema
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -70,11 +74,138 @@ async def reload(ctx, cog: str = None):
     else:
         await ctx.send("❌ Especifica un cog para recargar.")
 
+@bot.command()
+@commands.is_owner()
+async def dbstats(ctx):
+    """Muestra el uso del pool de conexiones (solo owner)"""
+    stats = bot.db.pool_stats()
+    embed = discord.Embed(title="🗄️ Pool de base de datos", color=0x3498db)
+    embed.add_field(name="🔌 Conexiones", value=f"{stats['open']}/{stats['max_size']} abiertas\n{stats['in_use']} en uso · {stats['idle']} libres", inline=True)
+    embed.add_field(name="📈 Pico de uso", value=f"{stats['peak_in_use']}", inline=True)
+    embed.add_field(name="🔄 Préstamos", value=f"{stats['acquisitions']:,}", inline=True)
+    embed.add_field(name="⏳ Esperas", value=f"{stats['waits']:,} (media {stats['avg_wait_ms']:.1f} ms)", inline=True)
+    embed.add_field(name="♻️ Abiertas / descartadas", value=f"{stats['opened']} / {stats['discarded']}", inline=True)
+
+    ledger = bot.db.ledger.stats()
+    embed.add_field(
+        name="🧾 Historial diferido",
+        value=f"{ledger['pending']} pendientes · {ledger['rows_written']:,} filas en {ledger['batches']:,} lotes\n"
+              f"{ledger['sync_flushes']} volcados síncronos · {ledger['dropped']} perdidas",
+        inline=False
+    )
+
+    cache = bot.db.balances.stats()
+    embed.add_field(
+        name="💾 Caché de balances",
+        value=f"{cache['size']:,}/{cache['max_size']:,} usuarios · {cache['hit_rate']:.0%} aciertos\n"
+              f"{cache['hits']:,} aciertos · {cache['misses']:,} fallos · {cache['evictions']:,} expulsados",
+        inline=False
+    )
+
+    top = bot.db.leaderboard.stats()
+    embed.add_field(
+        name="🏆 Leaderboard en memoria",
+        value=f"{top['size']:,} usuarios en {top['blocks']:,} bloques\n"
+              f"{top['updates']:,} actualizaciones · {top['resyncs']:,} resincronizaciones",
+        inline=False
+    )
+
+    sentencias = bot.db.statements.stats()
+    if sentencias:
+        embed.add_field(
+            name="🧩 Sentencias preparadas",
+            value="\n".join(
+                f"`{nombre}` {ejecuciones:,} usos · {preparadas} preparaciones · {reusadas:,} reutilizadas"
+                for nombre, (preparadas, ejecuciones, reusadas) in sentencias.items()
+            ),
+            inline=False
+        )
+    await ctx.send(embed=embed)
+
+@bot.before_invoke
+async def marcar_comando(ctx):
+    # Las consultas lentas del comando se registran con su nombre
+    current_command.set(f"!{ctx.command.qualified_name}")
+
+@bot.command()
+@commands.is_owner()
+async def dbqueries(ctx, accion: str = None):
+    """Latencias por consulta y consultas lentas (solo owner). `!dbqueries reset` reinicia"""
+    metrics = bot.db.metrics
+    if accion == "reset":
+        metrics.reset()
+        await ctx.send("✅ Métricas de consultas reiniciadas.")
+        return
+
+    lineas = [f"{'consulta':<22}{'n':>7}{'p50':>7}{'p95':>7}{'p99':>7}{'max':>8}{'filas':>7}{'err':>5}"]
+    for nombre, q in metrics.summary()[:15]:
+        lineas.append(
+            f"{nombre[:21]:<22}{q.count:>7}{q.percentile(50):>7.0f}{q.percentile(95):>7.0f}"
+            f"{q.percentile(99):>7.0f}{q.max_ms:>8.0f}{q.rows / q.count:>7.1f}{q.errors:>5}"
+        )
+    embed = discord.Embed(
+        title="⏱️ Consultas a la base de datos",
+        description="```\n" + "\n".join(lineas) + "\n```" if len(lineas) > 1 else "Sin consultas registradas.",
+        color=0x3498db
+    )
+
+    lentas = [
+        f"<t:{int(cuando)}:T> `{nombre}` {ms:.0f} ms · {comando}"
+        for cuando, nombre, ms, comando in reversed(metrics.slow_log)
+    ][:10]
+    embed.add_field(
+        name=f"🐢 Lentas (> {metrics.slow_ms:.0f} ms)",
+        value="\n".join(lentas) or "Ninguna",
+        inline=False
+    )
+    embed.set_footer(text="Tiempos en ms, ordenado por tiempo total · filas = media por llamada")
+    embed.timestamp = discord.utils.utcnow()
+    await ctx.send(embed=embed)
+
+@bot.command()
+@commands.is_owner()
+async def casastats(ctx, horas: int = 24):
+    """Apostado, pagado y ventaja de la casa por juego (solo owner)"""
+    horas = max(1, min(horas, 24 * 90))
+    filas = await bot.db.get_game_rollups(horas)
+
+    lineas = [f"{'juego':<14}{'jugadas':>9}{'apostado':>13}{'pagado':>13}{'casa':>8}{'jug/h':>7}"]
+    for fila in filas:
+        apostado, pagado = int(fila["wagered"]), int(fila["paid"])
+        ventaja = f"{(apostado - pagado) / apostado:.1%}" if apostado else "-"
+        lineas.append(
+            f"{(fila['game_type'] or '-')[:13]:<14}{int(fila['count']):>9,}{apostado:>13,}"
+            f"{pagado:>13,}{ventaja:>8}{fila['players']:>7}"
+        )
+    embed = discord.Embed(
+        title=f"🏦 Casa · últimas {horas} h",
+        description="```\n" + "\n".join(lineas) + "\n```" if filas else "Sin actividad registrada.",
+        color=0xf1c40f
+    )
+    embed.set_footer(text="casa = (apostado - pagado) / apostado · jug/h = máximo de jugadores distintos en una hora")
+    embed.timestamp = discord.utils.utcnow()
+    await ctx.send(embed=embed)
+
 async def main():
     async with bot:
-        await load_cogs()
-        from config import TOKEN
-        await bot.start(TOKEN)
+        # Un único servicio de base de datos para todos los cogs
+        bot.db = AsyncDatabase()
+        # Cada balance nuevo llega a los cogs como evento `on_balance_change`
+        bot.db.balance_listeners.append(
+            lambda user_id, anterior, nuevo: bot.dispatch("balance_change", user_id, anterior, nuevo)
+        )
+        try:
+            await check_schema(bot.db)
+            await bot.db.detect_schema()
+            await bot.db.purge_credit_operations()
+            await load_cogs()
+            await bot.db.load_known_users()
+            await bot.db.start_leaderboard()
+            await bot.db.load_user_names()
+            from config import TOKEN
+            await bot.start(TOKEN)
+        finally:
+            await bot.db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,16 +1,16 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 from game.blackjack_game import BlackjackGame
+from db.async_database import BlackjackHand
 from config import MIN_BET, MAX_BET
-
-db = Database()
 games = {}
 
-class BlackjackView(View):
-    def __init__(self, game, user_id, author_name, message_id):
+class BlackjackView(CasinoView):
+    def __init__(self, db, game, user_id, author_name, message_id):
         super().__init__(timeout=60.0)
+        self.db = db
         self.game = game
         self.user_id = user_id
         self.author_name = author_name
@@ -27,13 +27,18 @@ class BlackjackView(View):
             return False
         return True
     
+    @property
+    def settle_key(self) -> str:
+        # Una sola liquidación por partida aunque lleguen clics repetidos
+        return f"blackjack:{self.message_id}"
+
     async def on_timeout(self):
         game_key = f"{self.user_id}_{self.message_id}"
         if game_key in games:
             game = games[game_key]
             if not game.finished:
-                db.update_credits(self.user_id, -game.bet, "loss", "blackjack", "Timeout")
-            del games[game_key]
+                await self.db.settle_bet(self.user_id, game.bet, 0, "blackjack", "Timeout", idempotency_key=self.settle_key)
+            games.pop(game_key, None)
     
     def update_buttons_state(self):
         """Actualiza el estado de todos los botones basado en el juego actual"""
@@ -83,9 +88,13 @@ class BlackjackView(View):
                             usos_restantes = gacha_cog.bonos_activos[self.user_id]["multiplicador"]["usos_restantes"]
                             game.usos_restantes = usos_restantes
             
-            db.update_credits(self.user_id, game.payout, "loss" if game.payout < 0 else "win", "blackjack", f"Blackjack: {result}")
-            db.save_blackjack_game(self.user_id, game.bet, game.result, game.payout, game.player_hand, game.dealer_hand)
-            del games[game_key]
+            _, repetida = await self.db.settle_bet(self.user_id, game.bet, game.bet + game.payout, "blackjack", f"Blackjack: {result}",
+                                                   idempotency_key=self.settle_key, hand=BlackjackHand(game.result, game.payout, game.player_hand, game.dealer_hand))
+            games.pop(game_key, None)
+            if repetida:
+                # Otro clic ya liquidó la partida con su propio resultado
+                await interaction.response.send_message("❌ Esta partida ya terminó.", ephemeral=True)
+                return
             
             embed = self.create_game_embed(state, "💥 Te has pasado!")
             embed.add_field(name="Resultado", value=f"Has perdido {abs(game.payout):,} créditos", inline=False)
@@ -123,9 +132,13 @@ class BlackjackView(View):
                         usos_restantes = gacha_cog.bonos_activos[self.user_id]["multiplicador"]["usos_restantes"]
                         game.usos_restantes = usos_restantes
         
-        db.update_credits(self.user_id, game.payout, "win" if game.payout > 0 else "loss" if game.payout < 0 else "draw", "blackjack", f"Blackjack: {result}")
-        db.save_blackjack_game(self.user_id, game.bet, game.result, game.payout, game.player_hand, game.dealer_hand)
-        del games[game_key]
+        _, repetida = await self.db.settle_bet(self.user_id, game.bet, game.bet + game.payout, "blackjack", f"Blackjack: {result}",
+                                               idempotency_key=self.settle_key, hand=BlackjackHand(game.result, game.payout, game.player_hand, game.dealer_hand))
+        games.pop(game_key, None)
+        if repetida:
+            # Otro clic ya liquidó la partida con su propio resultado
+            await interaction.response.send_message("❌ Esta partida ya terminó.", ephemeral=True)
+            return
         
         result_text = self.get_result_text(game)
         
@@ -155,18 +168,27 @@ class BlackjackView(View):
             await interaction.response.send_message("❌ Solo puedes doblar en tu primera jugada con 2 cartas.", ephemeral=True)
             return
         
-        credits = db.get_credits(self.user_id)
-        if game.bet * 2 > credits:
+        # Reservar la segunda mitad de la apuesta doblada
+        aceptada, _, repetida = await self.db.place_bet(self.user_id, game.bet, idempotency_key=f"{self.settle_key}:doble")
+        if not aceptada:
             await interaction.response.send_message("❌ No tienes suficientes créditos para doblar.", ephemeral=True)
             return
+        if repetida:
+            # Clic repetido: la apuesta ya se dobló con el primero
+            await interaction.response.send_message("❌ Ya doblaste esta apuesta.", ephemeral=True)
+            return
         
         result, value = game.player_double_down()
         state = game.get_game_state()
         
         if result == "bust":
-            db.update_credits(self.user_id, game.payout, "loss", "blackjack", "Blackjack: double bust")
-            db.save_blackjack_game(self.user_id, game.bet, game.result, game.payout, game.player_hand, game.dealer_hand)
-            del games[game_key]
+            _, repetida = await self.db.settle_bet(self.user_id, game.bet, 0, "blackjack", "Blackjack: double bust",
+                                                   idempotency_key=self.settle_key, hand=BlackjackHand(game.result, game.payout, game.player_hand, game.dealer_hand))
+            games.pop(game_key, None)
+            if repetida:
+                # Otro clic ya liquidó la partida con su propio resultado
+                await interaction.response.send_message("❌ Esta partida ya terminó.", ephemeral=True)
+                return
             
             embed = self.create_game_embed(state, "💥 Te has pasado!")
             embed.add_field(name="Resultado", value=f"Has perdido {abs(game.payout):,} créditos", inline=False)
@@ -191,9 +213,13 @@ class BlackjackView(View):
                             usos_restantes = gacha_cog.bonos_activos[self.user_id]["multiplicador"]["usos_restantes"]
                             game.usos_restantes = usos_restantes
             
-            db.update_credits(self.user_id, game.payout, "win" if game.payout > 0 else "loss", "blackjack", f"Blackjack: double {result}")
-            db.save_blackjack_game(self.user_id, game.bet, game.result, game.payout, game.player_hand, game.dealer_hand)
-            del games[game_key]
+            _, repetida = await self.db.settle_bet(self.user_id, game.bet, game.bet + game.payout, "blackjack", f"Blackjack: double {result}",
+                                                   idempotency_key=self.settle_key, hand=BlackjackHand(game.result, game.payout, game.player_hand, game.dealer_hand))
+            games.pop(game_key, None)
+            if repetida:
+                # Otro clic ya liquidó la partida con su propio resultado
+                await interaction.response.send_message("❌ Esta partida ya terminó.", ephemeral=True)
+                return
             
             result_text = self.get_result_text(game)
             embed = self.create_game_embed(state, "🏁 Partida Terminada - Doble Apuesta")
@@ -223,9 +249,13 @@ class BlackjackView(View):
             return
         
         refund = game.bet // 2
-        db.update_credits(self.user_id, -refund, "loss", "blackjack", "Blackjack: surrender")
-        db.save_blackjack_game(self.user_id, game.bet, "surrender", -refund, game.player_hand, game.dealer_hand)
-        del games[game_key]
+        _, repetida = await self.db.settle_bet(self.user_id, game.bet, game.bet - refund, "blackjack", "Blackjack: surrender",
+                                               idempotency_key=self.settle_key, hand=BlackjackHand("surrender", -refund, game.player_hand, game.dealer_hand))
+        games.pop(game_key, None)
+        if repetida:
+            # Otro clic ya liquidó la partida con su propio resultado
+            await interaction.response.send_message("❌ Esta partida ya terminó.", ephemeral=True)
+            return
         
         await interaction.response.edit_message(
             content=f"🏳️ {interaction.user.mention} te has rendido. Recuperas **{refund}** créditos de tu apuesta de {game.bet}.",
@@ -334,6 +364,7 @@ class BlackjackView(View):
 class Blackjack(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     @commands.command(name="blackjack", aliases=["bj", "21"])
     async def blackjack(self, ctx, bet: int = None):
@@ -365,21 +396,27 @@ class Blackjack(commands.Cog):
             await ctx.send(f"❌ Apuesta máxima: {MAX_BET:,} créditos")
             return
         
-        credits = db.get_credits(user_id)
-        if bet > credits:
+        # Reservar la apuesta (se liquida al terminar la partida)
+        aceptada, credits, _ = await self.db.place_bet(user_id, bet)
+        if not aceptada:
             await ctx.send(f"❌ No tienes suficientes créditos. Tu balance: {credits:,}")
             return
         
-        # Crear nueva partida
-        game = BlackjackGame(bet, user_id)
-        
-        # Enviar mensaje primero para obtener el ID
-        state = game.get_game_state()
-        view = BlackjackView(game, user_id, ctx.author.display_name, "temp")
-        view.bot = self.bot  # Pasar referencia del bot al view
-        
-        embed = view.create_game_embed(state, "Nueva Partida de Blackjack")
-        message = await ctx.send(embed=embed, view=view)
+        try:
+            # Crear nueva partida
+            game = BlackjackGame(bet, user_id)
+            
+            # Enviar mensaje primero para obtener el ID
+            state = game.get_game_state()
+            view = BlackjackView(self.db, game, user_id, ctx.author.display_name, "temp")
+            view.bot = self.bot  # Pasar referencia del bot al view
+            
+            embed = view.create_game_embed(state, "Nueva Partida de Blackjack")
+            message = await ctx.send(embed=embed, view=view)
+        except Exception:
+            # Sin mensaje no hay partida que liquide la apuesta: se devuelve
+            await self.db.settle_bet(user_id, bet, bet, "blackjack", "Blackjack: devolución (no se pudo iniciar)")
+            raise
         
         # Actualizar el view con el message_id real y guardar el juego
         view.message_id = message.id
@@ -426,5 +463,32 @@ class Blackjack(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @commands.command(name="bjhistorial", aliases=["bjhist"])
+    async def bjhistorial(self, ctx, cantidad: int = 10):
+        """Muestra tus últimas manos de blackjack"""
+        cantidad = max(1, min(cantidad, 20))
+        manos = await self.db.get_blackjack_history(ctx.author.id, cantidad)
+
+        if not manos:
+            await ctx.send("❌ Todavía no has jugado ninguna partida de Blackjack.")
+            return
+
+        emojis = {"win": "✅", "blackjack": "🃏", "push": "🤝", "loss": "❌", "surrender": "🏳️"}
+        lineas = []
+        for mano in manos:
+            emoji = emojis.get(mano["result"], "▫️")
+            lineas.append(
+                f"{emoji} `{' '.join(mano['player_hand'])}` vs `{' '.join(mano['dealer_hand'])}` · "
+                f"apuesta {mano['bet_amount']:,} · {mano['payout']:+,}"
+            )
+
+        embed = discord.Embed(
+            title=f"🃏 Últimas {len(manos)} manos de {ctx.author.display_name}",
+            description="\n".join(lineas),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text="Tu mano vs la de la banca · resultado en créditos")
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Blackjack(bot))
\ No newline at end of file
@@ -1,18 +1,17 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 import random
 import asyncio
 
-db = Database()
-
 # Diccionario para carreras activas
 carreras_activas = {}
 
-class CarreraView(View):
-    def __init__(self, carrera_id, creador_id):
+class CarreraView(CasinoView):
+    def __init__(self, db, carrera_id, creador_id):
         super().__init__(timeout=120.0)  # 2 minutos para unirse
+        self.db = db
         self.carrera_id = carrera_id
         self.creador_id = creador_id
     
@@ -39,7 +38,7 @@ class CarreraView(View):
             return
         
         # Verificar créditos
-        credits = db.get_credits(interaction.user.id)
+        credits = await self.db.get_credits(interaction.user.id)
         if credits < carrera['apuesta']:
             await interaction.response.send_message(f"❌ No tienes suficientes créditos. Necesitas: {carrera['apuesta']:,}", ephemeral=True)
             return
@@ -82,7 +81,7 @@ class CarreraView(View):
         
         # Cobrar apuestas a todos los jugadores
         for jugador_id in list(carrera['jugadores'].keys()):
-            db.update_credits(jugador_id, -carrera['apuesta'], "bet", "carrera", "Apuesta carrera de buses")
+            await self.db.update_credits(jugador_id, -carrera['apuesta'], "bet", "carrera", "Apuesta carrera de buses")
             carrera['jugadores'][jugador_id]['apostado'] = True
         
         # Iniciar carrera
@@ -232,7 +231,7 @@ class CarreraView(View):
             premio = carrera['apuesta'] * len(carrera['jugadores'])
             
             # Pagar al ganador
-            db.update_credits(ganador_id, premio, "win", "carrera", f"Ganó carrera de buses")
+            await self.db.update_credits(ganador_id, premio, "win", "carrera", f"Ganó carrera de buses")
             
             embed = discord.Embed(
                 title="🏆 **¡TENEMOS GANADOR!** 🏆",
@@ -282,6 +281,7 @@ class CarreraView(View):
 class Carrera(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     @commands.command(name="carrera", aliases=["race", "buses"])
     async def carrera(self, ctx, apuesta: int = None):
@@ -321,7 +321,7 @@ class Carrera(commands.Cog):
             return
         
         # Verificar créditos del creador
-        credits = db.get_credits(ctx.author.id)
+        credits = await self.db.get_credits(ctx.author.id)
         if credits < apuesta:
             await ctx.send(f"❌ No tienes suficientes créditos. Necesitas: {apuesta:,}")
             return
@@ -346,7 +346,7 @@ class Carrera(commands.Cog):
         }
         
         # Crear view y embed
-        view = CarreraView(carrera_id, ctx.author.id)
+        view = CarreraView(self.db, carrera_id, ctx.author.id)
         embed = view.crear_embed_carrera(carreras_activas[carrera_id])
         
         message = await ctx.send(embed=embed, view=view)
@@ -1,13 +1,11 @@
 import discord
 from discord.ext import commands
 import random
-from db.database import Database
-
-db = Database()
 
 class Dados(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     @commands.command(name="dados", aliases=["craps"])
     async def dados(self, ctx, bet: int = None):
@@ -28,8 +26,9 @@ class Dados(commands.Cog):
             await ctx.send("❌ Apuesta mínima: 10 créditos")
             return
 
-        credits = db.get_credits(ctx.author.id)
-        if bet > credits:
+        # Reservar la apuesta (solo se descuenta si hay saldo)
+        aceptada, credits, _ = await self.db.place_bet(ctx.author.id, bet)
+        if not aceptada:
             await ctx.send(f"❌ No tienes suficientes créditos. Balance: {credits:,}")
             return
 
@@ -78,9 +77,9 @@ class Dados(commands.Cog):
             ganancia_base = 0
             ganancia_final = 0
 
-        # Actualizar créditos en la base de datos
-        db.update_credits(ctx.author.id, ganancia_neto, "win" if gano else "loss", "dados", 
-                         f"Dados: {dado1}+{dado2}={total}")
+        # Liquidar la apuesta en la base de datos
+        balance_nuevo, _ = await self.db.settle_bet(ctx.author.id, bet, bet + ganancia_neto, "dados",
+                                                 f"Dados: {dado1}+{dado2}={total}")
 
         # Crear embed
         embed = discord.Embed(
@@ -104,7 +103,7 @@ class Dados(commands.Cog):
         else:
             embed.add_field(name="💸 Pérdida", value=f"**-{bet:,}** créditos", inline=True)
             
-        embed.add_field(name="💳 Balance nuevo", value=f"**{db.get_credits(ctx.author.id):,}** créditos", inline=True)
+        embed.add_field(name="💳 Balance nuevo", value=f"**{balance_nuevo:,}** créditos", inline=True)
         
         # Mostrar información del multiplicador si está activo
         if multiplicador_gacha > 1.0 and gano:
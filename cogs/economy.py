@@ -1,34 +1,98 @@
 import discord
 from discord.ext import commands
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 from config import STARTING_CREDITS, RANGOS, BONOS_RANGO
+from db.async_database import CreditLeg
+from game.rangos import rango_para
 import time
 import random
 import asyncio
-
-db = Database()
+import csv
+import io
+import tempfile
 
 # Diccionario para guardar los últimos daily de cada usuario
 last_daily = {}
 
+class HistorialView(CasinoView):
+    """Historial de transacciones paginado con botones, de lo más reciente a lo más antiguo"""
+
+    POR_PAGINA = 10
+
+    def __init__(self, db, user, filas):
+        super().__init__(timeout=120.0)
+        self.db = db
+        self.user = user
+        self.filas = filas  # POR_PAGINA + 1 filas: la extra indica si hay otra página
+        self.inicio = None  # before_id de la página actual (None = la más reciente)
+        self.anteriores = []  # before_id de las páginas ya vistas, para volver
+        self.message = None
+        self.actualizar_botones()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user.id
+
+    def actualizar_botones(self):
+        self.recientes_button.disabled = not self.anteriores
+        self.antiguas_button.disabled = len(self.filas) <= self.POR_PAGINA
+
+    def crear_embed(self) -> discord.Embed:
+        lineas = []
+        for fila in self.filas[:self.POR_PAGINA]:
+            emoji = "🟢" if fila["amount"] > 0 else "🔴" if fila["amount"] < 0 else "⚪"
+            detalle = fila["details"][:50] if fila["details"] else fila["type"]
+            lineas.append(
+                f"`{fila['created_at']:%d/%m %H:%M}` {emoji} **{fila['amount']:+,}** · "
+                f"{fila['game_type'] or fila['type']} · {detalle}"
+            )
+
+        embed = discord.Embed(
+            title=f"📜 Historial de {self.user.display_name}",
+            description="\n".join(lineas),
+            color=0x3498db
+        )
+        embed.set_footer(text=f"Página {len(self.anteriores) + 1} · {self.POR_PAGINA} movimientos por página")
+        return embed
+
+    async def mostrar(self, interaction: discord.Interaction, inicio):
+        self.inicio = inicio
+        self.filas = await self.db.get_transactions(self.user.id, before_id=inicio, limit=self.POR_PAGINA + 1)
+        self.actualizar_botones()
+        await interaction.response.edit_message(embed=self.crear_embed(), view=self)
+
+    @discord.ui.button(label="Más recientes", style=discord.ButtonStyle.secondary, emoji="⬅️")
+    async def recientes_button(self, interaction: discord.Interaction, button: Button):
+        await self.mostrar(interaction, self.anteriores.pop())
+
+    @discord.ui.button(label="Más antiguas", style=discord.ButtonStyle.secondary, emoji="➡️")
+    async def antiguas_button(self, interaction: discord.Interaction, button: Button):
+        self.anteriores.append(self.inicio)
+        # La siguiente página empieza después del último movimiento mostrado
+        await self.mostrar(interaction, self.filas[self.POR_PAGINA - 1]["id"])
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     def calcular_rango(self, creditos: int) -> int:
         """Calcula el rango basado en los créditos"""
-        rango_actual = 0
-        for rango_id, datos in RANGOS.items():
-            if creditos >= datos["min_creditos"]:
-                rango_actual = rango_id
-            else:
-                break
-        return rango_actual
+        return rango_para(creditos)
 
     @commands.command(name="balance", aliases=["bal", "credits"])
     async def balance(self, ctx):
         """Muestra el balance de créditos del usuario"""
-        credits = db.get_credits(ctx.author.id)
+        credits = await self.db.get_credits(ctx.author.id)
         rango_actual = self.calcular_rango(credits)
         rango_info = RANGOS[rango_actual]
         
@@ -53,7 +117,7 @@ class Economy(commands.Cog):
     @commands.command(name="stats")
     async def stats(self, ctx):
         """Muestra las estadísticas del usuario"""
-        stats = db.get_user_stats(ctx.author.id)
+        stats = await self.db.get_user_stats(ctx.author.id)
         
         if stats:
             win_rate = (stats['games_won'] / stats['games_played'] * 100) if stats['games_played'] > 0 else 0
@@ -93,7 +157,7 @@ class Economy(commands.Cog):
         current_time = time.time()
         
         # Obtener créditos actuales y calcular rango
-        credits = db.get_credits(user_id)
+        credits = await self.db.get_credits(user_id)
         rango_actual = self.calcular_rango(credits)
         
         # Calcular daily base + bono de rango
@@ -116,10 +180,11 @@ class Economy(commands.Cog):
                 return
         
         # Dar los créditos diarios
-        db.update_credits(user_id, daily_total, "bonus", "daily", f"Recompensa diaria + bono rango {rango_actual}")
+        await self.db.update_credits(user_id, daily_total, "bonus", "daily", f"Recompensa diaria + bono rango {rango_actual}")
         last_daily[user_id] = current_time
         
         rango_info = RANGOS[rango_actual]
+        balance_actual = await self.db.get_credits(user_id)
         
         embed = discord.Embed(
             title="🎁 Recompensa Diaria",
@@ -132,7 +197,7 @@ class Economy(commands.Cog):
             embed.add_field(name="🎁 Bono de rango", value=f"**+{bono_rango}** créditos", inline=True)
         
         embed.add_field(name="💰 Total obtenido", value=f"**+{daily_total}** créditos", inline=True)
-        embed.add_field(name="💳 Balance actual", value=f"**{db.get_credits(user_id):,}** créditos", inline=False)
+        embed.add_field(name="💳 Balance actual", value=f"**{balance_actual:,}** créditos", inline=False)
         embed.add_field(name="🎯 Tu rango", value=f"**{rango_info['nombre']}**", inline=True)
         embed.add_field(name="⏰ Próximo daily", value="En 24 horas", inline=True)
         
@@ -161,19 +226,24 @@ class Economy(commands.Cog):
             await ctx.send("❌ No puedes transferirte créditos a ti mismo.")
             return
         
-        sender_credits = db.get_credits(ctx.author.id)
+        sender_credits = await self.db.get_credits(ctx.author.id)
         if amount > sender_credits:
             await ctx.send(f"❌ No tienes suficientes créditos. Tu balance: {sender_credits:,}")
             return
         
         # Aplicar multiplicador de rango si es ganancia para el receptor
-        rango_receptor = self.calcular_rango(db.get_credits(member.id))
+        rango_receptor = self.calcular_rango(await self.db.get_credits(member.id))
         multiplicador = BONOS_RANGO.get(rango_receptor, {"multiplicador_ganancias": 1.0})["multiplicador_ganancias"]
         cantidad_final = int(amount * multiplicador) if multiplicador > 1.0 else amount
         
-        # Realizar transferencia
-        db.update_credits(ctx.author.id, -amount, "transfer", "transfer", f"Transferido a {member.display_name}")
-        db.update_credits(member.id, cantidad_final, "transfer", "transfer", f"Recibido de {ctx.author.display_name}")
+        # Realizar transferencia (ambos lados en una sola transacción)
+        balances = await self.db.move_credits([
+            CreditLeg(ctx.author.id, -amount, "transfer", "transfer", f"Transferido a {member.display_name}"),
+            CreditLeg(member.id, cantidad_final, "transfer", "transfer", f"Recibido de {ctx.author.display_name}"),
+        ], check_funds=True)
+        if balances is None:
+            await ctx.send("❌ No tienes suficientes créditos para esta transferencia.")
+            return
         
         embed = discord.Embed(
             title="💸 Transferencia Exitosa",
@@ -186,7 +256,7 @@ class Economy(commands.Cog):
         if cantidad_final > amount:
             embed.add_field(name="🎁 Bono de Rango", value=f"Recibido: {cantidad_final:,} créditos (+{int((multiplicador-1)*100)}%)", inline=True)
         
-        embed.add_field(name="Tu nuevo balance", value=f"{db.get_credits(ctx.author.id):,} créditos", inline=False)
+        embed.add_field(name="Tu nuevo balance", value=f"{balances[ctx.author.id]:,} créditos", inline=False)
         
         await ctx.send(embed=embed)
 
@@ -198,8 +268,8 @@ class Economy(commands.Cog):
             await ctx.send("❌ No puedes robarte a ti mismo.")
             return
 
-        robber_credits = db.get_credits(ctx.author.id)
-        target_credits = db.get_credits(member.id)
+        robber_credits = await self.db.get_credits(ctx.author.id)
+        target_credits = await self.db.get_credits(member.id)
 
         if target_credits < 100:
             await ctx.send("❌ El usuario objetivo no tiene suficientes créditos.")
@@ -222,8 +292,10 @@ class Economy(commands.Cog):
 
         if success:
             # Robo exitoso
-            db.update_credits(ctx.author.id, amount_final, "bonus", "rob", f"Robado a {member.display_name}")
-            db.update_credits(member.id, -actual_rob_amount, "loss", "rob", f"Robado por {ctx.author.display_name}")
+            await self.db.move_credits([
+                CreditLeg(ctx.author.id, amount_final, "bonus", "rob", f"Robado a {member.display_name}"),
+                CreditLeg(member.id, -actual_rob_amount, "loss", "rob", f"Robado por {ctx.author.display_name}"),
+            ])
 
             embed = discord.Embed(
                 title="🎭 ¡Robo Exitoso!",
@@ -241,8 +313,10 @@ class Economy(commands.Cog):
         else:
             # Robo fallido
             fine_amount = int(max_rob_amount)
-            db.update_credits(ctx.author.id, -fine_amount, "loss", "rob", f"Intento fallido contra {member.display_name}")
-            db.update_credits(member.id, fine_amount, "bonus", "rob", f"Defendió un robo de {ctx.author.display_name}")
+            await self.db.move_credits([
+                CreditLeg(ctx.author.id, -fine_amount, "loss", "rob", f"Intento fallido contra {member.display_name}"),
+                CreditLeg(member.id, fine_amount, "bonus", "rob", f"Defendió un robo de {ctx.author.display_name}"),
+            ])
 
             embed = discord.Embed(
                 title="🚨 ¡Robo Fallido!",
@@ -279,6 +353,53 @@ class Economy(commands.Cog):
         embed.set_footer(text="Tu rango se actualiza automáticamente al ganar créditos")
         await ctx.send(embed=embed)
 
+    @commands.command(name="historial", aliases=["movimientos"])
+    async def historial(self, ctx):
+        """Muestra tus últimos movimientos de créditos"""
+        # Que aparezcan también sus jugadas que el ledger aún no ha escrito
+        if self.db.ledger.has_pending(ctx.author.id):
+            await self.db.ledger.flush()
+        filas = await self.db.get_transactions(ctx.author.id, limit=HistorialView.POR_PAGINA + 1)
+        if not filas:
+            await ctx.send("❌ Todavía no tienes movimientos registrados.")
+            return
+
+        view = HistorialView(self.db, ctx.author, filas)
+        view.message = await ctx.send(embed=view.crear_embed(), view=view)
+
+    @commands.command(name="exportarhistorial")
+    @commands.is_owner()
+    async def exportar_historial(self, ctx, member: discord.User):
+        """Envía el historial completo de un usuario en CSV (solo owner)"""
+        if self.db.ledger.has_pending(member.id):
+            await self.db.ledger.flush()
+        filas = 0
+        # El CSV se escribe a un archivo temporal por bloques, sin cargarlo entero en memoria
+        with tempfile.TemporaryFile() as archivo:
+            texto = io.TextIOWrapper(archivo, encoding="utf-8", newline="")
+            writer = csv.writer(texto)
+            writer.writerow(["id", "created_at", "type", "amount", "game_type", "details"])
+            async for fila in self.db.iter_transactions(member.id):
+                writer.writerow(fila)
+                filas += 1
+            texto.flush()
+            texto.detach()
+
+            if not filas:
+                await ctx.send(f"❌ {member.display_name} no tiene movimientos registrados.")
+                return
+
+            limite = ctx.guild.filesize_limit if ctx.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+            if archivo.tell() > limite:
+                await ctx.send(f"❌ El historial ocupa {archivo.tell() / 1_048_576:.1f} MB y supera el límite de Discord.")
+                return
+
+            archivo.seek(0)
+            await ctx.send(
+                f"📜 Historial de {member.display_name}: {filas:,} movimientos",
+                file=discord.File(archivo, filename=f"historial_{member.id}.csv")
+            )
+
     @commands.command(name="restart")
     async def restart_credits(self, ctx):
         """Restablece los créditos de todos los usuarios a 10,000 (Solo Admin)"""
@@ -320,40 +441,28 @@ class Economy(commands.Cog):
         loading_msg = await ctx.send("🔄 Restableciendo créditos de todos los usuarios...")
         
         try:
-            # Obtener todos los usuarios de la base de datos
-            all_users = db.get_all_users()
-            total_users = len(all_users)
-            
+            # Mostrar progreso
+            progress_msg = await ctx.send("📊 Progreso: 0 usuarios actualizados...")
+
+            async def mostrar_progreso(hechos, total):
+                try:
+                    await progress_msg.edit(content=f"📊 Progreso: {hechos}/{total} usuarios actualizados...")
+                except discord.HTTPException:
+                    pass  # Un fallo al mostrar el progreso no debe cortar el reinicio
+
+            # Un UPDATE por rango de user_id en vez de uno por usuario
+            updated_count, total_users = await self.db.reset_economy(10000, progress=mostrar_progreso)
+
+            # reset_economy no avisa usuario por usuario: los rangos se recalculan de una vez
+            rangos_cog = self.bot.get_cog('Rangos')
+            if rangos_cog:
+                await rangos_cog.actualizar_rangos()
+
             if total_users == 0:
+                await progress_msg.delete()
                 await loading_msg.edit(content="❌ No se encontraron usuarios en la base de datos.")
                 return
-            
-            updated_count = 0
-            
-            # Mostrar progreso
-            progress_msg = await ctx.send(f"📊 Progreso: 0/{total_users} usuarios actualizados...")
-            
-            # Actualizar cada usuario individualmente
-            for i, user_id in enumerate(all_users):
-                # Establecer directamente los créditos a 10,000
-                # En lugar de calcular la diferencia, actualizamos directamente
-                try:
-                    # Usar una consulta UPDATE directa
-                    db.ensure_connection()
-                    cursor = db.conn.cursor()
-                    cursor.execute("UPDATE users SET credits = 10000 WHERE user_id = %s", (user_id,))
-                    db.conn.commit()
-                    cursor.close()
-                    updated_count += 1
-                    
-                    # Actualizar mensaje de progreso cada 10 usuarios
-                    if (i + 1) % 10 == 0 or (i + 1) == total_users:
-                        await progress_msg.edit(content=f"📊 Progreso: {i + 1}/{total_users} usuarios actualizados...")
-                        
-                except Exception as e:
-                    print(f"Error actualizando usuario {user_id}: {e}")
-                    continue
-            
+
             # Eliminar mensaje de progreso
             await progress_msg.delete()
             
@@ -1,13 +1,11 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 import random
 import asyncio
 import time
 
-db = Database()
-
 # Sistema de Gacha modificado - Multiplicadores por usos en lugar de tiempo
 SISTEMA_GACHA = {
     "cajas": {
@@ -57,11 +55,12 @@ SISTEMA_GACHA = {
 }
 
 
-class GachaView(View):
+class GachaView(CasinoView):
     def __init__(self, user_id, gacha_cog):
         super().__init__(timeout=60.0)
         self.user_id = user_id
         self.gacha_cog = gacha_cog
+        self.db = gacha_cog.db
 
     @discord.ui.button(label="📦 Caja Básica (100cr)", style=discord.ButtonStyle.secondary, emoji="📦")
     async def basica_button(self, interaction: discord.Interaction, button: Button):
@@ -94,7 +93,7 @@ class GachaView(View):
                 return
         
         # Verificar créditos
-        credits = db.get_credits(user_id)
+        credits = await self.db.get_credits(user_id)
         if credits < caja["costo"]:
             await interaction.response.send_message(
                 f"❌ No tienes suficientes créditos. Necesitas: {caja['costo']:,}", 
@@ -102,8 +101,14 @@ class GachaView(View):
             )
             return
         
-        # Cobrar costo
-        db.update_credits(user_id, -caja["costo"], "gacha", "compra_caja", f"Compra {caja['nombre']}")
+        # Cobrar costo (una sola caja por mensaje aunque lleguen clics repetidos)
+        clave = f"gacha:{interaction.message.id}"
+        compra = await self.db.update_credits(user_id, -caja["costo"], "gacha", "compra_caja", f"Compra {caja['nombre']}",
+                                              idempotency_key=f"{clave}:compra")
+        if compra.replay:
+            saldo = f" Saldo tras la compra: {compra.balance:,} créditos." if compra.balance is not None else ""
+            await interaction.response.send_message(f"⏳ Esta caja ya se está abriendo.{saldo}", ephemeral=True)
+            return
         
         # Animación de apertura
         embed_animacion = discord.Embed(
@@ -116,7 +121,7 @@ class GachaView(View):
         
         # Obtener premio
         premio = self.obtener_premio(caja["probabilidades"])
-        await self.entregar_premio(interaction, premio, caja, user_id, cog)
+        await self.entregar_premio(interaction, premio, caja, user_id, cog, clave)
         
         # Aplicar cooldown
         cog.cooldowns_gacha[cooldown_key] = time.time() + caja["cooldown"]
@@ -130,14 +135,15 @@ class GachaView(View):
                 return premio
         return probabilidades[0]
 
-    async def entregar_premio(self, interaction, premio, caja, user_id, cog):
+    async def entregar_premio(self, interaction, premio, caja, user_id, cog, clave):
         # Aplicar bono de rareza
         bono_rareza = SISTEMA_GACHA["bonos_rareza"][premio["rareza"]]
         
         mensaje_resultado = ""
         if premio["tipo"] == "creditos":
             valor_final = int(premio["valor"] * bono_rareza["multiplicador"])
-            db.update_credits(user_id, valor_final, "bonus", "gacha_premio", f"{premio['nombre']} de {caja['nombre']}")
+            await self.db.update_credits(user_id, valor_final, "bonus", "gacha_premio", f"{premio['nombre']} de {caja['nombre']}",
+                                         idempotency_key=f"{clave}:premio")
             mensaje_resultado = f"**+{valor_final:,} créditos**"
         elif premio["tipo"] == "multiplicador":
             if user_id not in cog.bonos_activos:
@@ -187,6 +193,7 @@ class GachaView(View):
 class Gacha(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
         self.bonos_activos = {}
         self.cooldowns_gacha = {}
         self.colecciones_usuarios = {}
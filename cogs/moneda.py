@@ -1,21 +1,22 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 import random
-
-db = Database()
+from db.async_database import CreditLeg
 
 # Diccionario para duelos pendientes
 duelos_pendientes = {}
 
-class MonedaView(View):
-    def __init__(self, user_id, apuesta, es_duelo=False, oponente_id=None):
+class MonedaView(CasinoView):
+    def __init__(self, db, user_id, apuesta, es_duelo=False, oponente_id=None):
         super().__init__(timeout=30.0)
+        self.db = db
         self.user_id = user_id
         self.apuesta = apuesta
         self.es_duelo = es_duelo
         self.oponente_id = oponente_id
+        self.resultado_embed = None  # resultado de la partida, para los clics repetidos
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if self.es_duelo:
@@ -37,11 +38,16 @@ class MonedaView(View):
             await self.procesar_solitario(interaction, eleccion)
 
     async def procesar_solitario(self, interaction: discord.Interaction, eleccion: str):
-        # Verificar créditos
-        credits = db.get_credits(self.user_id)
-        if credits < self.apuesta:
+        # Reservar la apuesta (solo se descuenta si hay saldo)
+        # Una apuesta por mensaje: los clics repetidos no vuelven a cobrar ni a pagar
+        clave = f"moneda:{interaction.message.id}"
+        aceptada, _, repetida = await self.db.place_bet(self.user_id, self.apuesta, idempotency_key=f"{clave}:apuesta")
+        if not aceptada:
             await interaction.response.send_message("❌ No tienes suficientes créditos.", ephemeral=True)
             return
+        if repetida:
+            await self.mostrar_resultado_original(interaction)
+            return
 
         # Girar la moneda
         resultado = random.choice(["cara", "cruz"])
@@ -51,7 +57,6 @@ class MonedaView(View):
         if eleccion == resultado:
             ganancia_base = self.apuesta
             mensaje = f"🎉 **¡GANASTE!** La moneda cayó en **{resultado}** {emoji_resultado}"
-            tipo_transaccion = "win"
             
             # APLICAR MULTIPLICADOR DEL GACHA (SISTEMA POR USOS)
             multiplicador_gacha = 1.0
@@ -78,11 +83,14 @@ class MonedaView(View):
             ganancia_neto = -self.apuesta
             ganancia_base = 0
             mensaje = f"❌ **¡Perdiste!** La moneda cayó en **{resultado}** {emoji_resultado}"
-            tipo_transaccion = "loss"
 
-        # Actualizar créditos
-        db.update_credits(self.user_id, ganancia_neto, tipo_transaccion, "moneda", 
-                         f"Moneda: {eleccion} vs {resultado}")
+        # Liquidar la apuesta
+        balance_nuevo, repetida = await self.db.settle_bet(self.user_id, self.apuesta, self.apuesta + ganancia_neto, "moneda",
+                                                           f"Moneda: {eleccion} vs {resultado}", idempotency_key=clave)
+        if repetida:
+            # Ya se liquidó antes: esta tirada no cuenta
+            await self.mostrar_resultado_original(interaction)
+            return
 
         embed = discord.Embed(
             title="🪙 **RESULTADO - CARA O CRUZ**",
@@ -104,10 +112,18 @@ class MonedaView(View):
         else:
             embed.add_field(name="💸 Resultado", value=f"**{'+' if ganancia_neto > 0 else ''}{ganancia_neto:,}** créditos", inline=True)
         
-        embed.add_field(name="💳 Balance nuevo", value=f"**{db.get_credits(self.user_id):,}** créditos", inline=True)
+        embed.add_field(name="💳 Balance nuevo", value=f"**{balance_nuevo:,}** créditos", inline=True)
         
+        self.resultado_embed = embed
         await interaction.response.edit_message(embed=embed, view=None)
 
+    async def mostrar_resultado_original(self, interaction: discord.Interaction):
+        """Responde a un clic repetido con el resultado de la primera tirada"""
+        if self.resultado_embed is None:
+            await interaction.response.send_message("⏳ Esta apuesta ya se está jugando.", ephemeral=True)
+        else:
+            await interaction.response.send_message("♻️ Esta apuesta ya se jugó:", embed=self.resultado_embed, ephemeral=True)
+
     async def procesar_duelo(self, interaction: discord.Interaction, eleccion: str):
         duelo_id = f"{self.user_id}_{self.oponente_id}"
         
@@ -130,6 +146,12 @@ class MonedaView(View):
             await self.resolver_duelo(interaction, duelo_id, duelo)
 
     async def resolver_duelo(self, interaction: discord.Interaction, duelo_id: str, duelo: dict):
+        # Sacar el duelo de pendientes antes de cualquier await: si los dos
+        # eligen a la vez, solo uno de los clics lo resuelve
+        if duelos_pendientes.pop(duelo_id, None) is None:
+            return
+        clave = f"moneda_duelo:{duelo['mensaje_id']}"
+
         # Girar la moneda
         resultado = random.choice(["cara", "cruz"])
         emoji_resultado = "😀" if resultado == "cara" else "⭕"
@@ -166,8 +188,10 @@ class MonedaView(View):
             else:
                 ganancia_oponente_final = ganancia_oponente_base
             
-            db.update_credits(duelo['creador_id'], ganancia_creador_final, "win", "moneda_duelo", f"Empate vs {duelo['oponente_nombre']}")
-            db.update_credits(duelo['oponente_id'], ganancia_oponente_final, "win", "moneda_duelo", f"Empate vs {duelo['creador_nombre']}")
+            await self.db.move_credits([
+                CreditLeg(duelo['creador_id'], ganancia_creador_final, "win", "moneda_duelo", f"Empate vs {duelo['oponente_nombre']}"),
+                CreditLeg(duelo['oponente_id'], ganancia_oponente_final, "win", "moneda_duelo", f"Empate vs {duelo['creador_nombre']}"),
+            ], idempotency_key=clave)
             
         elif ganador_creador:
             # Creador gana
@@ -179,8 +203,10 @@ class MonedaView(View):
             else:
                 ganancia_final = ganancia_base
                 
-            db.update_credits(duelo['creador_id'], ganancia_final, "win", "moneda_duelo", f"Ganó vs {duelo['oponente_nombre']}")
-            db.update_credits(duelo['oponente_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Perdió vs {duelo['creador_nombre']}")
+            await self.db.move_credits([
+                CreditLeg(duelo['creador_id'], ganancia_final, "win", "moneda_duelo", f"Ganó vs {duelo['oponente_nombre']}"),
+                CreditLeg(duelo['oponente_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Perdió vs {duelo['creador_nombre']}"),
+            ], idempotency_key=clave)
             
         elif ganador_oponente:
             # Oponente gana
@@ -192,13 +218,17 @@ class MonedaView(View):
             else:
                 ganancia_final = ganancia_base
                 
-            db.update_credits(duelo['oponente_id'], ganancia_final, "win", "moneda_duelo", f"Ganó vs {duelo['creador_nombre']}")
-            db.update_credits(duelo['creador_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Perdió vs {duelo['oponente_nombre']}")
+            await self.db.move_credits([
+                CreditLeg(duelo['oponente_id'], ganancia_final, "win", "moneda_duelo", f"Ganó vs {duelo['creador_nombre']}"),
+                CreditLeg(duelo['creador_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Perdió vs {duelo['oponente_nombre']}"),
+            ], idempotency_key=clave)
         else:
             # Nadie gana (ambos pierden)
             resultado_texto = "💥 **AMBOS PIERDEN!**"
-            db.update_credits(duelo['creador_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Ambos perdieron vs {duelo['oponente_nombre']}")
-            db.update_credits(duelo['oponente_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Ambos perdieron vs {duelo['creador_nombre']}")
+            await self.db.move_credits([
+                CreditLeg(duelo['creador_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Ambos perdieron vs {duelo['oponente_nombre']}"),
+                CreditLeg(duelo['oponente_id'], -duelo['apuesta'], "loss", "moneda_duelo", f"Ambos perdieron vs {duelo['creador_nombre']}"),
+            ], idempotency_key=clave)
 
         # Crear embed de resultado
         embed = discord.Embed(
@@ -229,18 +259,16 @@ class MonedaView(View):
                 inline=False
             )
 
-        # Eliminar duelo pendiente
-        del duelos_pendientes[duelo_id]
-
         # Editar mensaje original
         original_message = await interaction.channel.fetch_message(duelo['mensaje_id'])
         await original_message.edit(embed=embed, view=None)
 
 # ... (el resto del código de MonedaDueloView y Moneda cog se mantiene igual)
 
-class MonedaDueloView(View):
-    def __init__(self, creador_id, creador_nombre, oponente_id, oponente_nombre, apuesta, mensaje_id):
+class MonedaDueloView(CasinoView):
+    def __init__(self, db, creador_id, creador_nombre, oponente_id, oponente_nombre, apuesta, mensaje_id):
         super().__init__(timeout=60.0)
+        self.db = db
         self.creador_id = creador_id
         self.creador_nombre = creador_nombre
         self.oponente_id = oponente_id
@@ -254,7 +282,7 @@ class MonedaDueloView(View):
     @discord.ui.button(label="✅ Aceptar Duelo", style=discord.ButtonStyle.success, emoji="⚔️")
     async def aceptar_button(self, interaction: discord.Interaction, button: Button):
         # Verificar créditos del oponente
-        credits = db.get_credits(self.oponente_id)
+        credits = await self.db.get_credits(self.oponente_id)
         if credits < self.apuesta:
             await interaction.response.send_message("❌ No tienes suficientes créditos para aceptar este duelo.", ephemeral=True)
             return
@@ -285,7 +313,7 @@ class MonedaDueloView(View):
         embed.add_field(name="🎯 Instrucciones", value="Ambos elijan Cara 😀 o Cruz ⭕", inline=False)
 
         # Cambiar a la vista de elección de moneda
-        view = MonedaView(self.creador_id, self.apuesta, es_duelo=True, oponente_id=self.oponente_id)
+        view = MonedaView(self.db, self.creador_id, self.apuesta, es_duelo=True, oponente_id=self.oponente_id)
         
         await interaction.response.edit_message(embed=embed, view=view)
 
@@ -302,6 +330,7 @@ class MonedaDueloView(View):
 class Moneda(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     @commands.command(name="moneda", aliases=["coin", "caraocruz"])
     async def moneda(self, ctx, apuesta: int = None):
@@ -325,7 +354,7 @@ class Moneda(commands.Cog):
             return
 
         # Verificar créditos
-        credits = db.get_credits(ctx.author.id)
+        credits = await self.db.get_credits(ctx.author.id)
         if credits < apuesta:
             await ctx.send(f"❌ No tienes suficientes créditos. Tu balance: {credits:,}")
             return
@@ -350,7 +379,7 @@ class Moneda(commands.Cog):
                     inline=False
                 )
         
-        view = MonedaView(ctx.author.id, apuesta)
+        view = MonedaView(self.db, ctx.author.id, apuesta)
         await ctx.send(embed=embed, view=view)
 
     @commands.command(name="duelomoneda", aliases=["coinduel", "duelocoin"])
@@ -366,13 +395,13 @@ class Moneda(commands.Cog):
             return
 
         # Verificar créditos del creador
-        credits_creador = db.get_credits(ctx.author.id)
+        credits_creador = await self.db.get_credits(ctx.author.id)
         if credits_creador < apuesta:
             await ctx.send(f"❌ No tienes suficientes créditos. Tu balance: {credits_creador:,}")
             return
 
         # Verificar créditos del oponente
-        credits_oponente = db.get_credits(oponente.id)
+        credits_oponente = await self.db.get_credits(oponente.id)
         if credits_oponente < apuesta:
             await ctx.send(f"❌ {oponente.mention} no tiene suficientes créditos. Su balance: {credits_oponente:,}")
             return
@@ -390,6 +419,7 @@ class Moneda(commands.Cog):
         message = await ctx.send(f"{oponente.mention} ¡Te han desafiado a un duelo!", embed=embed)
         
         view = MonedaDueloView(
+            self.db,
             ctx.author.id, 
             ctx.author.display_name,
             oponente.id,
@@ -2,14 +2,15 @@
 
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
+from discord.ui import Button
+from cogs.views import CasinoView
 import asyncio
 from typing import Dict, Optional
 from game.poker_game import PokerGame
 
 poker_games: Dict[str, PokerGame] = {}
 
-class PokerLobbyView(View):
+class PokerLobbyView(CasinoView):
     # ... (código sin cambios)
     def __init__(self, game_id: str, creator_id: int):
         super().__init__(timeout=300.0)
@@ -31,7 +32,7 @@ class PokerLobbyView(View):
         if game.game_started: return await interaction.response.send_message("❌ El juego ya comenzó.", ephemeral=True)
         if interaction.user.id in game.players: return await interaction.response.send_message("❌ Ya estás en este juego.", ephemeral=True)
         
-        success = game.add_player(interaction.user.id, interaction.user.display_name)
+        success = await game.add_player(interaction.user.id, interaction.user.display_name)
         if success:
             await interaction.response.defer()
             await self.update_lobby_embed(interaction)
@@ -47,7 +48,7 @@ class PokerLobbyView(View):
         if not game or len(game.players) < 2:
             return await interaction.response.send_message("❌ Se necesitan al menos 2 jugadores.", ephemeral=True)
         
-        game.start_game()
+        await game.start_game()
         
         # Enviar cartas por Mensaje Directo al inicio
         for player_id, player_data in game.players.items():
@@ -84,7 +85,7 @@ class PokerLobbyView(View):
         embed.set_footer(text="Presiona 'Unirse' para entrar a la partida.")
         return embed
 
-class PokerGameView(View):
+class PokerGameView(CasinoView):
     def __init__(self, game_id: str):
         super().__init__(timeout=None)
         self.game_id = game_id
@@ -131,7 +132,7 @@ class PokerGameView(View):
         game = poker_games.get(self.game_id)
         if not game: return
         
-        results = game.determine_winner()
+        results = await game.determine_winner()
         game.game_phase = "showdown"
         state = game.get_game_state()
         
@@ -146,26 +147,26 @@ class PokerGameView(View):
     @discord.ui.button(label="Retirarse", style=discord.ButtonStyle.danger, row=0, custom_id="fold_button")
     async def fold_button(self, interaction: discord.Interaction, button: Button):
         game = poker_games.get(self.game_id)
-        game.player_action(interaction.user.id, "fold")
+        await game.player_action(interaction.user.id, "fold")
         await self.process_turn(interaction)
 
     @discord.ui.button(label="Pasar", style=discord.ButtonStyle.secondary, row=0, custom_id="check_button")
     async def check_button(self, interaction: discord.Interaction, button: Button):
         game = poker_games.get(self.game_id)
-        if not game.player_action(interaction.user.id, "check"):
+        if not await game.player_action(interaction.user.id, "check"):
             return await interaction.response.send_message("No puedes pasar, la apuesta ha subido.", ephemeral=True)
         await self.process_turn(interaction)
 
     @discord.ui.button(label="Igualar", style=discord.ButtonStyle.primary, row=0, custom_id="call_button")
     async def call_button(self, interaction: discord.Interaction, button: Button):
         game = poker_games.get(self.game_id)
-        game.player_action(interaction.user.id, "call")
+        await game.player_action(interaction.user.id, "call")
         await self.process_turn(interaction)
 
     @discord.ui.button(label="Subir", style=discord.ButtonStyle.success, row=1, custom_id="raise_button")
     async def raise_button(self, interaction: discord.Interaction, button: Button):
         game = poker_games.get(self.game_id)
-        if not game.player_action(interaction.user.id, "raise", game.big_blind):
+        if not await game.player_action(interaction.user.id, "raise", game.big_blind):
             return await interaction.response.send_message("No puedes subir esa cantidad o no tienes suficientes fichas.", ephemeral=True)
         await self.process_turn(interaction)
 
@@ -228,9 +229,9 @@ class Poker(commands.Cog):
             if ctx.author.id in game.players:
                 return await ctx.send("❌ Ya estás en una partida de poker activa.")
         
-        game = PokerGame(game_id, ctx.author.id, min_bet)
+        game = PokerGame(self.bot.db, game_id, ctx.author.id, min_bet)
         poker_games[game_id] = game
-        game.add_player(ctx.author.id, ctx.author.display_name)
+        await game.add_player(ctx.author.id, ctx.author.display_name)
         
         view = PokerLobbyView(game_id, ctx.author.id)
         view.bot = self.bot # Pasa la instancia del bot
@@ -1,11 +1,11 @@
 import asyncio
 import discord
 from discord.ext import commands
-from discord.ui import Button, View, Select
-from db.database import Database
-from config import RANGOS, BONOS_RANGO, STARTING_CREDITS
-
-db = Database()
+from discord.ui import Button, Select
+from cogs.views import CasinoView
+from config import RANGOS, BONOS_RANGO, STARTING_CREDITS, NAME_FETCH_CONCURRENCY
+from db.async_database import CreditLeg
+from game.rangos import cruza_umbral, rango_para
 
 # Sistema de Marcos Disponibles (el mismo que tienes)
 MARCOS_DISPONIBLES = {
@@ -28,9 +28,10 @@ MARCOS_DISPONIBLES = {
     # ... (todos los demás marcos igual)
 }
 
-class MarcoSelectView(View):
-    def __init__(self, user_id, marcos_poseidos):
+class MarcoSelectView(CasinoView):
+    def __init__(self, db, user_id, marcos_poseidos):
         super().__init__(timeout=60.0)
+        self.db = db
         self.user_id = user_id
         self.marcos_poseidos = marcos_poseidos
         
@@ -65,14 +66,7 @@ class MarcoSelectView(View):
         marco_info = MARCOS_DISPONIBLES[marco_id]
         
         # Equipar el marco
-        cursor = db.conn.cursor()
-        cursor.execute("""
-            INSERT INTO user_frames (user_id, equipped_frame, owned_frames) 
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE equipped_frame = %s
-        """, (self.user_id, marco_id, ','.join(self.marcos_poseidos), marco_id))
-        db.conn.commit()
-        cursor.close()
+        await self.db.equip_frame(self.user_id, marco_id, self.marcos_poseidos)
         
         embed = discord.Embed(
             title="✅ Marco Equipado",
@@ -87,9 +81,10 @@ class MarcoSelectView(View):
         
         await interaction.response.edit_message(embed=embed, view=None)
 
-class TiendaMarcosView(View):
-    def __init__(self, user_id, credits):
+class TiendaMarcosView(CasinoView):
+    def __init__(self, db, user_id, credits):
         super().__init__(timeout=60.0)
+        self.db = db
         self.user_id = user_id
         self.credits = credits
 
@@ -99,11 +94,8 @@ class TiendaMarcosView(View):
 
     async def mostrar_tienda(self, interaction: discord.Interaction):
         # Obtener marcos ya poseídos
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT owned_frames FROM user_frames WHERE user_id = %s", (self.user_id,))
-        resultado = cursor.fetchone()
-        marcos_poseidos = resultado[0].split(',') if resultado and resultado[0] else ['default']
-        cursor.close()
+        resultado = await self.db.get_user_frames(self.user_id)
+        marcos_poseidos = resultado[1] if resultado and resultado[1] else ['default']
 
         embed = discord.Embed(
             title="🛍️ Tienda de Marcos - Disponibles para Comprar",
@@ -112,7 +104,7 @@ class TiendaMarcosView(View):
         )
 
         # Crear botones para cada marco disponible
-        view = View(timeout=60.0)
+        view = CasinoView(timeout=60.0)
         
         for marco_id, marco_info in MARCOS_DISPONIBLES.items():
             if marco_id not in marcos_poseidos and marco_id != "default":
@@ -149,33 +141,11 @@ class TiendaMarcosView(View):
             )
             return
         
-        # Obtener marcos actuales
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT owned_frames FROM user_frames WHERE user_id = %s", (self.user_id,))
-        resultado = cursor.fetchone()
-        
-        if resultado:
-            marcos_poseidos = resultado[0].split(',')
-            if marco_id not in marcos_poseidos:
-                marcos_poseidos.append(marco_id)
-            nuevos_marcos = ','.join(marcos_poseidos)
-            
-            cursor.execute("""
-                UPDATE user_frames 
-                SET owned_frames = %s 
-                WHERE user_id = %s
-            """, (nuevos_marcos, self.user_id))
-        else:
-            cursor.execute("""
-                INSERT INTO user_frames (user_id, equipped_frame, owned_frames) 
-                VALUES (%s, %s, %s)
-            """, (self.user_id, 'default', f'default,{marco_id}'))
-        
-        db.conn.commit()
-        cursor.close()
+        # Añadir el marco a los poseídos
+        await self.db.add_owned_frame(self.user_id, marco_id)
         
         # Restar créditos
-        db.update_credits(self.user_id, -marco_info["precio"], "compra", "marco_perfil", f"Compra marco: {marco_info['nombre']}")
+        await self.db.update_credits(self.user_id, -marco_info["precio"], "compra", "marco_perfil", f"Compra marco: {marco_info['nombre']}")
         
         embed = discord.Embed(
             title="🎊 ¡Marco Comprado!",
@@ -193,30 +163,109 @@ class TiendaMarcosView(View):
         
         await interaction.response.edit_message(embed=embed, view=None)
 
+# Usuarios del leaderboard cuyos nombres se piden al arrancar
+NOMBRES_PRECARGA = 50
+
+# Jugadores por página de !top
+POR_PAGINA_TOP = 10
+
+class TopView(CasinoView):
+    """Páginas del leaderboard con botones"""
+
+    def __init__(self, cog, user_id, por_rango, pagina):
+        super().__init__(timeout=120.0)
+        self.cog = cog
+        self.user_id = user_id
+        self.por_rango = por_rango
+        self.pagina = pagina
+        self.message = None
+        self.actualizar_botones()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.user_id
+
+    def actualizar_botones(self):
+        self.anterior_button.disabled = self.pagina <= 0
+        self.siguiente_button.disabled = self.pagina >= self.cog.paginas_top() - 1
+
+    async def mostrar(self, interaction: discord.Interaction, pagina: int):
+        self.pagina = max(0, min(pagina, self.cog.paginas_top() - 1))
+        self.actualizar_botones()
+        # Resolver nombres puede requerir la API: se confirma el clic antes
+        await interaction.response.defer()
+        filas = self.cog.db.leaderboard.page(self.pagina * POR_PAGINA_TOP, POR_PAGINA_TOP)
+        embed = await self.cog.crear_embed_top(self.por_rango, self.pagina, filas)
+        await interaction.edit_original_response(embed=embed, view=self)
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def anterior_button(self, interaction: discord.Interaction, button: Button):
+        await self.mostrar(interaction, self.pagina - 1)
+
+    @discord.ui.button(label="Siguiente", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def siguiente_button(self, interaction: discord.Interaction, button: Button):
+        await self.mostrar(interaction, self.pagina + 1)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
 class Rangos(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
+        # Peticiones simultáneas a la API de Discord para resolver nombres
+        self.limite_fetch = asyncio.Semaphore(NAME_FETCH_CONCURRENCY)
+        # Ids que Discord no reconoce: no se vuelven a pedir hasta reiniciar
+        self.sin_nombre = set()
+
+    async def obtener_nombres(self, user_ids) -> dict:
+        """Nombres para mostrar de `user_ids` (los que no se consigan no aparecen)"""
+        nombres, pedir, nuevos = {}, [], {}
+        for user_id in user_ids:
+            nombre, refrescar = self.db.names.lookup(user_id)
+            if nombre:
+                nombres[user_id] = nombre
+            if not refrescar:
+                continue
+            # La caché de miembros del bot no cuesta ninguna petición
+            user = self.bot.get_user(user_id)
+            if user:
+                nombres[user_id] = nuevos[user_id] = user.display_name
+            elif user_id not in self.sin_nombre:
+                pedir.append(user_id)
+
+        async def pedir_nombre(user_id: int):
+            async with self.limite_fetch:
+                try:
+                    with self.db.metrics.measure("discord_fetch_user"):
+                        user = await self.bot.fetch_user(user_id)
+                except discord.NotFound:
+                    self.sin_nombre.add(user_id)
+                    return
+                except discord.HTTPException:
+                    return  # Se queda el nombre caducado, si lo había
+                nombres[user_id] = nuevos[user_id] = user.display_name
 
-    def obtener_marco_usuario(self, user_id: int) -> dict:
+        await asyncio.gather(*(pedir_nombre(user_id) for user_id in pedir))
+        await self.db.save_user_names(nuevos)
+        return nombres
+
+    async def obtener_marco_usuario(self, user_id: int) -> dict:
         """Obtiene el marco equipado de un usuario"""
         try:
-            cursor = db.conn.cursor()
-            cursor.execute("SELECT equipped_frame FROM user_frames WHERE user_id = %s", (user_id,))
-            resultado = cursor.fetchone()
-            cursor.close()
+            resultado = await self.db.get_user_frames(user_id)
             
             if resultado:
                 marco_id = resultado[0]
                 return MARCOS_DISPONIBLES.get(marco_id, MARCOS_DISPONIBLES["default"])
             else:
                 # Crear entrada por defecto
-                cursor = db.conn.cursor()
-                cursor.execute("""
-                    INSERT IGNORE INTO user_frames (user_id, equipped_frame, owned_frames) 
-                    VALUES (%s, %s, %s)
-                """, (user_id, 'default', 'default'))
-                db.conn.commit()
-                cursor.close()
+                await self.db.ensure_user_frames(user_id)
                 return MARCOS_DISPONIBLES["default"]
                 
         except Exception as e:
@@ -225,43 +274,20 @@ class Rangos(commands.Cog):
 
     def calcular_rango(self, creditos: int) -> int:
         """Calcula el rango basado en los créditos"""
-        rango_actual = 0
-        for rango_id, datos in RANGOS.items():
-            if creditos >= datos["min_creditos"]:
-                rango_actual = rango_id
-            else:
-                break
-        return rango_actual
+        return rango_para(creditos)
 
-    def actualizar_rango_usuario(self, user_id: int) -> int:
-        """Actualiza el rango de un usuario si es necesario y devuelve el nuevo rango"""
-        try:
-            credits = db.get_credits(user_id)
-            nuevo_rango = self.calcular_rango(credits)
-            
-            # Obtener el rango actual desde la base de datos
-            cursor = db.conn.cursor()
-            cursor.execute("SELECT rango FROM users WHERE user_id = %s", (user_id,))
-            resultado = cursor.fetchone()
-            rango_actual = resultado[0] if resultado else 0
-            
-            # Solo actualizar si el rango cambió
-            if nuevo_rango != rango_actual:
-                cursor.execute("UPDATE users SET rango = %s WHERE user_id = %s", (nuevo_rango, user_id))
-                db.conn.commit()
-                
-                # Si subió de rango, aplicar bono de bienvenida (opcional)
-                if nuevo_rango > rango_actual:
-                    bono = BONOS_RANGO.get(nuevo_rango, {}).get('bono_subida', 0)
-                    if bono > 0:
-                        db.update_credits(user_id, bono, "bonus", "rango_up", f"Bono por subir a rango {nuevo_rango}")
-            
-            cursor.close()
-            return nuevo_rango
-            
-        except Exception as e:
-            print(f"Error actualizando rango: {e}")
-            return 0
+    async def actualizar_rangos(self, user_ids=None) -> list:
+        """Recalcula los rangos (de todos o de `user_ids`) y paga los bonos de subida en bloque"""
+        subidas = await self.db.sync_rangos(user_ids)
+        legs = [
+            CreditLeg(user_id, BONOS_RANGO.get(nuevo, {}).get('bono_subida', 0), "bonus", "rango_up",
+                      f"Bono por subir a rango {nuevo}")
+            for user_id, _, nuevo in subidas
+        ]
+        legs = [leg for leg in legs if leg.amount > 0]
+        if legs:
+            await self.db.move_credits(legs)
+        return subidas
 
     def obtener_progreso_rango(self, creditos: int, rango_actual: int) -> tuple:
         """Calcula el progreso hacia el siguiente rango"""
@@ -300,12 +326,12 @@ class Rangos(commands.Cog):
         
         user_id = usuario.id
         
-        # Forzar actualización del rango antes de mostrar
-        rango_actual = self.actualizar_rango_usuario(user_id)
-        credits = db.get_credits(user_id)
+        # El rango guardado se mantiene con on_balance_change; aquí basta con los créditos
+        credits = await self.db.get_credits(user_id)
+        rango_actual = self.calcular_rango(credits)
         
         # Obtener marco del usuario
-        marco_usuario = self.obtener_marco_usuario(user_id)
+        marco_usuario = await self.obtener_marco_usuario(user_id)
         rango_info = RANGOS[rango_actual]
         porcentaje, credito_objetivo, progreso_actual = self.obtener_progreso_rango(credits, rango_actual)
         barra_progreso = self.crear_barra_progreso(porcentaje)
@@ -373,7 +399,7 @@ class Rangos(commands.Cog):
         
         # Añadir botones de interacción si es el propio usuario
         if usuario.id == ctx.author.id:
-            view = View(timeout=60.0)
+            view = CasinoView(timeout=60.0)
             
             tienda_button = Button(label="🛍️ Tienda de Marcos", style=discord.ButtonStyle.primary, emoji="🛍️")
             equipar_button = Button(label="🎨 Cambiar Marco", style=discord.ButtonStyle.secondary, emoji="🎨")
@@ -399,7 +425,7 @@ class Rangos(commands.Cog):
     # CORREGIDO: Métodos auxiliares para los callbacks
     async def marcos_tienda_context(self, interaction: discord.Interaction):
         """Versión del comando marcos_tienda para usar en callbacks"""
-        credits = db.get_credits(interaction.user.id)
+        credits = await self.db.get_credits(interaction.user.id)
         
         embed = discord.Embed(
             title="🛍️ Tienda de Marcos de Perfil",
@@ -430,18 +456,15 @@ class Rangos(commands.Cog):
         
         embed.set_footer(text="Usa los botones de abajo para comprar o gestionar tus marcos")
         
-        view = TiendaMarcosView(interaction.user.id, credits)
+        view = TiendaMarcosView(self.db, interaction.user.id, credits)
         await interaction.response.edit_message(embed=embed, view=view)
 
     async def marcos_equipar_context(self, interaction: discord.Interaction):
         """Versión del comando marcos_equipar para usar en callbacks"""
         # Obtener marcos poseídos
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT owned_frames FROM user_frames WHERE user_id = %s", (interaction.user.id,))
-        resultado = cursor.fetchone()
-        cursor.close()
+        resultado = await self.db.get_user_frames(interaction.user.id)
         
-        if not resultado or not resultado[0]:
+        if not resultado or not resultado[1]:
             embed = discord.Embed(
                 title="❌ No tienes marcos",
                 description="Compra marcos en la tienda primero usando `!marcos tienda`",
@@ -450,7 +473,7 @@ class Rangos(commands.Cog):
             await interaction.response.edit_message(embed=embed, view=None)
             return
         
-        marcos_poseidos = resultado[0].split(',')
+        marcos_poseidos = resultado[1]
         
         if len(marcos_poseidos) == 1 and marcos_poseidos[0] == "default":
             embed = discord.Embed(
@@ -467,7 +490,7 @@ class Rangos(commands.Cog):
             color=0x00ff00
         )
         
-        view = MarcoSelectView(interaction.user.id, marcos_poseidos)
+        view = MarcoSelectView(self.db, interaction.user.id, marcos_poseidos)
         await interaction.response.edit_message(embed=embed, view=view)
 
     @commands.command(name="marcos", aliases=["frames", "marcoperfil"])
@@ -508,7 +531,7 @@ class Rangos(commands.Cog):
 
     async def marcos_tienda(self, ctx):
         """Muestra la tienda de marcos"""
-        credits = db.get_credits(ctx.author.id)
+        credits = await self.db.get_credits(ctx.author.id)
         
         embed = discord.Embed(
             title="🛍️ Tienda de Marcos de Perfil",
@@ -539,18 +562,15 @@ class Rangos(commands.Cog):
         
         embed.set_footer(text="Usa los botones de abajo para comprar o gestionar tus marcos")
         
-        view = TiendaMarcosView(ctx.author.id, credits)
+        view = TiendaMarcosView(self.db, ctx.author.id, credits)
         await ctx.send(embed=embed, view=view)
 
     async def marcos_equipar(self, ctx):
         """Permite equipar un marco de los que posee el usuario"""
         # Obtener marcos poseídos
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT owned_frames FROM user_frames WHERE user_id = %s", (ctx.author.id,))
-        resultado = cursor.fetchone()
-        cursor.close()
+        resultado = await self.db.get_user_frames(ctx.author.id)
         
-        if not resultado or not resultado[0]:
+        if not resultado or not resultado[1]:
             embed = discord.Embed(
                 title="❌ No tienes marcos",
                 description="Compra marcos en la tienda primero usando `!marcos tienda`",
@@ -559,7 +579,7 @@ class Rangos(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        marcos_poseidos = resultado[0].split(',')
+        marcos_poseidos = resultado[1]
         
         if len(marcos_poseidos) == 1 and marcos_poseidos[0] == "default":
             embed = discord.Embed(
@@ -576,22 +596,19 @@ class Rangos(commands.Cog):
             color=0x00ff00
         )
         
-        view = MarcoSelectView(ctx.author.id, marcos_poseidos)
+        view = MarcoSelectView(self.db, ctx.author.id, marcos_poseidos)
         await ctx.send(embed=embed, view=view)
 
     async def marcos_lista(self, ctx):
         """Muestra los marcos que posee el usuario"""
         # Obtener marcos poseídos y marco equipado
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT equipped_frame, owned_frames FROM user_frames WHERE user_id = %s", (ctx.author.id,))
-        resultado = cursor.fetchone()
-        cursor.close()
+        resultado = await self.db.get_user_frames(ctx.author.id)
         
         if not resultado or not resultado[1]:
             marcos_poseidos = ['default']
             marco_equipado = 'default'
         else:
-            marcos_poseidos = resultado[1].split(',')
+            marcos_poseidos = resultado[1]
             marco_equipado = resultado[0]
         
         embed = discord.Embed(
@@ -611,137 +628,135 @@ class Rangos(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    def paginas_top(self) -> int:
+        return max(1, -(-len(self.db.leaderboard) // POR_PAGINA_TOP))
+
+    async def crear_embed_top(self, por_rango: bool, pagina: int, filas: list) -> discord.Embed:
+        """Embed de una página del leaderboard con las filas (user_id, créditos)"""
+        if por_rango:
+            embed = discord.Embed(title="🏆 LEADERBOARD - RANGOS", color=0x00ff00)
+        else:
+            embed = discord.Embed(title="🏆 LEADERBOARD - MÁS RICOS", color=0xffd700)
+
+        if filas:
+            leaderboard_text = ""
+            nombres = await self.obtener_nombres([user_id for user_id, _ in filas])
+            for i, (user_id, credits) in enumerate(filas, pagina * POR_PAGINA_TOP + 1):
+                # Sin nombre conocido, la mención la resuelve el cliente de Discord
+                jugador = f"**{discord.utils.escape_markdown(nombres[user_id])}**" if user_id in nombres else f"<@{user_id}>"
+                
+                medal = ""
+                if i == 1: medal = "🥇 "
+                elif i == 2: medal = "🥈 "
+                elif i == 3: medal = "🥉 "
+                
+                rango_info = RANGOS.get(self.calcular_rango(credits), RANGOS[0])
+                
+                if por_rango:
+                    leaderboard_text += f"{medal}{i}. {jugador} - {rango_info['nombre']} (`{credits:,} cr`)\n"
+                else:
+                    leaderboard_text += f"{medal}{i}. {jugador} - `{credits:,} cr` ({rango_info['nombre']})\n"
+            
+            embed.description = leaderboard_text
+        else:
+            embed.description = "No hay datos todavía. ¡Sé el primero en jugar!"
+        
+        embed.set_footer(text=f"Página {pagina + 1}/{self.paginas_top()} · Usa !top creditos o !top rango · !miposicion")
+        return embed
+
     @commands.command(name="top", aliases=["leaderboard", "ranking"])
-    async def top(self, ctx, tipo: str = "creditos"):
+    async def top(self, ctx, tipo: str = "creditos", pagina: int = 1):
         """Muestra el leaderboard de jugadores"""
         try:
-            # Primero, actualizar todos los rangos de los usuarios en el top
             if tipo.lower() in ["creditos", "credits", "money"]:
-                cursor = db.conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT user_id, credits, rango 
-                    FROM users 
-                    WHERE credits > 0 
-                    ORDER BY credits DESC 
-                    LIMIT 15
-                """)
-                top_users = cursor.fetchall()
-                cursor.close()
-                
-                # Actualizar rangos antes de mostrar
-                for user_data in top_users:
-                    self.actualizar_rango_usuario(user_data['user_id'])
-                
-                # Volver a obtener los datos actualizados
-                cursor = db.conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT user_id, credits, rango 
-                    FROM users 
-                    WHERE credits > 0 
-                    ORDER BY credits DESC 
-                    LIMIT 10
-                """)
-                top_users = cursor.fetchall()
-                cursor.close()
-                
-                embed = discord.Embed(
-                    title="🏆 LEADERBOARD - TOP 10 MÁS RICOS",
-                    color=0xffd700
-                )
-                
+                por_rango = False
             elif tipo.lower() in ["rango", "rank", "nivel"]:
-                cursor = db.conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT user_id, credits, rango 
-                    FROM users 
-                    WHERE credits > 0 
-                    ORDER BY credits DESC 
-                    LIMIT 15
-                """)
-                top_users = cursor.fetchall()
-                cursor.close()
-                
-                # Actualizar rangos antes de mostrar
-                for user_data in top_users:
-                    self.actualizar_rango_usuario(user_data['user_id'])
-                
-                # Volver a obtener los datos actualizados ordenados por rango
-                cursor = db.conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT user_id, credits, rango 
-                    FROM users 
-                    WHERE credits > 0 
-                    ORDER BY rango DESC, credits DESC 
-                    LIMIT 10
-                """)
-                top_users = cursor.fetchall()
-                cursor.close()
-                
-                embed = discord.Embed(
-                    title="🏆 LEADERBOARD - TOP 10 RANGOS",
-                    color=0x00ff00
-                )
+                por_rango = True
             else:
                 await ctx.send("❌ Tipos válidos: `creditos` o `rango`")
                 return
-            
-            if top_users:
-                leaderboard_text = ""
-                for i, user_data in enumerate(top_users, 1):
-                    user_id = user_data['user_id']
-                    
-                    # Intentar obtener el usuario de diferentes maneras
-                    user = None
-                    
-                    # 1. Buscar en la cache del bot
-                    user = self.bot.get_user(user_id)
-                    
-                    # 2. Si no está en cache, intentar buscarlo
-                    if user is None:
-                        try:
-                            user = await self.bot.fetch_user(user_id)
-                        except:
-                            pass
-                    
-                    # 3. Si aún no se encuentra, usar el ID
-                    if user:
-                        username = f"**{user.display_name}**"
-                        mention = user.mention
-                    else:
-                        username = f"Usuario {user_id}"
-                        mention = f"<@{user_id}>"
-                    
-                    medal = ""
-                    if i == 1: medal = "🥇 "
-                    elif i == 2: medal = "🥈 "
-                    elif i == 3: medal = "🥉 "
-                    
-                    rango_actual = user_data.get('rango', 0)
-                    rango_info = RANGOS.get(rango_actual, RANGOS[0])
-                    
-                    if tipo.lower() in ["creditos", "credits", "money"]:
-                        leaderboard_text += f"{medal}{i}. {mention} - `{user_data['credits']:,} cr` ({rango_info['nombre']})\n"
-                    else:
-                        leaderboard_text += f"{medal}{i}. {mention} - {rango_info['nombre']} (`{user_data['credits']:,} cr`)\n"
-                
-                embed.description = leaderboard_text
-            else:
-                embed.description = "No hay datos todavía. ¡Sé el primero en jugar!"
-            
-            embed.set_footer(text=f"Usa !top creditos o !top rango")
-            await ctx.send(embed=embed)
+
+            # El leaderboard en memoria se mantiene con cada cambio de balance:
+            # no hace falta ninguna consulta. El rango sale de los créditos, así
+            # que el orden por rango coincide con el orden por créditos.
+            if not self.db.leaderboard.ready:
+                top_users = await self.db.get_top_users(POR_PAGINA_TOP)
+                filas = [(user_data['user_id'], user_data['credits']) for user_data in top_users]
+                await ctx.send(embed=await self.crear_embed_top(por_rango, 0, filas))
+                return
+
+            pagina = max(0, min(pagina - 1, self.paginas_top() - 1))
+            filas = self.db.leaderboard.page(pagina * POR_PAGINA_TOP, POR_PAGINA_TOP)
+            view = TopView(self, ctx.author.id, por_rango, pagina)
+            view.message = await ctx.send(embed=await self.crear_embed_top(por_rango, pagina, filas), view=view)
             
         except Exception as e:
             await ctx.send("❌ Error al cargar el leaderboard.")
             print(f"Error en top: {e}")
 
+    @commands.command(name="miposicion", aliases=["posicion", "mipuesto"])
+    async def miposicion(self, ctx, usuario: discord.Member = None):
+        """Muestra tu puesto en el leaderboard"""
+        usuario = usuario or ctx.author
+        leaderboard = self.db.leaderboard
+        if not leaderboard.ready:
+            await ctx.send("⏳ El leaderboard se está cargando, prueba en unos segundos.")
+            return
+
+        # Búsqueda en memoria en O(log n), sin contar filas en MySQL
+        posicion = leaderboard.position(usuario.id)
+        if posicion is None:
+            await ctx.send(f"❌ {usuario.display_name} no tiene créditos, así que no aparece en el leaderboard.")
+            return
+
+        total = len(leaderboard)
+        (_, credits), = leaderboard.page(posicion - 1, 1)
+        rango_info = RANGOS[self.calcular_rango(credits)]
+
+        embed = discord.Embed(
+            title=f"🏅 Posición de {usuario.display_name}",
+            color=rango_info['color']
+        )
+        embed.add_field(name="🏆 Puesto", value=f"**#{posicion:,}** de {total:,}", inline=True)
+        embed.add_field(name="📊 Percentil", value=f"Top **{posicion / total:.1%}**", inline=True)
+        embed.add_field(name="💳 Créditos", value=f"**{credits:,}** ({rango_info['nombre']})", inline=True)
+
+        if posicion > 1:
+            (arriba_id, arriba_credits), = leaderboard.page(posicion - 2, 1)
+            nombres = await self.obtener_nombres([arriba_id])
+            arriba = f"**{discord.utils.escape_markdown(nombres[arriba_id])}**" if arriba_id in nombres else f"<@{arriba_id}>"
+            embed.add_field(
+                name="⬆️ Siguiente puesto",
+                value=f"Faltan **{arriba_credits - credits + 1:,}** créditos para superar a {arriba}",
+                inline=False
+            )
+        else:
+            embed.add_field(name="👑 Siguiente puesto", value="¡Número 1 del leaderboard!", inline=False)
+
+        embed.set_footer(text=f"Apareces en la página {(posicion - 1) // POR_PAGINA_TOP + 1} de !top")
+        await ctx.send(embed=embed)
+
+    @commands.command(name="syncrangos")
+    @commands.is_owner()
+    async def syncrangos(self, ctx):
+        """Recalcula el rango de todos los usuarios (solo owner)"""
+        subidas = await self.actualizar_rangos()
+        await ctx.send(f"✅ Rangos sincronizados: {len(subidas):,} usuarios subieron de rango.")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Resuelve por adelantado los nombres de los primeros del leaderboard"""
+        await self.obtener_nombres([user_id for user_id, _ in self.db.leaderboard.top(NOMBRES_PRECARGA)])
+
     @commands.Cog.listener()
-    async def on_command_completion(self, ctx):
-        """Actualiza el rango después de cualquier comando que modifique créditos"""
-        if ctx.command and ctx.command.name in ['daily', 'apostar', 'transferir', 'ruletarusa']:
-            # Pequeña demora para asegurar que los créditos se actualizaron
-            await asyncio.sleep(1)
-            self.actualizar_rango_usuario(ctx.author.id)
+    async def on_balance_change(self, user_id: int, anterior, nuevo: int):
+        """Actualiza el rango cuando un cambio de créditos (de cualquier juego) cruza un umbral"""
+        if not cruza_umbral(anterior, nuevo):
+            return
+        try:
+            await self.actualizar_rangos([user_id])
+        except Exception as e:
+            print(f"Error actualizando rango: {e}")
 
 async def setup(bot):
     await bot.add_cog(Rangos(bot))
\ No newline at end of file
@@ -1,14 +1,14 @@
 import discord
 from discord.ext import commands
+from cogs.views import CasinoView
 import random
 import asyncio
-from db.database import Database
-
-db = Database()
+from db.async_database import CreditLeg
 
 class RuletaRusa(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
         self.juegos_activos = {}
         self.buscando_partida = {}
 
@@ -53,7 +53,7 @@ class RuletaRusa(commands.Cog):
             return
 
         # Verificar créditos
-        credits = db.get_credits(ctx.author.id)
+        credits = await self.db.get_credits(ctx.author.id)
         if bet > credits:
             await ctx.send(f"❌ **No tienes suficientes créditos.**\nTu balance: {credits:,} créditos")
             return
@@ -95,7 +95,7 @@ class RuletaRusa(commands.Cog):
         juego = self.juegos_activos[user_id]
         
         # Descontar apuesta del jugador
-        db.update_credits(user_id, -bet, "bet", "ruletarusa", "Apuesta vs máquina")
+        await self.db.update_credits(user_id, -bet, "bet", "ruletarusa", "Apuesta vs máquina")
         
         # Mensaje de inicio
         embed = discord.Embed(
@@ -123,7 +123,7 @@ class RuletaRusa(commands.Cog):
             return
 
         # Verificar créditos del oponente
-        credits_oponente = db.get_credits(oponente_id)
+        credits_oponente = await self.db.get_credits(oponente_id)
         if bet > credits_oponente:
             await ctx.send(f"❌ **{oponente.mention} no tiene suficientes créditos para esta apuesta.**")
             return
@@ -138,7 +138,7 @@ class RuletaRusa(commands.Cog):
         embed_invitacion.add_field(name="🏆 BOTE TOTAL", value=f"**{bet*2:,}** créditos", inline=True)
         embed_invitacion.set_footer(text="Tienes 60 segundos para aceptar")
 
-        class InvitacionView(discord.ui.View):
+        class InvitacionView(CasinoView):
             def __init__(self, cog, retador, oponente, bet):
                 super().__init__(timeout=60.0)
                 self.cog = cog
@@ -151,17 +151,23 @@ class RuletaRusa(commands.Cog):
 
             @discord.ui.button(label="✅ ACEPTAR RETO", style=discord.ButtonStyle.success)
             async def aceptar(self, interaction: discord.Interaction, button: discord.ui.Button):
-                # Verificar que ambos todavía tienen créditos
-                credits1 = db.get_credits(self.retador.id)
-                credits2 = db.get_credits(self.oponente.id)
+                # Descontar ambas apuestas a la vez, solo si los dos tienen créditos
+                balances = await self.cog.db.move_credits([
+                    CreditLeg(self.retador.id, -self.bet, "bet", "ruletarusa", f"Apuesta vs {self.oponente}"),
+                    CreditLeg(self.oponente.id, -self.bet, "bet", "ruletarusa", f"Apuesta vs {self.retador}"),
+                ], check_funds=True, idempotency_key=f"ruletarusa:{interaction.message.id}:aceptar")
                 
-                if credits1 < self.bet or credits2 < self.bet:
+                if balances is None:
                     await interaction.response.edit_message(
                         content="❌ **Uno de los jugadores ya no tiene créditos suficientes**",
                         embed=None,
                         view=None
                     )
                     return
+                if not balances:
+                    # Clic repetido: el reto ya se aceptó y las apuestas ya se cobraron
+                    await interaction.response.send_message("⏳ El reto ya fue aceptado.", ephemeral=True)
+                    return
 
                 # Bala en posición fija
                 bala_posicion = random.randint(1, 6)
@@ -182,10 +188,6 @@ class RuletaRusa(commands.Cog):
 
                 juego = self.cog.juegos_activos[self.retador.id]
 
-                # Descontar apuestas
-                db.update_credits(self.retador.id, -self.bet, "bet", "ruletarusa", f"Apuesta vs {self.oponente}")
-                db.update_credits(self.oponente.id, -self.bet, "bet", "ruletarusa", f"Apuesta vs {self.retador}")
-
                 # Mensaje de inicio del juego
                 embed = discord.Embed(
                     title="⚔️ RULETA RUSA PvP",
@@ -233,7 +235,7 @@ class RuletaRusa(commands.Cog):
 
     def crear_vista_disparo(self, game_id):
         """Crea la vista de botones para disparar"""
-        class DisparoView(discord.ui.View):
+        class DisparoView(CasinoView):
             def __init__(self, cog, game_id):
                 super().__init__(timeout=60.0)
                 self.cog = cog
@@ -347,7 +349,7 @@ class RuletaRusa(commands.Cog):
         if hay_bala:
             # 💀 MÁQUINA MUERE - JUGADOR GANA
             bote = juego['apuesta'] * 2
-            db.update_credits(juego['jugador1'].id, bote, "win", "ruletarusa", "Ganó vs máquina")
+            await self.db.update_credits(juego['jugador1'].id, bote, "win", "ruletarusa", "Ganó vs máquina")
             
             embed_victoria = discord.Embed(
                 title="🎉 ¡BANG! ¡LA MÁQUINA MURIÓ!",
@@ -355,7 +357,8 @@ class RuletaRusa(commands.Cog):
                 color=0x00ff00
             )
             embed_victoria.add_field(name="💰 BOTE GANADO", value=f"**{bote:,}** créditos", inline=True)
-            embed_victoria.add_field(name="💳 BALANCE NUEVO", value=f"**{db.get_credits(juego['jugador1'].id):,}** créditos", inline=True)
+            balance_nuevo = await self.db.get_credits(juego['jugador1'].id)
+            embed_victoria.add_field(name="💳 BALANCE NUEVO", value=f"**{balance_nuevo:,}** créditos", inline=True)
             embed_victoria.add_field(name="🎯 BALA ENCONTRADA", value=f"**Cámara {juego['bala_posicion']}**", inline=True)
             embed_victoria.set_image(url="https://media4.giphy.com/media/v1.Y2lkPTc5MGI3NjExZjZjejQ2MHR5bGt4cmo2NDZyZXBnd3R3eGNrM3cwbjRvYW8xb2p3MSZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/YBsd8wdchmxqg/giphy.gif")
             
@@ -424,10 +427,10 @@ class RuletaRusa(commands.Cog):
             # PvP - El otro jugador gana
             if jugador_muerto.id == juego['jugador1'].id:
                 ganador = juego['jugador2']
-                db.update_credits(ganador.id, bote, "win", "ruletarusa", f"Ganó vs {jugador_muerto}")
+                await self.db.update_credits(ganador.id, bote, "win", "ruletarusa", f"Ganó vs {jugador_muerto}")
             else:
                 ganador = juego['jugador1']
-                db.update_credits(ganador.id, bote, "win", "ruletarusa", f"Ganó vs {jugador_muerto}")
+                await self.db.update_credits(ganador.id, bote, "win", "ruletarusa", f"Ganó vs {jugador_muerto}")
             
             embed_muerte = discord.Embed(
                 title="💀 ¡BANG! ¡JUGADOR ELIMINADO!",
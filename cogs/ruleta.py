@@ -1,13 +1,11 @@
 import discord
 from discord.ext import commands
 import random
-from db.database import Database
-
-db = Database()
 
 class Ruleta(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
         self.numbers = list(range(0, 37))  # 0-36
         self.colors = {
             **{i: "rojo" for i in [1,3,5,7,9,12,14,16,18,19,21,23,25,27,30,32,34,36]},
@@ -44,8 +42,21 @@ class Ruleta(commands.Cog):
             await ctx.send("❌ Apuesta mínima: 10 créditos")
             return
 
-        credits = db.get_credits(ctx.author.id)
-        if bet > credits:
+        # Validar la apuesta entera antes de descontar nada: un error más
+        # abajo dejaría la apuesta cobrada sin liquidar
+        if apuesta is None:
+            await ctx.send(f"❌ Indica a qué apuestas. Ejemplo: `!ruleta {bet} color rojo` (usa `!ruletainfo`)")
+            return
+        if tipo in ["docena", "fila", "columna", "pleno"]:
+            try:
+                int(apuesta)
+            except ValueError:
+                await ctx.send(f"❌ La apuesta `{tipo}` necesita un número. Usa `!ruletainfo` para ver ejemplos.")
+                return
+
+        # Reservar la apuesta (solo se descuenta si hay saldo)
+        aceptada, credits, _ = await self.db.place_bet(ctx.author.id, bet)
+        if not aceptada:
             await ctx.send(f"❌ No tienes suficientes créditos. Balance: {credits:,}")
             return
 
@@ -200,9 +211,9 @@ class Ruleta(commands.Cog):
             resultado_texto = f"❌ **Perdiste** {bet:,} créditos"
             usos_restantes = 0
 
-        # Actualizar créditos en la base de datos
-        db.update_credits(ctx.author.id, ganancia_neto, "win" if gano else "loss", "ruleta", 
-                         f"Ruleta: {tipo} {apuesta} -> {numero_ganador}")
+        # Liquidar la apuesta en la base de datos
+        balance_nuevo, _ = await self.db.settle_bet(ctx.author.id, bet, bet + ganancia_neto, "ruleta",
+                                                 f"Ruleta: {tipo} {apuesta} -> {numero_ganador}")
 
         # Crear embed
         embed = discord.Embed(
@@ -223,7 +234,7 @@ class Ruleta(commands.Cog):
             )
         
         embed.add_field(name="🎰 Resultado", value=resultado_texto, inline=False)
-        embed.add_field(name="💳 Balance nuevo", value=f"{db.get_credits(ctx.author.id):,} créditos", inline=True)
+        embed.add_field(name="💳 Balance nuevo", value=f"{balance_nuevo:,} créditos", inline=True)
         
         await ctx.send(embed=embed)
 
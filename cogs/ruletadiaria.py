@@ -1,13 +1,11 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
-from db.database import Database
+from discord.ui import Button
+from cogs.views import CasinoView
 import random
 import asyncio
 import time
 
-db = Database()
-
 # Sistema de Ruleta Diaria ACTUALIZADO - Multiplicadores por usos
 RULETA_DIARIA = {
     "cooldown": 86400,  # 24 horas en segundos
@@ -41,9 +39,10 @@ RULETA_DIARIA = {
 # Diccionario solo para cooldowns de la ruleta
 cooldowns_ruleta = {}
 
-class RuletaDiariaView(View):
-    def __init__(self, user_id):
+class RuletaDiariaView(CasinoView):
+    def __init__(self, db, user_id):
         super().__init__(timeout=60.0)
+        self.db = db
         self.user_id = user_id
 
     @discord.ui.button(label="🎡 GIRAR RULETA", style=discord.ButtonStyle.success, emoji="🎡")
@@ -96,7 +95,7 @@ class RuletaDiariaView(View):
             if premio["tipo"] == "creditos":
                 ganancia_final = premio["valor"]
                 
-                db.update_credits(user_id, ganancia_final, "bonus", "ruleta_diaria", f"Ruleta: {premio['nombre']}")
+                await self.db.update_credits(user_id, ganancia_final, "bonus", "ruleta_diaria", f"Ruleta: {premio['nombre']}")
                 mensaje_resultado = f"**+{ganancia_final:,} créditos**"
                 
             elif premio["tipo"] == "multiplicador":
@@ -174,6 +173,7 @@ class RuletaDiariaView(View):
 class RuletaDiaria(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
 
     @commands.command(name="megaruleta", aliases=["mega", "ruletadiaria"])
     async def mega_ruleta(self, ctx):
@@ -251,7 +251,7 @@ class RuletaDiaria(commands.Cog):
         
         # Solo mostrar botón si no está en cooldown
         if user_id not in cooldowns_ruleta or cooldowns_ruleta[user_id] <= time.time():
-            view = RuletaDiariaView(user_id)
+            view = RuletaDiariaView(self.db, user_id)
             await ctx.send(embed=embed, view=view)
         else:
             await ctx.send(embed=embed)
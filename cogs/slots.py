@@ -1,13 +1,11 @@
 import discord
 from discord.ext import commands
 import random
-from db.database import Database
-
-db = Database()
 
 class Slots(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = bot.db
         self.symbols = ["🍒", "🍋", "🍊", "🍇", "🔔", "⭐", "💎", "7️⃣"]
         self.payouts = {
             "7️⃣7️⃣7️⃣": 50,
@@ -37,8 +35,9 @@ class Slots(commands.Cog):
             await ctx.send("❌ Apuesta mínima: 10 créditos")
             return
 
-        credits = db.get_credits(ctx.author.id)
-        if bet > credits:
+        # Reservar la apuesta (solo se descuenta si hay saldo)
+        aceptada, credits, _ = await self.db.place_bet(ctx.author.id, bet)
+        if not aceptada:
             await ctx.send(f"❌ No tienes suficientes créditos. Balance: {credits:,}")
             return
 
@@ -76,14 +75,12 @@ class Slots(commands.Cog):
         else:
             payout_final = payout_base
 
-        # Calcular ganancia/pérdida neta
-        net_win = payout_final - bet
-        
-        # Actualizar créditos en la base de datos
-        if net_win > 0:
-            db.update_credits(ctx.author.id, net_win, "win", "slots", f"Slots: {result}{multiplicador_texto}")
+        # Liquidar la apuesta en la base de datos. Solo se cobra premio si
+        # supera la apuesta; si no, la apuesta se pierde entera
+        if payout_final > bet:
+            await self.db.settle_bet(ctx.author.id, bet, payout_final, "slots", f"Slots: {result}{multiplicador_texto}")
         else:
-            db.update_credits(ctx.author.id, -bet, "loss", "slots", f"Slots: {result}")
+            await self.db.settle_bet(ctx.author.id, bet, 0, "slots", f"Slots: {result}")
 
         # Crear embed
         embed = discord.Embed(
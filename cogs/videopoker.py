@@ -1,12 +1,11 @@
 import discord
 from discord.ext import commands
-from discord.ui import Button, View
+from discord.ui import Button
+from cogs.views import CasinoView
 import random
 import asyncio
 from typing import Optional, List, Tuple, Dict
 
-from db.database import Database
-
 PAY_TABLE: Dict[str, int] = {
     "Escalera Real": 800,
     "Escalera de Color": 50,
@@ -31,10 +30,11 @@ CARD_VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '
 
 # --- Lógica de la Vista del Juego ---
 
-class VideoPokerGameView(View):
+class VideoPokerGameView(CasinoView):
     def __init__(self, ctx: commands.Context, bet: int):
         super().__init__(timeout=180.0)
         self.ctx = ctx
+        self.db = ctx.bot.db
         self.bet = bet
         
         self.deck: List[str] = self.create_deck()
@@ -143,9 +143,8 @@ class VideoPokerGameView(View):
                 prize_final = prize_base
 
             # Registrar el premio en la base de datos
-            db = Database()
             if prize_final > 0:
-                db.update_credits(self.ctx.author.id, prize_final, "win", "videopoker", f"Gana con {hand_name}")
+                await self.db.update_credits(self.ctx.author.id, prize_final, "win", "videopoker", f"Gana con {hand_name}")
             
             # Crear el embed final
             result_text = f"**Conseguiste: {hand_name}!**\n"
@@ -200,7 +199,7 @@ class VideoPokerGameView(View):
 class VideoPoker(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db = Database()
+        self.db = bot.db
 
     @commands.command(name="videopoker", aliases=["vp"])
     async def videopoker(self, ctx, bet: Optional[int] = None):
@@ -238,12 +237,12 @@ class VideoPoker(commands.Cog):
         if bet <= 0:
             return await ctx.send("❌ La apuesta debe ser un número positivo.")
         
-        user_credits = self.db.get_credits(ctx.author.id)
+        user_credits = await self.db.get_credits(ctx.author.id)
         if user_credits < bet:
             return await ctx.send(f"❌ No tienes suficientes créditos. Tienes {user_credits} créditos.")
 
         # Iniciar el juego
-        self.db.update_credits(ctx.author.id, -bet, "bet", "videopoker", f"Apuesta inicial: {bet}")
+        await self.db.update_credits(ctx.author.id, -bet, "bet", "videopoker", f"Apuesta inicial: {bet}")
         
         view = VideoPokerGameView(ctx, bet)
         initial_embed = view.create_game_embed("Mano Inicial")
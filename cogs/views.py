@@ -0,0 +1,39 @@
+import discord
+from discord.ui import View
+
+from db.metrics import current_command
+
+
+class CasinoView(View):
+    """Vista base de los juegos: atribuye a su botón las consultas lentas.
+
+    El callback de cada botón o menú corre en su propia tarea, así que
+    current_command se fija dentro del callback y no en un listener
+    `on_interaction`, que corre en otra tarea y no llegaría.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in self.children:
+            self._marcar(item)
+
+    def add_item(self, item):
+        self._marcar(item)
+        return super().add_item(item)
+
+    def _marcar(self, item):
+        callback = item.callback
+
+        async def marcado(interaction: discord.Interaction):
+            current_command.set(self._nombre(item))
+            return await callback(interaction)
+
+        item.callback = marcado
+
+    def _nombre(self, item) -> str:
+        vista = type(self).__name__
+        custom_id = getattr(item, "custom_id", None) or ""
+        # Los botones sin custom_id llevan uno aleatorio: la vista dice más
+        if len(custom_id) == 32 and all(c in "0123456789abcdef" for c in custom_id):
+            return f"🔘 {vista}"
+        return f"🔘 {vista}:{custom_id}"
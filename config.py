@@ -13,6 +13,44 @@ DB_CONFIG = {
     "port": int(os.getenv("DB_PORT", 3306))
 }
 
+# Motor de la base de datos: "mysql" (servidor, DB_CONFIG) o "sqlite"
+# (un archivo local en modo WAL, para servidores pequeños y pruebas)
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "casino.db")
+
+# Conexiones simultáneas del pool asíncrono
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+
+# Máximo de usuarios conocidos en memoria (se saltan el INSERT IGNORE)
+DB_KNOWN_USERS_MAX = int(os.getenv("DB_KNOWN_USERS_MAX", 50000))
+
+# Consultas más lentas que esto (ms) se registran en el log con su comando
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+# Historial de transacciones: filas por INSERT, segundos entre volcados y
+# máximo en memoria antes de escribir de forma síncrona
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", 200))
+LEDGER_FLUSH_INTERVAL = float(os.getenv("LEDGER_FLUSH_INTERVAL", 2.0))
+LEDGER_MAX_BUFFER = int(os.getenv("LEDGER_MAX_BUFFER", 5000))
+
+# Caché de balances: usuarios en memoria y segundos de validez
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", 10000))
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", 300))
+
+# Leaderboard en memoria: segundos entre resincronizaciones con la tabla
+LEADERBOARD_RESYNC_INTERVAL = float(os.getenv("LEADERBOARD_RESYNC_INTERVAL", 300))
+
+# Nombres de usuario para mostrar: cuántos se guardan, segundos de validez y
+# peticiones simultáneas a la API de Discord para pedir los que falten
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", 5000))
+NAME_CACHE_TTL = float(os.getenv("NAME_CACHE_TTL", 86400))
+NAME_FETCH_CONCURRENCY = int(os.getenv("NAME_FETCH_CONCURRENCY", 4))
+
+# Horas que se guardan las claves de idempotencia de las operaciones de créditos
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+# Segundos entre limpiezas de las claves caducadas mientras el bot corre
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 3600))
+
 # Configuración del juego
 STARTING_CREDITS = 10000
 MIN_BET = 10
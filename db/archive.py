@@ -0,0 +1,185 @@
+"""Archivo de las transacciones antiguas.
+
+Mueve las filas de `transactions` con más de N días a tablas mensuales
+comprimidas (`transactions_archive_AAAAMM`) y deja en `transactions` solo
+el historial reciente. Se ejecuta aparte del bot, por ejemplo cada noche:
+
+    python -m db.archive --days 90
+
+Antes de borrar nada, cada fila queda sumada en dos sitios: los acumulados
+por hora y juego (`game_rollups`, que ya alimenta el ledger) y el saldo
+archivado por usuario (`transaction_archive_balances`), con el que
+`db.reconcile` sigue pudiendo cuadrar balances sin leer el archivo. Las
+filas de reset se quedan en `transactions`: son pocas y la conciliación
+las necesita.
+
+El trabajo avanza por rangos de id en transacciones cortas, con una pausa
+entre bloques, para no competir con las escrituras del bot.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+import mysql.connector
+
+from config import DB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "transactions_archive_"
+
+
+def _chunk_bounds(cursor, desde: int, cutoff: datetime, chunk_size: int) -> Tuple[int, bool]:
+    """Último id del siguiente bloque archivable y si ya no queda nada más antiguo"""
+    cursor.execute("""
+        SELECT id, created_at FROM transactions
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+    """, (desde, chunk_size))
+    filas = cursor.fetchall()
+    hasta = desde
+    for tx_id, created_at in filas:
+        # Los ids crecen con el tiempo: se para en la primera fila reciente
+        if created_at >= cutoff:
+            return hasta, True
+        hasta = tx_id
+    return hasta, len(filas) < chunk_size
+
+
+def archive_tables(cursor) -> List[str]:
+    """Tablas de archivo existentes, de la más antigua a la más reciente"""
+    cursor.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name LIKE %s
+    """, (ARCHIVE_PREFIX.replace("_", "\\_") + "%",))
+    return sorted(nombre for (nombre,) in cursor.fetchall())
+
+
+def _ensure_archive_tables(cursor, desde: int, hasta: int) -> List[str]:
+    """Crea las tablas mensuales que necesita el bloque (fuera de la transacción: es DDL)"""
+    cursor.execute("""
+        SELECT DISTINCT DATE_FORMAT(created_at, '%Y%m') FROM transactions
+        WHERE id > %s AND id <= %s
+    """, (desde, hasta))
+    meses = sorted(mes for (mes,) in cursor.fetchall())
+    existentes = set(archive_tables(cursor))
+    for mes in meses:
+        if f"{ARCHIVE_PREFIX}{mes}" not in existentes:
+            cursor.execute(f"CREATE TABLE {ARCHIVE_PREFIX}{mes} LIKE transactions")
+            # Comprimida al crearla, mientras está vacía (cambiarlo después la reconstruye)
+            cursor.execute(f"ALTER TABLE {ARCHIVE_PREFIX}{mes} ROW_FORMAT=COMPRESSED")
+    return meses
+
+
+def _sum_balances(cursor, desde: int, hasta: int):
+    cursor.execute("""
+        INSERT INTO transaction_archive_balances (user_id, amount, archived_rows)
+        SELECT user_id, SUM(amount), COUNT(*) FROM transactions
+        WHERE id > %s AND id <= %s AND type <> 'reset'
+        GROUP BY user_id
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            archived_rows = archived_rows + VALUES(archived_rows)
+    """, (desde, hasta))
+
+
+def archive_chunk(conn, desde: int, hasta: int, meses: List[str]) -> int:
+    """Archiva las filas con id en (desde, hasta] y devuelve cuántas se movieron"""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        for mes in meses:
+            cursor.execute(f"""
+                INSERT INTO {ARCHIVE_PREFIX}{mes}
+                SELECT * FROM transactions
+                WHERE id > %s AND id <= %s AND type <> 'reset'
+                  AND DATE_FORMAT(created_at, '%Y%m') = %s
+            """, (desde, hasta, mes))
+
+        # Los saldos se suman en orden de id: un reset sustituye lo anterior
+        cursor.execute("""
+            SELECT t.id, r.user_from, r.user_to, r.credits
+            FROM transactions t
+            LEFT JOIN economy_resets r ON r.transaction_id = t.id
+            WHERE t.id > %s AND t.id <= %s AND t.type = 'reset' AND t.user_id = 0
+            ORDER BY t.id
+        """, (desde, hasta))
+        inicio = desde
+        for reset_id, rango_desde, rango_hasta, credits in cursor.fetchall():
+            _sum_balances(cursor, inicio, reset_id)
+            if rango_desde is not None:
+                cursor.execute("""
+                    UPDATE transaction_archive_balances SET base = %s, amount = 0
+                    WHERE user_id > %s AND user_id <= %s
+                """, (credits, rango_desde, rango_hasta))
+            else:
+                logger.warning(f"⚠️ Fila de reset {reset_id} sin rango en economy_resets")
+            inicio = reset_id
+        _sum_balances(cursor, inicio, hasta)
+
+        cursor.execute("""
+            DELETE FROM transactions
+            WHERE id > %s AND id <= %s AND type <> 'reset'
+        """, (desde, hasta))
+        movidas = cursor.rowcount
+        cursor.execute("UPDATE transaction_archive_state SET archived_through = %s WHERE id = 1", (hasta,))
+        conn.commit()
+        return movidas
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def archive(days: int, chunk_size: int = 5_000, pause: float = 0.5, max_seconds: float = None) -> int:
+    """Archiva las transacciones de hace más de `days` días y devuelve cuántas se movieron"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cutoff = datetime.now() - timedelta(days=days)
+    inicio = time.monotonic()
+    total = 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT archived_through FROM transaction_archive_state WHERE id = 1")
+        (desde,) = cursor.fetchone()
+
+        terminado = False
+        while not terminado:
+            if max_seconds is not None and time.monotonic() - inicio >= max_seconds:
+                logger.info("⏸️ Tiempo máximo alcanzado; la próxima ejecución sigue donde se quedó")
+                break
+            hasta, terminado = _chunk_bounds(cursor, desde, cutoff, chunk_size)
+            if hasta == desde:
+                break
+            meses = _ensure_archive_tables(cursor, desde, hasta)
+            total += archive_chunk(conn, desde, hasta, meses)
+            desde = hasta
+            logger.info(f"📦 {total:,} transacciones archivadas (id ≤ {desde:,}) en {time.monotonic() - inicio:.0f}s")
+            # Pausa entre bloques para dejar paso a las escrituras del bot
+            time.sleep(pause)
+        cursor.close()
+
+        logger.info(f"✅ Archivo terminado: {total:,} transacciones anteriores a {cutoff:%Y-%m-%d} archivadas")
+        return total
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiva las transacciones antiguas en tablas mensuales")
+    parser.add_argument("--days", type=int, default=90, help="días de historial que se quedan en transactions")
+    parser.add_argument("--chunk-size", type=int, default=5_000, help="filas por bloque")
+    parser.add_argument("--pause", type=float, default=0.5, help="segundos de pausa entre bloques")
+    parser.add_argument("--max-seconds", type=float, default=None, help="detenerse tras este tiempo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    archive(args.days, args.chunk_size, args.pause, args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
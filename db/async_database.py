@@ -0,0 +1,885 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from mysql.connector import Error, IntegrityError, errorcode
+
+from config import (
+    DB_POOL_SIZE, DB_KNOWN_USERS_MAX, STARTING_CREDITS, RANGOS,
+    LEDGER_BATCH_SIZE, LEDGER_FLUSH_INTERVAL, LEDGER_MAX_BUFFER,
+    BALANCE_CACHE_SIZE, BALANCE_CACHE_TTL, SLOW_QUERY_MS, IDEMPOTENCY_KEY_TTL_HOURS, IDEMPOTENCY_PURGE_INTERVAL,
+    LEADERBOARD_RESYNC_INTERVAL, NAME_CACHE_SIZE, NAME_CACHE_TTL
+)
+from db.archive import ARCHIVE_PREFIX
+from db.backends import create_backend
+from db.cache import BalanceCache
+from db.leaderboard import Leaderboard
+from db.ledger import LedgerWriter
+from db.metrics import QueryMetrics, timed
+from db.names import NameCache
+from db.pool import is_connection_error
+from game.blackjack_game import decode_hand, encode_hand
+
+logger = logging.getLogger(__name__)
+
+
+class CreditLeg(NamedTuple):
+    """Un movimiento de créditos dentro de `move_credits`"""
+    user_id: int
+    amount: int
+    transaction_type: str = "transfer"
+    game_type: str = ""
+    details: str = ""
+
+
+class BetReservation(NamedTuple):
+    """Resultado de `place_bet`"""
+    accepted: bool
+    balance: int
+    replay: bool = False  # la clave de idempotencia ya se había usado
+
+
+class Settlement(NamedTuple):
+    """Resultado de `settle_bet`"""
+    balance: int
+    replay: bool = False  # la clave de idempotencia ya se había usado
+
+
+class CreditUpdate(NamedTuple):
+    """Resultado de `update_credits`"""
+    balance: Optional[int]  # None si el usuario no existe
+    replay: bool = False  # la clave de idempotencia ya se había usado
+
+
+class BlackjackHand(NamedTuple):
+    """Mano de blackjack que `settle_bet` guarda junto con el pago"""
+    result: str
+    payout: int
+    player_hand: List[str]
+    dealer_hand: List[str]
+
+
+def _rango_case() -> str:
+    """Expresión SQL que calcula el rango a partir de `credits` según config.RANGOS"""
+    umbrales = sorted(((datos["min_creditos"], rango_id) for rango_id, datos in RANGOS.items()), reverse=True)
+    ramas = " ".join(f"WHEN credits >= {int(minimo)} THEN {int(rango_id)}" for minimo, rango_id in umbrales)
+    return f"CASE {ramas} ELSE 0 END"
+
+
+RANGO_CASE = _rango_case()
+
+
+class AsyncDatabase:
+    """Servicio de base de datos asíncrono compartido por todo el bot.
+
+    El bot crea una sola instancia (`bot.db`) y los cogs la reciben de ahí.
+    Ningún método bloquea el event loop: cada consulta toma una conexión del
+    backend (MySQL o SQLite, ver db.backends), la usa y la devuelve. Las
+    conexiones se abren la primera vez que hacen falta, así que instanciar
+    la clase no toca el servidor.
+    """
+
+    def __init__(self, pool_size: int = DB_POOL_SIZE, backend=None):
+        # Motor elegido con DB_BACKEND; las consultas se escriben para MySQL
+        self.backend = backend or create_backend(pool_size=pool_size)
+        # Usuarios que ya sabemos que tienen fila en `users` (LRU acotado)
+        self._known_users = OrderedDict()
+        self.known_users_max = DB_KNOWN_USERS_MAX
+        # Historial de transacciones con escritura diferida
+        self.ledger = LedgerWriter(self, LEDGER_BATCH_SIZE, LEDGER_FLUSH_INTERVAL, LEDGER_MAX_BUFFER)
+        # Balances recientes; cada operación de créditos lo mantiene al día
+        self.balances = BalanceCache(BALANCE_CACHE_SIZE, BALANCE_CACHE_TTL)
+        # Latencias por método; los que superan SLOW_QUERY_MS van al log
+        self.metrics = QueryMetrics(SLOW_QUERY_MS)
+        # Sentencias de cada apuesta, preparadas una vez por conexión
+        self.statements = self.backend.statements
+        # Si `users` tiene las columnas de estadísticas (ver detect_schema)
+        self.stats_columns = True
+        # Orden por créditos de todos los usuarios, al día con cada balance nuevo
+        self.leaderboard = Leaderboard()
+        self._leaderboard_task: Optional[asyncio.Task] = None
+        self._leaderboard_wakeup = asyncio.Event()
+        # Última limpieza de claves de idempotencia (la hace el mismo bucle)
+        self._last_purge: Optional[float] = None
+        # Nombres para mostrar (persistidos en `user_names`)
+        self.names = NameCache(NAME_CACHE_SIZE, NAME_CACHE_TTL)
+        # Funciones (user_id, balance_anterior, balance_nuevo) avisadas de cada
+        # balance nuevo; el anterior es None si no estaba en el caché
+        self.balance_listeners: List[Callable[[int, Optional[int], int], None]] = []
+
+    async def close(self):
+        """Vuelca el historial pendiente y cierra todas las conexiones"""
+        if self._leaderboard_task is not None:
+            self._leaderboard_task.cancel()
+            self._leaderboard_task = None
+        await self.ledger.close()
+        await self.backend.close()
+
+    def connection(self):
+        """Presta una conexión del backend durante el bloque `async with`"""
+        return self.backend.connection()
+
+    def pool_stats(self) -> dict:
+        """Tamaño y uso del pool de conexiones (una sola con SQLite)"""
+        return self.backend.stats()
+
+    @staticmethod
+    def _balance_from(result) -> int:
+        """Balance que dejó `LAST_INSERT_ID(credits ...)` en la respuesta del UPDATE"""
+        value = result.lastrowid or 0
+        # LAST_INSERT_ID es BIGINT UNSIGNED: los saldos negativos llegan envueltos
+        return value - 2**64 if value >= 2**63 else value
+
+    async def _read(self, query: str, params: tuple = (), fetch_all: bool = False, dictionary: bool = False):
+        """Ejecuta una consulta de solo lectura.
+
+        Si la conexión se cayó, el pool ya la descartó: como la lectura es
+        idempotente se reintenta una vez con otra conexión.
+        """
+        for attempt in range(2):
+            try:
+                async with self.connection() as conn:
+                    async with await conn.cursor(dictionary=dictionary) as cursor:
+                        await cursor.execute(query, params)
+                        if fetch_all:
+                            return await cursor.fetchall()
+                        return await cursor.fetchone()
+            except Exception as e:
+                if attempt == 0 and is_connection_error(e):
+                    logger.warning("🔌 Reintentando lectura tras perder la conexión")
+                    continue
+                raise
+
+    def _balance_changed(self, user_id: int, balance: int):
+        """Punto único por el que pasa todo balance nuevo conocido"""
+        # La caché caduca y expulsa entradas; la lista en memoria tiene a todos
+        anterior = self.leaderboard.credits(user_id)
+        if anterior is None:
+            anterior = self.balances.peek(user_id)
+        self.balances.set(user_id, balance)
+        self.leaderboard.update(user_id, balance)
+        if self.leaderboard.stale:
+            self._leaderboard_wakeup.set()
+        for listener in self.balance_listeners:
+            listener(user_id, anterior, balance)
+
+    # --- Usuarios conocidos ---
+
+    def _mark_known(self, user_id: int):
+        self._known_users[user_id] = True
+        self._known_users.move_to_end(user_id)
+        if len(self._known_users) > self.known_users_max:
+            self._known_users.popitem(last=False)
+
+    def _is_known(self, user_id: int) -> bool:
+        if user_id in self._known_users:
+            self._known_users.move_to_end(user_id)
+            return True
+        return False
+
+    @timed
+    async def detect_schema(self):
+        """Comprueba una vez al arrancar qué columnas opcionales tiene `users`"""
+        try:
+            columnas = await self.backend.columns("users")
+        except Error as e:
+            logger.error(f"❌ No se pudo leer el esquema de users: {e}")
+            return
+        self.stats_columns = {"games_played", "games_won", "total_winnings"} <= columnas
+        if not self.stats_columns:
+            logger.warning("⚠️ La tabla users no tiene columnas de estadísticas; no se registrarán partidas")
+
+    async def _add_credits(self, conn, user_id: int, amount: int, resultado: str = None, ganancia: int = 0):
+        """Suma `amount` y, si es una partida ('win'/'loss'), sus estadísticas en el mismo UPDATE"""
+        if resultado == "win" and self.stats_columns:
+            return await self.statements.execute(conn, "credits_win", (amount, ganancia, user_id))
+        if resultado == "loss" and self.stats_columns:
+            return await self.statements.execute(conn, "credits_loss", (amount, user_id))
+        return await self.statements.execute(conn, "add_credits", (amount, user_id))
+
+    async def _claim(self, conn, key: str, user_id: int, balance: Optional[int]) -> Tuple[bool, Optional[int]]:
+        """Registra la clave de idempotencia y confirma la transacción abierta.
+
+        Si la clave ya estaba registrada, la operación se aplicó antes: se
+        deshace la transacción y se devuelve (False, balance_original).
+        """
+        try:
+            await self.statements.execute(conn, "claim_key", (key, user_id, balance))
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            await conn.rollback()
+            async with await conn.cursor() as cursor:
+                await cursor.execute("SELECT balance FROM credit_operations WHERE idempotency_key = %s", (key,))
+                row = await cursor.fetchone()
+            logger.info(f"♻️ Operación repetida ignorada: {key}")
+            return False, row[0] if row else None
+        await conn.commit()
+        return True, balance
+
+    @timed
+    async def load_known_users(self):
+        """Precarga los usuarios existentes (hasta el límite del caché)"""
+        try:
+            rows = await self._read("SELECT user_id FROM users LIMIT %s", (self.known_users_max,), fetch_all=True)
+            for (user_id,) in rows:
+                self._mark_known(user_id)
+            logger.info(f"✅ {len(self._known_users)} usuarios conocidos precargados")
+        except Error as e:
+            logger.error(f"❌ Error precargando usuarios: {e}")
+
+    @timed
+    async def ensure_user(self, user_id: int):
+        """Crea la fila del usuario si no existe (no hace nada si ya lo conocemos)"""
+        if self._is_known(user_id):
+            return
+        async with self.connection() as conn:
+            try:
+                async with await conn.cursor() as cursor:
+                    await cursor.execute("""
+                        INSERT IGNORE INTO users (user_id, credits)
+                        VALUES (%s, %s)
+                    """, (user_id, STARTING_CREDITS))
+                self._mark_known(user_id)
+            except Error as e:
+                logger.error(f"❌ Error asegurando usuario: {e}")
+                raise
+
+    @timed
+    async def get_credits(self, user_id: int) -> int:
+        """Balance del usuario, desde el caché o con un único SELECT por clave primaria.
+
+        Solo si el usuario no tiene fila todavía se crea con STARTING_CREDITS.
+        No se usa un upsert (INSERT ... ON DUPLICATE KEY UPDATE) que cree y
+        lea a la vez: sería una escritura con bloqueo de fila en cada lectura,
+        cuando casi siempre el usuario ya existe. Además, distinguir si insertó
+        depende de las filas afectadas, que cambian si la conexión activa
+        CLIENT_FOUND_ROWS (el conector no lo activa por defecto).
+        """
+        balance = self.balances.get(user_id)
+        if balance is not None:
+            return balance
+        # Un balance escrito mientras se espera el SELECT es más nuevo que él
+        ticket = self.balances.begin_read(user_id)
+        try:
+            result = await self._read("SELECT credits FROM users WHERE user_id = %s", (user_id,))
+            if result:
+                self._mark_known(user_id)
+                self.balances.fill(user_id, result[0], ticket)
+                return result[0]
+
+            # Usuario nuevo. El INSERT IGNORE puede perder contra otra
+            # inserción (y sus apuestas), así que el saldo se vuelve a leer
+            self._known_users.pop(user_id, None)
+            await self.ensure_user(user_id)
+            result = await self._read("SELECT credits FROM users WHERE user_id = %s", (user_id,))
+            balance = result[0] if result else STARTING_CREDITS
+            if self.balances.unchanged_since(user_id, ticket):
+                self._balance_changed(user_id, balance)
+            return balance
+        except Error as e:
+            logger.error(f"❌ Error obteniendo créditos: {e}")
+            raise
+
+    @timed
+    async def update_credits(self, user_id: int, amount: int, transaction_type: str = "game", game_type: str = "",
+                             details: str = "", idempotency_key: str = None) -> CreditUpdate:
+        """Suma `amount` (negativo para cobrar) al balance del usuario.
+
+        Devuelve (balance, repetida). Con `idempotency_key` (p. ej. el id de
+        la interacción) la operación se aplica una sola vez: si la clave ya
+        se usó no cambia nada y devuelve el balance que dejó la primera con
+        `repetida` a True.
+        """
+        await self.ensure_user(user_id)  # Sin coste si ya lo conocemos
+        resultado = None
+        if transaction_type in ['win', 'loss']:
+            resultado = "win" if amount > 0 else "loss"
+        async with self.connection() as conn:
+            try:
+                if idempotency_key:
+                    await conn.start_transaction()
+                # Créditos y estadísticas en un solo UPDATE (LAST_INSERT_ID devuelve el balance)
+                result = await self._add_credits(conn, user_id, amount, resultado, amount)
+                balance = self._balance_from(result) if result.rowcount else None
+                if idempotency_key:
+                    nueva, original = await self._claim(conn, idempotency_key, user_id, balance)
+                    if not nueva:
+                        return CreditUpdate(original, replay=True)
+            except Error as e:
+                logger.error(f"❌ Error actualizando créditos: {e}")
+                self.balances.invalidate(user_id)
+                raise
+
+        if balance is not None:
+            self._balance_changed(user_id, balance)
+
+        # Registrar transacción (escritura diferida)
+        await self.ledger.record(user_id, transaction_type, amount, game_type, details)
+        return CreditUpdate(balance)
+
+    @timed
+    async def place_bet(self, user_id: int, bet: int, idempotency_key: str = None) -> BetReservation:
+        """Reserva una apuesta descontándola solo si el saldo alcanza.
+
+        Devuelve (aceptada, balance, repetida). El descuento es un único
+        UPDATE condicional, así que dos clics simultáneos no pueden gastar el
+        mismo saldo. Si la apuesta no se acepta, `balance` es el saldo
+        actual. Con `idempotency_key`, repetir la reserva no descuenta otra
+        vez: devuelve el balance de la primera con `repetida` a True, y quien
+        llama no debe jugar la partida de nuevo.
+        """
+        for _ in range(2):
+            async with self.connection() as conn:
+                try:
+                    if idempotency_key:
+                        await conn.start_transaction()
+                    result = await self.statements.execute(conn, "place_bet", (bet, user_id, bet))
+                    if result.rowcount:
+                        self._mark_known(user_id)
+                        balance = self._balance_from(result)
+                        if idempotency_key:
+                            nueva, original = await self._claim(conn, idempotency_key, user_id, balance)
+                            if not nueva:
+                                return BetReservation(True, original, replay=True)
+                        self._balance_changed(user_id, balance)
+                        return BetReservation(True, balance)
+                    if idempotency_key:
+                        await conn.rollback()
+                except Error as e:
+                    logger.error(f"❌ Error reservando apuesta: {e}")
+                    raise
+
+            # Saldo insuficiente o usuario nuevo: get_credits crea el usuario
+            # si hace falta y, si ahora le alcanza, se reintenta una vez.
+            # Se lee de la tabla, no del caché, porque el UPDATE ya falló.
+            self.balances.invalidate(user_id)
+            balance = await self.get_credits(user_id)
+            if balance < bet:
+                break
+        return BetReservation(False, balance)
+
+    @timed
+    async def settle_bet(self, user_id: int, bet: int, payout: int, game_type: str, details: str = "",
+                         idempotency_key: str = None, hand: Optional[BlackjackHand] = None) -> Settlement:
+        """Liquida una apuesta reservada con `place_bet`.
+
+        Devuelve (balance, repetida). `payout` es lo que se devuelve al
+        jugador (0 si pierde, `bet` si empata). El pago y las estadísticas
+        van en un único UPDATE; la fila del historial va al ledger diferido.
+        Con `idempotency_key` (p. ej. el id del mensaje de la partida) una
+        liquidación repetida no paga otra vez: devuelve el balance que dejó
+        la primera con `repetida` a True, y el resultado que se pasó ahora no
+        cuenta. `hand` se guarda en `blackjack_sessions` en la misma
+        transacción que el pago.
+        """
+        net = payout - bet
+        transaction_type = "win" if net > 0 else "loss" if net < 0 else "draw"
+        duplicada = False
+        async with self.connection() as conn:
+            try:
+                if idempotency_key or hand:
+                    await conn.start_transaction()
+                resultado = transaction_type if net else None
+                result = await self._add_credits(conn, user_id, payout, resultado, net)
+                balance = self._balance_from(result) if result.rowcount else None
+                if hand:
+                    await self.statements.execute(conn, "save_hand", (
+                        user_id, bet, hand.result, hand.payout,
+                        encode_hand(hand.player_hand), encode_hand(hand.dealer_hand)
+                    ))
+                if idempotency_key:
+                    nueva, original = await self._claim(conn, idempotency_key, user_id, balance)
+                    if not nueva:
+                        duplicada = True
+                        balance = original
+                elif hand:
+                    await conn.commit()
+            except Error as e:
+                logger.error(f"❌ Error liquidando apuesta: {e}")
+                self.balances.invalidate(user_id)
+                raise
+
+        if duplicada:
+            return Settlement(balance if balance is not None else await self.get_credits(user_id), replay=True)
+        if balance is None:
+            # El usuario no tenía fila: no hay balance que devolver del UPDATE
+            balance = await self.get_credits(user_id)
+        else:
+            self._balance_changed(user_id, balance)
+
+        # Registrar transacción (escritura diferida)
+        await self.ledger.record(user_id, transaction_type, net, game_type, details, wagered=bet, paid=payout)
+        return Settlement(balance)
+
+    @timed
+    async def move_credits(self, legs: Iterable[CreditLeg], check_funds: bool = False,
+                           idempotency_key: str = None) -> Optional[Dict[int, int]]:
+        """Aplica varios movimientos de créditos en una sola transacción.
+
+        Las filas de todos los participantes se bloquean una sola vez y en
+        orden de user_id, así dos operaciones cruzadas no se bloquean entre
+        sí. Con `check_funds` la operación se cancela entera si algún saldo
+        quedaría negativo. Devuelve {user_id: balance_nuevo}, o None si se
+        canceló por falta de fondos. Con `idempotency_key` los movimientos se
+        aplican una sola vez: si la clave ya se usó no cambia nada y devuelve
+        un dict vacío.
+        """
+        legs = [CreditLeg(*leg) for leg in legs]
+        netos: Dict[int, int] = {}
+        partidas: Dict[int, Tuple[int, int, int]] = {}  # (jugadas, ganadas, ganancias)
+        for leg in legs:
+            netos[leg.user_id] = netos.get(leg.user_id, 0) + leg.amount
+            if leg.transaction_type in ['win', 'loss']:
+                jugadas, ganadas, ganancias = partidas.get(leg.user_id, (0, 0, 0))
+                if leg.amount > 0:
+                    partidas[leg.user_id] = (jugadas + 1, ganadas + 1, ganancias + leg.amount)
+                else:
+                    partidas[leg.user_id] = (jugadas + 1, ganadas, ganancias)
+        user_ids = sorted(netos)
+
+        for user_id in user_ids:
+            await self.ensure_user(user_id)  # Sin coste si ya lo conocemos
+
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        async with self.connection() as conn:
+            try:
+                await conn.start_transaction()
+                async with await conn.cursor() as cursor:
+                    await cursor.execute(f"""
+                        SELECT user_id, credits FROM users
+                        WHERE user_id IN ({placeholders})
+                        ORDER BY user_id
+                        FOR UPDATE
+                    """, tuple(user_ids))
+                    actuales = dict(await cursor.fetchall())
+                    nuevos = {uid: actuales.get(uid, 0) + netos[uid] for uid in user_ids}
+
+                    if check_funds and any(nuevos[uid] < 0 for uid in user_ids if netos[uid] < 0):
+                        await conn.rollback()
+                        return None
+
+                # Un UPDATE por usuario con su neto y las estadísticas de sus partidas
+                for user_id in user_ids:
+                    jugadas, ganadas, ganancias = partidas.get(user_id, (0, 0, 0))
+                    if jugadas and self.stats_columns:
+                        await self.statements.execute(
+                            conn, "move_credits", (netos[user_id], jugadas, ganadas, ganancias, user_id)
+                        )
+                    elif netos[user_id]:
+                        await self.statements.execute(conn, "add_credits", (netos[user_id], user_id))
+
+                if idempotency_key:
+                    primero = user_ids[0]
+                    nueva, _ = await self._claim(conn, idempotency_key, primero, nuevos[primero])
+                    if not nueva:
+                        return {}
+                else:
+                    await conn.commit()
+            except Error as e:
+                logger.error(f"❌ Error moviendo créditos: {e}")
+                await conn.rollback()
+                for user_id in user_ids:
+                    self.balances.invalidate(user_id)
+                raise
+
+        for user_id in user_ids:
+            self._balance_changed(user_id, nuevos[user_id])
+
+        # Registrar transacciones (escritura diferida)
+        for leg in legs:
+            await self.ledger.record(leg.user_id, leg.transaction_type, leg.amount, leg.game_type, leg.details)
+        return nuevos
+
+    @timed
+    async def reset_economy(self, credits: int = STARTING_CREDITS, chunk_size: int = 1000,
+                            progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+                            progress_interval: float = 2.0) -> Tuple[int, int]:
+        """Fija el balance de todos los usuarios a `credits`.
+
+        Recorre `users` por rangos de clave primaria de `chunk_size` filas y
+        actualiza cada rango con un único UPDATE en su propia transacción.
+        En esa misma transacción deja una fila resumen en el historial (user_id
+        0, tipo 'reset') y su rango en `economy_resets`, que es de donde lo
+        leen db.reconcile y db.archive. `progress(hechos, total)` se llama como mucho cada
+        `progress_interval` segundos y al terminar. Devuelve (actualizados, total).
+        """
+        row = await self._read("SELECT COUNT(*) FROM users")
+        total = row[0] if row else 0
+        hechos = 0
+        ultimo_aviso = time.monotonic()
+        desde = -1  # Los user_id de Discord son siempre positivos
+        hasta = None
+
+        while True:
+            # Lo anterior al reset tiene que quedar antes que él en el historial
+            await self.ledger.flush()
+            async with self.connection() as conn:
+                try:
+                    async with await conn.cursor() as cursor:
+                        # Límite superior del rango: la fila número `chunk_size` a partir de `desde`
+                        await cursor.execute("""
+                            SELECT MAX(user_id) FROM (
+                                SELECT user_id FROM users
+                                WHERE user_id > %s
+                                ORDER BY user_id
+                                LIMIT %s
+                            ) AS tramo
+                        """, (desde, chunk_size))
+                        (hasta,) = await cursor.fetchone()
+                        if hasta is None:
+                            break
+
+                        await conn.start_transaction()
+                        await cursor.execute("""
+                            SELECT COUNT(*), COALESCE(SUM(credits), 0) FROM users
+                            WHERE user_id > %s AND user_id <= %s
+                            FOR UPDATE
+                        """, (desde, hasta))
+                        filas, suma_anterior = await cursor.fetchone()
+                        await cursor.execute(
+                            "UPDATE users SET credits = %s WHERE user_id > %s AND user_id <= %s",
+                            (credits, desde, hasta)
+                        )
+                        # Fuera del buffer del ledger: el rango necesita el id de la fila
+                        await cursor.execute("""
+                            INSERT INTO transactions (user_id, type, amount, game_type, details)
+                            VALUES (0, 'reset', %s, 'economy_reset', %s)
+                        """, (credits * filas - int(suma_anterior),
+                              f"Restablecidos {filas} usuarios ({desde}, {hasta}] a {credits}"))
+                        await cursor.execute("""
+                            INSERT INTO economy_resets (transaction_id, user_from, user_to, credits)
+                            VALUES (%s, %s, %s, %s)
+                        """, (cursor.lastrowid, desde, hasta, credits))
+                    await conn.commit()
+                except Error as e:
+                    logger.error(f"❌ Error restableciendo créditos ({desde}, {hasta}]: {e}")
+                    await conn.rollback()
+                    raise
+
+            hechos += filas
+            desde = hasta
+
+            if progress and time.monotonic() - ultimo_aviso >= progress_interval:
+                ultimo_aviso = time.monotonic()
+                await progress(hechos, total)
+
+        # Todos los balances en memoria quedaron obsoletos
+        self.balances.invalidate()
+        self.leaderboard.invalidate()
+        await self.refresh_leaderboard()
+        if progress:
+            await progress(hechos, max(total, hechos))
+        logger.info(f"✅ Economía restablecida: {hechos} usuarios a {credits} créditos")
+        return hechos, max(total, hechos)
+
+    @timed
+    async def purge_credit_operations(self, max_age_hours: float = IDEMPOTENCY_KEY_TTL_HOURS,
+                                      chunk_size: int = 5000) -> int:
+        """Borra las claves de idempotencia más antiguas que `max_age_hours`"""
+        self._last_purge = time.monotonic()
+        borradas = 0
+        try:
+            while True:
+                async with self.connection() as conn:
+                    async with await conn.cursor() as cursor:
+                        await cursor.execute("""
+                            DELETE FROM credit_operations
+                            WHERE created_at < NOW() - INTERVAL %s HOUR
+                            LIMIT %s
+                        """, (max_age_hours, chunk_size))
+                        borradas += cursor.rowcount
+                        if cursor.rowcount < chunk_size:
+                            break
+        except Error as e:
+            logger.error(f"❌ Error borrando claves de idempotencia: {e}")
+        if borradas:
+            logger.info(f"🧹 {borradas} claves de idempotencia caducadas borradas")
+        return borradas
+
+    @timed
+    async def get_user_stats(self, user_id: int) -> dict:
+        ticket = self.balances.begin_read(user_id)
+        try:
+            stats = await self._read("""
+                SELECT credits, games_played, games_won, total_winnings
+                FROM users WHERE user_id = %s
+            """, (user_id,), dictionary=True)
+            if stats:
+                self.balances.fill(user_id, stats['credits'], ticket)
+            return stats or {}
+        except Error as e:
+            logger.error(f"❌ Error obteniendo estadísticas: {e}")
+            raise
+
+    @timed
+    async def get_blackjack_history(self, user_id: int, limit: int = 10) -> List[dict]:
+        """Últimas `limit` manos del usuario, más reciente primero, con las cartas decodificadas"""
+        rows = await self._read("""
+            SELECT bet_amount, result, payout, player_cards, dealer_cards,
+                   player_hand, dealer_hand, created_at
+            FROM blackjack_sessions
+            WHERE user_id = %s
+            ORDER BY id DESC
+            LIMIT %s
+        """, (user_id, limit), fetch_all=True, dictionary=True)
+        for row in rows:
+            # Las partidas anteriores a la codificación compacta solo tienen el texto
+            row["player_hand"] = decode_hand(row.pop("player_cards") or row["player_hand"])
+            row["dealer_hand"] = decode_hand(row.pop("dealer_cards") or row["dealer_hand"])
+        return rows
+
+    @timed
+    async def get_transactions(self, user_id: int, before_id: int = None, limit: int = 10) -> List[dict]:
+        """Movimientos del usuario anteriores a `before_id`, más reciente primero.
+
+        Se pagina por clave (`id < before_id`) sobre el índice (user_id, id):
+        cada página cuesta lo mismo por atrás que esté, a diferencia de OFFSET.
+        """
+        desde = "AND id < %s" if before_id else ""
+        params = (user_id, before_id, limit) if before_id else (user_id, limit)
+        return await self._read(f"""
+            SELECT id, type, amount, game_type, details, created_at
+            FROM transactions
+            WHERE user_id = %s {desde}
+            ORDER BY id DESC
+            LIMIT %s
+        """, params, fetch_all=True, dictionary=True)
+
+    @timed
+    async def get_transactions_after(self, user_id: int, after_id: int, limit: int, table: str = "transactions") -> list:
+        """Movimientos del usuario posteriores a `after_id`, más antiguo primero (tuplas)"""
+        return await self._read(f"""
+            SELECT id, created_at, type, amount, game_type, details
+            FROM {table}
+            WHERE user_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (user_id, after_id, limit), fetch_all=True)
+
+    @timed
+    async def get_archive_tables(self) -> List[str]:
+        """Tablas mensuales de db.archive, de la más antigua a la más reciente"""
+        return await self.backend.tables(ARCHIVE_PREFIX)
+
+    @timed
+    async def iter_transactions(self, user_id: int, chunk_size: int = 5000):
+        """Recorre todo el historial del usuario por bloques de `chunk_size` filas.
+
+        Empieza por las tablas de archivo y termina en `transactions`. Cada
+        bloque es una consulta corta: no se retiene una conexión del pool
+        mientras quien itera escribe las filas.
+        """
+        for table in await self.get_archive_tables() + ["transactions"]:
+            ultimo = 0
+            while True:
+                filas = await self.get_transactions_after(user_id, ultimo, chunk_size, table)
+                for fila in filas:
+                    yield fila
+                if len(filas) < chunk_size:
+                    break
+                ultimo = filas[-1][0]
+
+    @timed
+    async def get_game_rollups(self, hours: int = 24) -> List[dict]:
+        """Totales por juego de las últimas `hours` horas, leídos de los acumulados por hora.
+
+        `players` es el máximo de usuarios distintos en una misma hora: los
+        usuarios de horas distintas no se pueden sumar sin contarlos dos veces.
+        """
+        desde = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        return await self._read("""
+            SELECT game_type, SUM(count) AS count, SUM(wagered) AS wagered,
+                   SUM(paid) AS paid, MAX(distinct_users) AS players
+            FROM game_rollups
+            WHERE hour >= %s
+            GROUP BY game_type
+            ORDER BY wagered DESC
+        """, (desde,), fetch_all=True, dictionary=True)
+
+    # --- Rangos y leaderboard ---
+
+    @timed
+    async def sync_rangos(self, user_ids: Iterable[int] = None) -> List[Tuple[int, int, int]]:
+        """Recalcula el rango de todos los usuarios (o de `user_ids`) en un único UPDATE.
+
+        Devuelve (user_id, rango_anterior, rango_nuevo) de los que subieron,
+        para pagar sus bonos de una vez.
+        """
+        filtro, params = "", ()
+        if user_ids is not None:
+            user_ids = tuple(set(user_ids))
+            if not user_ids:
+                return []
+            filtro = f"AND user_id IN ({', '.join(['%s'] * len(user_ids))})"
+            params = user_ids
+
+        async with self.connection() as conn:
+            try:
+                await conn.start_transaction()
+                async with await conn.cursor() as cursor:
+                    # Los rangos anteriores se leen con las filas ya bloqueadas
+                    await cursor.execute(f"""
+                        SELECT user_id, rango, {RANGO_CASE} AS nuevo
+                        FROM users
+                        WHERE rango <> {RANGO_CASE} {filtro}
+                        FOR UPDATE
+                    """, params)
+                    cambios = await cursor.fetchall()
+                    if cambios:
+                        await cursor.execute(f"""
+                            UPDATE users SET rango = {RANGO_CASE}
+                            WHERE rango <> {RANGO_CASE} {filtro}
+                        """, params)
+                await conn.commit()
+            except Error as e:
+                logger.error(f"❌ Error sincronizando rangos: {e}")
+                raise
+
+        return [(user_id, anterior, nuevo) for user_id, anterior, nuevo in cambios if nuevo > anterior]
+
+    @timed
+    async def get_top_users(self, limit: int = 10, by_rango: bool = False) -> List[dict]:
+        """Usuarios con más créditos (o con mayor rango si `by_rango`)"""
+        order = "rango DESC, credits DESC" if by_rango else "credits DESC"
+        return await self._read(f"""
+            SELECT user_id, credits, rango
+            FROM users
+            WHERE credits > 0
+            ORDER BY {order}
+            LIMIT %s
+        """, (limit,), fetch_all=True, dictionary=True)
+
+    @timed
+    async def refresh_leaderboard(self):
+        """Vuelve a sembrar el leaderboard en memoria con una sola consulta"""
+        self.leaderboard.begin_resync()
+        try:
+            rows = await self._read("""
+                SELECT user_id, credits
+                FROM users
+                WHERE credits > 0
+            """, fetch_all=True)
+        except Error as e:
+            self.leaderboard.cancel_resync()
+            logger.error(f"❌ Error cargando el leaderboard: {e}")
+            return
+        self.leaderboard.load(rows)
+
+    @timed
+    async def start_leaderboard(self, interval: float = LEADERBOARD_RESYNC_INTERVAL):
+        """Siembra el leaderboard y lo resincroniza cada `interval` segundos.
+
+        El mismo bucle borra cada IDEMPOTENCY_PURGE_INTERVAL segundos las
+        claves de idempotencia caducadas.
+        """
+        await self.refresh_leaderboard()
+        if self._leaderboard_task is None or self._leaderboard_task.done():
+            self._leaderboard_task = asyncio.create_task(self._leaderboard_loop(interval))
+        logger.info(f"✅ Leaderboard en memoria con {self.leaderboard.stats()['size']} usuarios")
+
+    async def _leaderboard_loop(self, interval: float):
+        while True:
+            # Se adelanta si la lista se invalidó o no se pudo cargar
+            try:
+                await asyncio.wait_for(self._leaderboard_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._leaderboard_wakeup.clear()
+            await self.refresh_leaderboard()
+            # De paso, que credit_operations no crezca sin límite
+            if self._last_purge is None or time.monotonic() - self._last_purge >= IDEMPOTENCY_PURGE_INTERVAL:
+                await self.purge_credit_operations()
+
+    # --- Nombres de usuario ---
+
+    @timed
+    async def load_user_names(self):
+        """Precarga los nombres guardados más recientes (hasta el límite del caché)"""
+        try:
+            rows = await self._read("""
+                SELECT user_id, display_name, UNIX_TIMESTAMP(updated_at)
+                FROM user_names
+                ORDER BY updated_at DESC
+                LIMIT %s
+            """, (self.names.max_size,), fetch_all=True)
+            self.names.load((user_id, name, float(saved_at)) for user_id, name, saved_at in rows)
+            logger.info(f"✅ {len(rows)} nombres de usuario precargados")
+        except Error as e:
+            logger.error(f"❌ Error precargando nombres de usuario: {e}")
+
+    @timed
+    async def save_user_names(self, names: Dict[int, str]):
+        """Guarda los nombres recién resueltos (en el caché y en la tabla)"""
+        if not names:
+            return
+        for user_id, name in names.items():
+            self.names.set(user_id, name)
+        try:
+            async with self.connection() as conn:
+                async with await conn.cursor() as cursor:
+                    await cursor.executemany("""
+                        INSERT INTO user_names (user_id, display_name)
+                        VALUES (%s, %s)
+                        ON DUPLICATE KEY UPDATE display_name = VALUES(display_name), updated_at = CURRENT_TIMESTAMP
+                    """, [(user_id, name[:100]) for user_id, name in names.items()])
+        except Error as e:
+            # Los nombres siguen en memoria; solo se pierde la copia para el próximo arranque
+            logger.error(f"❌ Error guardando nombres de usuario: {e}")
+
+    # --- Marcos de perfil ---
+
+    @timed
+    async def get_user_frames(self, user_id: int) -> Optional[Tuple[str, List[str]]]:
+        """Devuelve (marco_equipado, marcos_poseidos) o None si no tiene registro"""
+        result = await self._read("SELECT equipped_frame, owned_frames FROM user_frames WHERE user_id = %s", (user_id,))
+        if not result:
+            return None
+        owned = result[1].split(',') if result[1] else []
+        return result[0], owned
+
+    @timed
+    async def ensure_user_frames(self, user_id: int):
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute("""
+                    INSERT IGNORE INTO user_frames (user_id, equipped_frame, owned_frames)
+                    VALUES (%s, %s, %s)
+                """, (user_id, 'default', 'default'))
+
+    @timed
+    async def equip_frame(self, user_id: int, frame_id: str, owned_frames: List[str]):
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute("""
+                    INSERT INTO user_frames (user_id, equipped_frame, owned_frames)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE equipped_frame = %s
+                """, (user_id, frame_id, ','.join(owned_frames), frame_id))
+
+    @timed
+    async def add_owned_frame(self, user_id: int, frame_id: str):
+        async with self.connection() as conn:
+            await conn.start_transaction()
+            async with await conn.cursor() as cursor:
+                await cursor.execute("SELECT owned_frames FROM user_frames WHERE user_id = %s FOR UPDATE", (user_id,))
+                result = await cursor.fetchone()
+
+                if result:
+                    owned = result[0].split(',')
+                    if frame_id not in owned:
+                        owned.append(frame_id)
+                    await cursor.execute("""
+                        UPDATE user_frames
+                        SET owned_frames = %s
+                        WHERE user_id = %s
+                    """, (','.join(owned), user_id))
+                else:
+                    await cursor.execute("""
+                        INSERT INTO user_frames (user_id, equipped_frame, owned_frames)
+                        VALUES (%s, %s, %s)
+                    """, (user_id, 'default', f'default,{frame_id}'))
+            await conn.commit()
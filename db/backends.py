@@ -0,0 +1,426 @@
+"""Motores de almacenamiento de AsyncDatabase.
+
+AsyncDatabase escribe cada consulta una sola vez al estilo MySQL (`%s`,
+INSERT IGNORE, FOR UPDATE, ON DUPLICATE KEY UPDATE) y pide las conexiones
+a su backend. MySQLBackend es el pool de conexiones asíncronas de siempre;
+SQLiteBackend guarda todo en un archivo en modo WAL, sin salto de red, y
+adapta cada consulta al dialecto de SQLite. Se elige con DB_BACKEND.
+"""
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from mysql.connector import DatabaseError, IntegrityError, errorcode
+
+from config import DB_BACKEND, DB_CONFIG, DB_POOL_SIZE, SQLITE_PATH, STARTING_CREDITS
+from db.migrations import REQUIRED_INDEXES
+from db.pool import ConnectionPool
+from db.statements import CursorStatements, PreparedStatements
+
+logger = logging.getLogger(__name__)
+
+
+class MySQLBackend:
+    """Servidor MySQL a través del pool de conexiones asíncronas"""
+
+    name = "mysql"
+
+    def __init__(self, pool_size: int = DB_POOL_SIZE, config: dict = None):
+        # Autocommit: cada sentencia suelta se confirma sola, sin un COMMIT
+        # extra. Las operaciones de varias sentencias abren su transacción.
+        self.pool = ConnectionPool(pool_size, autocommit=True, **(config or DB_CONFIG))
+        # Sentencias de cada apuesta, preparadas una vez por conexión
+        self.statements = PreparedStatements()
+
+    def connection(self):
+        return self.pool.connection()
+
+    def stats(self) -> dict:
+        return self.pool.stats()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def columns(self, table: str) -> set:
+        """Columnas de `table`, en minúsculas"""
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute("""
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_schema = DATABASE() AND table_name = %s
+                """, (table,))
+                return {row[0].lower() for row in await cursor.fetchall()}
+
+    async def tables(self, prefix: str) -> List[str]:
+        """Tablas cuyo nombre empieza por `prefix`, ordenadas"""
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute("""
+                    SELECT table_name FROM information_schema.tables
+                    WHERE table_schema = DATABASE() AND table_name LIKE %s
+                """, (prefix.replace("_", "\\_") + "%",))
+                return sorted(row[0] for row in await cursor.fetchall())
+
+
+# --- SQLite ---
+
+# Las fechas se guardan como texto ISO en hora local, como las guarda MySQL
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+for _tipo in ("TIMESTAMP", "DATETIME"):
+    sqlite3.register_converter(_tipo, lambda value: datetime.fromisoformat(value.decode()))
+
+_AHORA = "datetime('now', 'localtime')"
+
+# Esquema completo (el de la última migración de MySQL). Las tablas de
+# db.archive no están: el archivo y la conciliación son solo para MySQL
+_SQLITE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER NOT NULL PRIMARY KEY,
+        credits INTEGER NOT NULL DEFAULT {STARTING_CREDITS},
+        games_played INTEGER NOT NULL DEFAULT 0,
+        games_won INTEGER NOT NULL DEFAULT 0,
+        total_winnings INTEGER NOT NULL DEFAULT 0,
+        rango INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT ({_AHORA})
+    );
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        game_type TEXT NOT NULL DEFAULT '',
+        details TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMP NOT NULL DEFAULT ({_AHORA})
+    );
+    CREATE TABLE IF NOT EXISTS blackjack_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        bet_amount INTEGER NOT NULL,
+        result TEXT NOT NULL,
+        payout INTEGER NOT NULL,
+        player_hand TEXT,
+        dealer_hand TEXT,
+        player_cards BLOB,
+        dealer_cards BLOB,
+        created_at TIMESTAMP NOT NULL DEFAULT ({_AHORA})
+    );
+    CREATE TABLE IF NOT EXISTS user_frames (
+        user_id INTEGER NOT NULL PRIMARY KEY,
+        equipped_frame TEXT NOT NULL DEFAULT 'default',
+        owned_frames TEXT
+    );
+    CREATE TABLE IF NOT EXISTS credit_operations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        user_id INTEGER NOT NULL,
+        balance INTEGER,
+        created_at TIMESTAMP NOT NULL DEFAULT ({_AHORA})
+    );
+    CREATE INDEX IF NOT EXISTS idx_credit_operations_created ON credit_operations (created_at);
+    CREATE TABLE IF NOT EXISTS game_rollups (
+        hour DATETIME NOT NULL,
+        game_type TEXT NOT NULL,
+        type TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        wagered INTEGER NOT NULL DEFAULT 0,
+        paid INTEGER NOT NULL DEFAULT 0,
+        distinct_users INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hour, game_type, type)
+    );
+    CREATE TABLE IF NOT EXISTS game_rollup_users (
+        hour DATETIME NOT NULL,
+        game_type TEXT NOT NULL,
+        type TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (hour, game_type, type, user_id)
+    );
+    CREATE TABLE IF NOT EXISTS user_names (
+        user_id INTEGER NOT NULL PRIMARY KEY,
+        display_name TEXT NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT ({_AHORA})
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_names_updated ON user_names (updated_at);
+    CREATE TABLE IF NOT EXISTS economy_resets (
+        transaction_id INTEGER NOT NULL PRIMARY KEY,
+        user_from INTEGER NOT NULL,
+        user_to INTEGER NOT NULL,
+        credits INTEGER NOT NULL
+    );
+""" + "".join(
+    f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns});\n"
+    for table, index, columns in REQUIRED_INDEXES
+)
+
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_COLUMN = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_LAST_INSERT_ID = re.compile(r"(\w+) = LAST_INSERT_ID\(([^()]*)\)", re.IGNORECASE)
+_NOW_MINUS_HOURS = re.compile(r"NOW\(\)\s*-\s*INTERVAL\s+\?\s+HOUR", re.IGNORECASE)
+_UNIX_TIMESTAMP = re.compile(r"\bUNIX_TIMESTAMP\((\w+)\)", re.IGNORECASE)
+_DELETE_LIMIT = re.compile(r"^\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.*?)\s+LIMIT\s+\?\s*$", re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=256)
+def _to_sqlite(query: str) -> Tuple[str, bool]:
+    """Traduce una consulta escrita para MySQL al dialecto de SQLite.
+
+    Devuelve (consulta, con_returning): el balance que MySQL deja en
+    LAST_INSERT_ID(expr) se pide en SQLite con RETURNING.
+    """
+    partes = _ON_DUPLICATE.split(query, maxsplit=1)
+    if len(partes) == 2:
+        query = partes[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_COLUMN.sub(r"excluded.\1", partes[1])
+    query = query.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE")
+    # BEGIN IMMEDIATE ya tomó el bloqueo de escritura de toda la base
+    query = _FOR_UPDATE.sub("", query)
+    query = query.replace("GREATEST(", "MAX(").replace("CURRENT_TIMESTAMP", _AHORA)
+    query = _NOW_MINUS_HOURS.sub(f"datetime('now', 'localtime', '-' || ? || ' hours')", query)
+    query = _UNIX_TIMESTAMP.sub(r"CAST(strftime('%s', \1, 'utc') AS INTEGER)", query)
+    # DELETE ... LIMIT solo existe si SQLite se compiló con esa opción
+    query = _DELETE_LIMIT.sub(r"DELETE FROM \1 WHERE rowid IN (SELECT rowid FROM \1 WHERE \2 LIMIT ?)", query)
+
+    match = _LAST_INSERT_ID.search(query)
+    if match:
+        query = _LAST_INSERT_ID.sub(r"\1 = \2", query) + f" RETURNING {match.group(1)}"
+        return query, True
+    return query, False
+
+
+def _as_connector_error(error: sqlite3.Error) -> DatabaseError:
+    """Error de sqlite3 con el tipo del conector, para que AsyncDatabase lo trate igual"""
+    if isinstance(error, sqlite3.IntegrityError):
+        duplicada = getattr(error, "sqlite_errorname", "") in ("SQLITE_CONSTRAINT_UNIQUE", "SQLITE_CONSTRAINT_PRIMARYKEY")
+        return IntegrityError(msg=str(error), errno=errorcode.ER_DUP_ENTRY if duplicada else None)
+    # Nunca es un error de conexión: no hay servidor que se pueda caer
+    return DatabaseError(msg=str(error), errno=getattr(error, "sqlite_errorcode", 0) or 0)
+
+
+class _SQLiteCursor:
+    """Cursor asíncrono con la interfaz del conector de MySQL.
+
+    Cada `execute` va al hilo de SQLite y trae ya todas las filas, así que
+    `fetchone`/`fetchall` no vuelven a salir del event loop.
+    """
+
+    def __init__(self, backend: "SQLiteBackend", dictionary: bool = False):
+        self._backend = backend
+        self._dictionary = dictionary
+        self._rows: list = []
+        self._next = 0
+        self.rowcount = -1
+        self.lastrowid: Optional[int] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def execute(self, query: str, params: tuple = ()):
+        await self._run(query, params, many=False)
+
+    async def executemany(self, query: str, seq_params):
+        await self._run(query, list(seq_params), many=True)
+
+    async def _run(self, query: str, params, many: bool):
+        filas, columnas, self.rowcount, self.lastrowid = await self._backend.run(
+            self._backend._execute, query, params, many
+        )
+        if columnas and self._dictionary:
+            filas = [dict(zip(columnas, fila)) for fila in filas]
+        self._rows, self._next = filas, 0
+
+    async def fetchone(self):
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    async def fetchall(self):
+        filas = self._rows[self._next:]
+        self._next = len(self._rows)
+        return filas
+
+    async def close(self):
+        self._rows = []
+
+
+class _SQLiteConnection:
+    """La conexión de SQLite con la interfaz de una conexión del pool de MySQL"""
+
+    def __init__(self, backend: "SQLiteBackend"):
+        self._backend = backend
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._backend._conn.in_transaction
+
+    async def cursor(self, dictionary: bool = False) -> _SQLiteCursor:
+        return _SQLiteCursor(self._backend, dictionary)
+
+    async def start_transaction(self):
+        # IMMEDIATE: el bloqueo de escritura se toma al empezar, no en el primer UPDATE
+        await self._backend.run(self._backend._conn.execute, "BEGIN IMMEDIATE")
+
+    async def commit(self):
+        await self._backend.run(self._backend._finish, "COMMIT")
+
+    async def rollback(self):
+        await self._backend.run(self._backend._finish, "ROLLBACK")
+
+
+class SQLiteBackend:
+    """Base de datos embebida en un archivo, en modo WAL.
+
+    Pensado para servidores pequeños y pruebas de carga en una sola
+    máquina. Hay una única conexión, usada siempre desde el mismo hilo para
+    no bloquear el event loop; se presta entera a un bloque `async with` a
+    la vez, como un pool de tamaño 1, porque SQLite solo admite un escritor.
+    Con WAL y synchronous=NORMAL cada commit solo añade al log, sin fsync,
+    así que las escrituras sueltas son baratas y el historial ya se agrupa
+    en el ledger; una caída del sistema (no del proceso) puede perder las
+    últimas transacciones confirmadas.
+
+    Los errores de sqlite3 se convierten en los del conector de MySQL
+    (IntegrityError con ER_DUP_ENTRY para una clave repetida).
+    """
+
+    name = "sqlite"
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -20000",     # 20 MB de caché de páginas
+        "PRAGMA mmap_size = 268435456",   # 256 MB mapeados en memoria
+        "PRAGMA busy_timeout = 5000",
+    )
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self.statements = CursorStatements()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._connection: Optional[_SQLiteConnection] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+        # Estadísticas (las mismas que el pool de MySQL)
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.opened = 0
+
+    async def run(self, fn, *args):
+        """Ejecuta `fn` en el hilo de SQLite"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        # isolation_level=None: autocommit, las transacciones se abren a mano
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        conn.executescript(_SQLITE_SCHEMA)
+        return conn
+
+    def _execute(self, query: str, params, many: bool):
+        sql, returning = _to_sqlite(query)
+        try:
+            cursor = self._conn.executemany(sql, params) if many else self._conn.execute(sql, params)
+            filas = cursor.fetchall() if cursor.description else []
+        except sqlite3.Error as e:
+            raise _as_connector_error(e) from e
+        columnas = [description[0] for description in cursor.description] if cursor.description else None
+        if returning:
+            # Como LAST_INSERT_ID(expr): filas afectadas y el valor nuevo
+            return filas, columnas, len(filas), filas[0][0] if filas else 0
+        return filas, columnas, cursor.rowcount, cursor.lastrowid
+
+    def _finish(self, sentencia: str):
+        if self._conn.in_transaction:
+            self._conn.execute(sentencia)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Presta la conexión durante el bloque `async with`"""
+        if self._closed:
+            raise DatabaseError(msg="La base de datos SQLite está cerrada")
+        inicio = time.monotonic()
+        waited = self._lock.locked()
+        async with self._lock:
+            self.acquisitions += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - inicio
+            if self._conn is None:
+                self._conn = await self.run(self._open)
+                self._connection = _SQLiteConnection(self)
+                self.opened += 1
+                logger.info(f"✅ Base de datos SQLite abierta en {self.path}")
+
+            try:
+                yield self._connection
+            except BaseException:
+                await self._connection.rollback()
+                raise
+            if self._conn.in_transaction:
+                # Una transacción abierta bloquearía a todos los demás
+                logger.warning("⚠️ Transacción de SQLite sin cerrar al devolver la conexión; se deshace")
+                await self._connection.rollback()
+
+    def stats(self) -> dict:
+        en_uso = 1 if self._lock.locked() else 0
+        abierta = 1 if self._conn is not None else 0
+        return {
+            "max_size": 1,
+            "open": abierta,
+            "in_use": en_uso,
+            "idle": abierta - en_uso,
+            "peak_in_use": 1 if self.acquisitions else 0,
+            "acquisitions": self.acquisitions,
+            "waits": self.waits,
+            "avg_wait_ms": (self.wait_time / self.waits * 1000) if self.waits else 0.0,
+            "opened": self.opened,
+            "discarded": 0,
+            "dropped": 0,
+        }
+
+    async def close(self):
+        self._closed = True
+        async with self._lock:
+            if self._conn is not None:
+                await self.run(self._conn.close)
+                self._conn = None
+        self._executor.shutdown(wait=True)
+
+    async def columns(self, table: str) -> set:
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute("SELECT name FROM pragma_table_info(%s)", (table,))
+                return {row[0].lower() for row in await cursor.fetchall()}
+
+    async def tables(self, prefix: str) -> List[str]:
+        async with self.connection() as conn:
+            async with await conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s ESCAPE '\\'",
+                    (prefix.replace("_", "\\_") + "%",)
+                )
+                return sorted(row[0] for row in await cursor.fetchall())
+
+
+def create_backend(name: str = DB_BACKEND, pool_size: int = DB_POOL_SIZE):
+    """Crea el backend indicado por DB_BACKEND ('mysql' o 'sqlite')"""
+    if name == "mysql":
+        return MySQLBackend(pool_size)
+    if name == "sqlite":
+        return SQLiteBackend()
+    raise ValueError(f"DB_BACKEND desconocido: {name!r} (usa 'mysql' o 'sqlite')")
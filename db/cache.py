@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class BalanceCache:
+    """Caché LRU de balances por usuario.
+
+    La capa de base de datos lo actualiza con el balance que devuelve cada
+    operación de créditos, así que leer un saldo recién escrito no vuelve a
+    consultar MySQL. El TTL es solo una red de seguridad por si algo cambia
+    la tabla por fuera del bot.
+
+    Un balance leído de la tabla se guarda con `fill` y no con `set`: si
+    mientras se esperaba la respuesta llegó un balance más nuevo del mismo
+    usuario, la lectura ya está vieja y se descarta.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._reads = {}  # user_id -> ticket de la última lectura en curso
+        self._ticket = 0
+
+    def get(self, user_id: int) -> Optional[int]:
+        entry = self._data.get(user_id)
+        if entry is not None:
+            balance, expires = entry
+            if expires > time.monotonic():
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return balance
+            del self._data[user_id]
+        self.misses += 1
+        return None
+
+    def peek(self, user_id: int) -> Optional[int]:
+        """Balance guardado si sigue vigente, sin contar acierto ni fallo ni reordenar"""
+        entry = self._data.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def begin_read(self, user_id: int) -> int:
+        """Anota que empieza una lectura de la tabla; devuelve el ticket para `fill`"""
+        self._ticket += 1
+        self._reads.pop(user_id, None)
+        self._reads[user_id] = self._ticket
+        if len(self._reads) > self.max_size:
+            # Lecturas que fallaron y nunca llamaron a `fill`: perder su ticket solo evita guardarlas
+            del self._reads[next(iter(self._reads))]
+        return self._ticket
+
+    def unchanged_since(self, user_id: int, ticket: int) -> bool:
+        """True si nadie escribió el balance del usuario desde `begin_read`"""
+        return self._reads.get(user_id) == ticket
+
+    def fill(self, user_id: int, balance: int, ticket: int) -> bool:
+        """Guarda un balance leído de la tabla si sigue siendo el más nuevo"""
+        if not self.unchanged_since(user_id, ticket):
+            return False
+        self.set(user_id, balance)
+        return True
+
+    def set(self, user_id: int, balance: int):
+        self._reads.pop(user_id, None)
+        self._data[user_id] = (balance, time.monotonic() + self.ttl)
+        self._data.move_to_end(user_id)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int = None):
+        """Olvida el balance de un usuario (o de todos si no se indica)"""
+        if user_id is None:
+            self._data.clear()
+            self._reads.clear()
+        else:
+            self._data.pop(user_id, None)
+            self._reads.pop(user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
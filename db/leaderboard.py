@@ -0,0 +1,192 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Leaderboard:
+    """Todos los usuarios con saldo, ordenados por créditos en memoria.
+
+    Se siembra con una consulta y luego la capa de base de datos le pasa
+    cada balance nuevo, así que las páginas de !top y la posición de un
+    usuario no tocan MySQL.
+
+    Las claves (-créditos, user_id) se guardan en bloques ordenados de
+    hasta 2 * LOAD elementos, con un árbol de Fenwick sobre el tamaño de
+    cada bloque. Buscar la posición de un usuario o el elemento k-ésimo
+    cuesta O(log n); insertar o quitar, O(log n) más mover un bloque.
+    """
+
+    LOAD = 500
+
+    def __init__(self):
+        self._blocks: List[List[Tuple[int, int]]] = []
+        self._maxes: List[Tuple[int, int]] = []  # última clave de cada bloque
+        self._tree: List[int] = [0]  # Fenwick (base 1) sobre len(bloque)
+        self._credits: Dict[int, int] = {}
+        self._ready = False
+        self._pending: Optional[Dict[int, int]] = None  # cambios durante una resincronización
+        self.updates = 0
+        self.resyncs = 0
+
+    def __len__(self) -> int:
+        return len(self._credits)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def stale(self) -> bool:
+        return not self._ready
+
+    # --- Árbol de Fenwick sobre los tamaños de bloque ---
+
+    def _rebuild_tree(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, block in enumerate(self._blocks, 1):
+            tree[i] += len(block)
+            padre = i + (i & -i)
+            if padre <= n:
+                tree[padre] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, block: int, delta: int):
+        i = block + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _before(self, block: int) -> int:
+        """Usuarios en los bloques anteriores a `block`"""
+        total = 0
+        while block > 0:
+            total += self._tree[block]
+            block -= block & -block
+        return total
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """(bloque, desplazamiento) del elemento `index` (base 0)"""
+        pos = 0
+        paso = 1 << (len(self._blocks).bit_length() - 1) if self._blocks else 0
+        while paso:
+            if pos + paso < len(self._tree) and self._tree[pos + paso] <= index:
+                pos += paso
+                index -= self._tree[pos]
+            paso >>= 1
+        return pos, index
+
+    # --- Claves ---
+
+    def _insert(self, key: Tuple[int, int]):
+        if not self._blocks:
+            self._blocks, self._maxes = [[key]], [key]
+            self._rebuild_tree()
+            return
+        i = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, key)
+        self._maxes[i] = block[-1]
+        if len(block) > 2 * self.LOAD:
+            self._blocks[i:i + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._maxes[i:i + 1] = [block[self.LOAD - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def _remove(self, key: Tuple[int, int]):
+        i = bisect_left(self._maxes, key)
+        block = self._blocks[i]
+        del block[bisect_left(block, key)]
+        if block:
+            self._maxes[i] = block[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._blocks[i], self._maxes[i]
+            self._rebuild_tree()
+
+    # --- Sincronización ---
+
+    def begin_resync(self):
+        """Empieza a guardar los cambios que lleguen mientras se lee la tabla"""
+        self._pending = {}
+
+    def cancel_resync(self):
+        """La lectura falló: los cambios siguen aplicándose sobre la lista actual"""
+        self._pending = None
+
+    def load(self, rows: Iterable[Tuple[int, int]]):
+        """Siembra la lista con (user_id, créditos) de todos los usuarios con saldo"""
+        self._credits = {user_id: credits for user_id, credits in rows if credits > 0}
+        keys = sorted((-credits, user_id) for user_id, credits in self._credits.items())
+        self._blocks = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._rebuild_tree()
+        self._ready = True
+        self.resyncs += 1
+
+        # Lo que cambió mientras se leía la tabla es más nuevo que la lectura
+        pending, self._pending = self._pending or {}, None
+        for user_id, credits in pending.items():
+            self.update(user_id, credits)
+
+    def update(self, user_id: int, credits: int):
+        """Aplica el balance nuevo de un usuario"""
+        if self._pending is not None:
+            self._pending[user_id] = credits
+        if not self._ready:
+            return
+        self.updates += 1
+
+        anterior = self._credits.pop(user_id, None)
+        if anterior is not None:
+            self._remove((-anterior, user_id))
+        # Como en get_top_users, solo cuentan los usuarios con saldo
+        if credits > 0:
+            self._credits[user_id] = credits
+            self._insert((-credits, user_id))
+
+    def invalidate(self):
+        """Olvida la lista (por ejemplo tras cambiar todos los balances a la vez)"""
+        self._blocks, self._maxes, self._tree = [], [], [0]
+        self._credits.clear()
+        self._ready = False
+
+    # --- Consultas ---
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """Usuarios desde la posición `offset` (base 0) como (user_id, créditos)"""
+        if offset >= len(self):
+            return []
+        i, j = self._locate(offset)
+        resultado = []
+        while i < len(self._blocks) and len(resultado) < limit:
+            resultado.extend(self._blocks[i][j:j + limit - len(resultado)])
+            i, j = i + 1, 0
+        return [(user_id, -credits) for credits, user_id in resultado]
+
+    def top(self, limit: int) -> List[Tuple[int, int]]:
+        """Los `limit` primeros como (user_id, créditos)"""
+        return self.page(0, limit)
+
+    def credits(self, user_id: int) -> Optional[int]:
+        """Créditos del usuario según la lista (0 si no tiene saldo), o None si no está cargada"""
+        if not self._ready:
+            return None
+        return self._credits.get(user_id, 0)
+
+    def position(self, user_id: int) -> Optional[int]:
+        """Puesto del usuario (1 = el más rico), o None si no tiene saldo"""
+        credits = self._credits.get(user_id)
+        if credits is None:
+            return None
+        key = (-credits, user_id)
+        i = bisect_left(self._maxes, key)
+        return self._before(i) + bisect_left(self._blocks[i], key) + 1
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "blocks": len(self._blocks),
+            "updates": self.updates,
+            "resyncs": self.resyncs,
+        }
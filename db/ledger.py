@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from db.pool import is_connection_error
+from db.rollups import apply_rollups, purge_rollup_users
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerWriter:
+    """Escritura diferida del historial de transacciones.
+
+    Los balances se actualizan al momento; las filas de `transactions` se
+    acumulan en memoria y se insertan en bloque (un INSERT de varias filas)
+    cuando hay `batch_size` pendientes o cada `flush_interval` segundos. Si
+    el buffer llega a `max_buffer` se vacía en el momento, dentro de la
+    llamada que lo llenó, salvo que la base de datos acabe de fallar por
+    conexión: entonces se descartan las filas más antiguas que no caben y
+    solo la tarea de fondo reintenta, para no bloquear cada partida en la
+    reconexión. Cada bloque actualiza en la misma transacción los
+    acumulados por hora y juego (`game_rollups`).
+    """
+
+    def __init__(self, db, batch_size: int, flush_interval: float, max_buffer: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._rollup_hour: Optional[datetime] = None
+        # Hasta cuándo no se vuelca de forma síncrona tras perder la conexión
+        self._offline_until = 0.0
+
+        # Estadísticas
+        self.rows_written = 0
+        self.batches = 0
+        self.sync_flushes = 0
+        self.dropped = 0
+
+    def _ensure_task(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, user_id: int, transaction_type: str, amount: int, game_type: str = "", details: str = "",
+                     wagered: int = None, paid: int = None):
+        """Encola una fila del historial (nunca lanza excepción).
+
+        `wagered` y `paid` solo alimentan los acumulados por hora; si no se
+        indican se deducen del neto (`amount`).
+        """
+        if wagered is None:
+            wagered = max(-amount, 0)
+        if paid is None:
+            paid = max(amount, 0)
+        self._buffer.append((user_id, transaction_type, amount, game_type, details, datetime.now(), wagered, paid))
+
+        if len(self._buffer) >= self.max_buffer and self._offline():
+            # Sin conexión: no se espera a reconectar dentro de la partida
+            exceso = len(self._buffer) - self.max_buffer
+            if exceso > 0:
+                del self._buffer[:exceso]
+                self.dropped += exceso
+            self._ensure_task()
+        elif len(self._buffer) >= self.max_buffer:
+            # Buffer lleno: se escribe ya, de forma síncrona para quien llama
+            self.sync_flushes += 1
+            try:
+                await self.flush()
+            except Exception as e:
+                # El balance ya está confirmado: el historial no puede romper la operación
+                logger.error(f"❌ Error volcando el historial: {e}")
+        else:
+            self._ensure_task()
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # La tarea sigue viva: lo pendiente se reintenta en la próxima pasada
+                logger.error(f"❌ Error volcando el historial: {e}")
+
+    def has_pending(self, user_id: int) -> bool:
+        """Si hay filas del usuario sin escribir (en el buffer o en un volcado en curso)"""
+        if self._flush_lock.locked():
+            return True
+        return any(row[0] == user_id for row in self._buffer)
+
+    async def flush(self):
+        """Escribe todo lo pendiente en bloques de `batch_size` filas"""
+        async with self._flush_lock:
+            while self._buffer:
+                rows = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                try:
+                    await self._write(rows)
+                except Exception as e:
+                    logger.error(f"❌ Error escribiendo {len(rows)} transacciones: {e}")
+                    if is_connection_error(e):
+                        # Se reintentan en la próxima pasada mientras quepan
+                        self._requeue(rows)
+                        self._offline_until = time.monotonic() + self.flush_interval
+                        return
+                    # Error de datos: reintentar el bloque entero fallaría siempre
+                    if not await self._write_isolating(rows):
+                        return
+
+    async def _write(self, rows):
+        """Inserta un bloque y sus acumulados en una sola transacción"""
+        with self.db.metrics.measure("ledger_flush"):
+            async with self.db.connection() as conn:
+                async with await conn.cursor() as cursor:
+                    await conn.start_transaction()
+                    # executemany convierte el INSERT ... VALUES en uno de varias filas
+                    await cursor.executemany("""
+                        INSERT INTO transactions (user_id, type, amount, game_type, details, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, [row[:6] for row in rows])
+                    await apply_rollups(cursor, rows)
+                    await self._purge_closed_hours(cursor)
+                    await conn.commit()
+        self.rows_written += len(rows)
+        self.batches += 1
+        self._offline_until = 0.0
+
+    def _offline(self) -> bool:
+        """True si el último volcado perdió la conexión y aún no toca reintentar
+        (o ya hay un reintento en curso)."""
+        if not self._offline_until:
+            return False
+        return time.monotonic() < self._offline_until or self._flush_lock.locked()
+
+    async def _write_isolating(self, rows) -> bool:
+        """Parte en mitades un bloque rechazado hasta aislar las filas malas.
+
+        Las filas buenas se escriben y cada fila que falla sola se descarta
+        con su error en el log. Devuelve False si entretanto se cayó la
+        conexión; lo que quedaba sin escribir vuelve al buffer.
+        """
+        pendientes = [rows]
+        while pendientes:
+            bloque = pendientes.pop()
+            try:
+                await self._write(bloque)
+            except Exception as e:
+                if is_connection_error(e):
+                    self._requeue(bloque + [row for resto in reversed(pendientes) for row in resto])
+                    self._offline_until = time.monotonic() + self.flush_interval
+                    return False
+                if len(bloque) == 1:
+                    self.dropped += 1
+                    logger.error(f"❌ Transacción descartada {bloque[0][:5]}: {e}")
+                else:
+                    mitad = len(bloque) // 2
+                    pendientes += [bloque[mitad:], bloque[:mitad]]
+        return True
+
+    def _requeue(self, rows):
+        """Devuelve filas al principio del buffer mientras quepan en `max_buffer`"""
+        reintentar = rows[:max(0, self.max_buffer - len(self._buffer))]
+        self._buffer[:0] = reintentar
+        self.dropped += len(rows) - len(reintentar)
+
+    async def _purge_closed_hours(self, cursor):
+        """Al cambiar de hora, borra los usuarios apuntados de las horas ya antiguas"""
+        hora = datetime.now().replace(minute=0, second=0, microsecond=0)
+        if hora != self._rollup_hour:
+            await purge_rollup_users(cursor, hora)
+            self._rollup_hour = hora
+
+    async def close(self):
+        """Detiene la tarea de fondo y escribe lo que quede pendiente"""
+        if self._task is not None:
+            # Esperar a que termine un volcado en curso antes de cancelar
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            self.dropped += len(self._buffer)
+            logger.error(f"❌ Se perdieron {len(self._buffer)} transacciones al cerrar")
+            self._buffer.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._buffer),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "sync_flushes": self.sync_flushes,
+            "dropped": self.dropped,
+        }
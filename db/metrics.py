@@ -0,0 +1,154 @@
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Comando o interacción que está ejecutando la tarea actual (lo fija bot.py)
+current_command: ContextVar[str] = ContextVar("current_command", default="")
+
+# Límites superiores (ms) de los cubos del histograma de latencias
+_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+class _QueryStats:
+    __slots__ = ("count", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(_BUCKETS_MS)
+
+    def percentile(self, p: float) -> float:
+        """Límite superior del cubo donde cae el percentil `p` (0-100)"""
+        if not self.count:
+            return 0.0
+        objetivo = self.count * p / 100
+        acumulado = 0
+        for limite, n in zip(_BUCKETS_MS, self.buckets):
+            acumulado += n
+            if acumulado >= objetivo:
+                return min(limite, self.max_ms)
+        return self.max_ms
+
+
+class QueryMetrics:
+    """Latencias, filas y errores por consulta lógica (nombre de método).
+
+    Cada consulta guarda un histograma de cubos fijos, así que la memoria no
+    crece con el tráfico. Las que tardan más de `slow_ms` se registran en el
+    log con el comando que las lanzó y quedan en `slow_log`.
+    """
+
+    def __init__(self, slow_ms: float, slow_log_size: int = 20):
+        self.slow_ms = slow_ms
+        self.queries = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.since = time.time()
+
+    def observe(self, query: str, seconds: float, rows: int = 0, error: bool = False):
+        stats = self.queries.get(query)
+        if stats is None:
+            stats = self.queries[query] = _QueryStats()
+        ms = seconds * 1000
+        stats.count += 1
+        stats.rows += rows
+        stats.total_ms += ms
+        stats.max_ms = max(stats.max_ms, ms)
+        stats.buckets[bisect_left(_BUCKETS_MS, ms)] += 1
+        if error:
+            stats.errors += 1
+
+        if ms >= self.slow_ms:
+            comando = current_command.get() or "sin comando"
+            self.slow_log.append((time.time(), query, ms, comando))
+            logger.warning(f"🐢 Consulta lenta {query}: {ms:.0f} ms (comando: {comando})")
+
+    @contextmanager
+    def measure(self, query: str):
+        """Mide un bloque que no es un método de la base de datos"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.observe(query, time.perf_counter() - inicio, error=True)
+            raise
+        self.observe(query, time.perf_counter() - inicio)
+
+    def summary(self) -> list:
+        """Filas (nombre, stats) ordenadas por tiempo total consumido"""
+        return sorted(self.queries.items(), key=lambda item: item[1].total_ms, reverse=True)
+
+    def reset(self):
+        self.queries.clear()
+        self.slow_log.clear()
+        self.since = time.time()
+
+
+def _count_rows(result) -> int:
+    if result is None or result is False:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def timed(func):
+    """Registra en `self.metrics` la duración de cada llamada al método"""
+    query = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            # Solo cuenta el tiempo dentro del generador, no el de quien itera
+            gen = func(self, *args, **kwargs)
+            dentro, filas, error = 0.0, 0, False
+            try:
+                while True:
+                    inicio = time.perf_counter()
+                    try:
+                        fila = await gen.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    except Exception:
+                        error = True
+                        raise
+                    finally:
+                        dentro += time.perf_counter() - inicio
+                    filas += 1
+                    yield fila
+            finally:
+                await gen.aclose()
+                self.metrics.observe(query, dentro, filas, error=error)
+    elif inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                result = await func(self, *args, **kwargs)
+            except Exception:
+                self.metrics.observe(query, time.perf_counter() - inicio, error=True)
+                raise
+            self.metrics.observe(query, time.perf_counter() - inicio, _count_rows(result))
+            return result
+    else:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                self.metrics.observe(query, time.perf_counter() - inicio, error=True)
+                raise
+            self.metrics.observe(query, time.perf_counter() - inicio, _count_rows(result))
+            return result
+
+    return wrapper
@@ -0,0 +1,337 @@
+"""Migraciones versionadas del esquema.
+
+Cada migración se aplica una sola vez y queda registrada en `schema_version`.
+Para cambiar el esquema se añade una función nueva al final de MIGRATIONS;
+nunca se edita una que ya se haya aplicado en producción.
+"""
+import logging
+import re
+
+from mysql.connector import Error
+
+from config import STARTING_CREDITS
+
+logger = logging.getLogger(__name__)
+
+# Índices que crea la migración 3. Está aplicada: la lista no se toca
+_INDICES_MIGRACION_3 = [
+    ("users", "idx_users_credits", "credits"),
+    ("users", "idx_users_rango_credits", "rango, credits"),
+    ("transactions", "idx_transactions_user_created", "user_id, created_at"),
+]
+
+# Detalle de las filas de reset escritas antes de la migración 10:
+# "Restablecidos N usuarios (desde, hasta] a créditos"
+_RESET_DETAILS = re.compile(r"\((-?\d+), (\d+)\] a (-?\d+)")
+
+# Índices que necesitan las consultas frecuentes: (tabla, nombre, columnas).
+# Cada uno nuevo se crea en su propia migración y se añade aquí para que
+# check_schema avise si falta
+REQUIRED_INDEXES = _INDICES_MIGRACION_3 + [
+    ("blackjack_sessions", "idx_blackjack_sessions_user_id", "user_id, id"),  # migración 5
+    ("transactions", "idx_transactions_user_id", "user_id, id"),  # migración 7
+]
+
+
+async def _column_exists(cursor, table: str, column: str) -> bool:
+    await cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return await cursor.fetchone() is not None
+
+
+async def _index_exists(cursor, table: str, index: str) -> bool:
+    await cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return await cursor.fetchone() is not None
+
+
+async def _add_column(cursor, table: str, column: str, definition: str):
+    # MySQL no tiene ADD COLUMN IF NOT EXISTS
+    if not await _column_exists(cursor, table, column):
+        await cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _add_index(cursor, table: str, index: str, columns: str):
+    if not await _index_exists(cursor, table, index):
+        await cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+
+
+# --- Migraciones ---
+
+async def _001_tablas_base(cursor):
+    """Tablas usadas por el bot"""
+    await cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT NOT NULL PRIMARY KEY,
+            credits BIGINT NOT NULL DEFAULT {STARTING_CREDITS},
+            games_played INT NOT NULL DEFAULT 0,
+            games_won INT NOT NULL DEFAULT 0,
+            total_winnings BIGINT NOT NULL DEFAULT 0,
+            rango INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            type VARCHAR(20) NOT NULL,
+            amount BIGINT NOT NULL,
+            game_type VARCHAR(50) NOT NULL DEFAULT '',
+            details VARCHAR(255) NOT NULL DEFAULT '',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blackjack_sessions (
+            id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            bet_amount BIGINT NOT NULL,
+            result VARCHAR(20) NOT NULL,
+            payout BIGINT NOT NULL,
+            player_hand VARCHAR(255) NOT NULL,
+            dealer_hand VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """)
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_frames (
+            user_id BIGINT NOT NULL PRIMARY KEY,
+            equipped_frame VARCHAR(50) NOT NULL DEFAULT 'default',
+            owned_frames TEXT
+        ) ENGINE=InnoDB
+    """)
+
+
+async def _002_columnas_estadisticas(cursor):
+    """Columnas de estadísticas y rango en bases creadas antes de tenerlas"""
+    await _add_column(cursor, "users", "games_played", "INT NOT NULL DEFAULT 0")
+    await _add_column(cursor, "users", "games_won", "INT NOT NULL DEFAULT 0")
+    await _add_column(cursor, "users", "total_winnings", "BIGINT NOT NULL DEFAULT 0")
+    await _add_column(cursor, "users", "rango", "INT NOT NULL DEFAULT 0")
+    await _add_column(cursor, "transactions", "created_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+
+
+async def _003_indices_leaderboard_historial(cursor):
+    """Índices para !top, !top rango y el historial por usuario"""
+    for table, index, columns in _INDICES_MIGRACION_3:
+        await _add_index(cursor, table, index, columns)
+
+
+async def _004_operaciones_idempotentes(cursor):
+    """Claves de idempotencia de las operaciones de créditos"""
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS credit_operations (
+            id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            idempotency_key VARCHAR(100) NOT NULL,
+            user_id BIGINT NOT NULL,
+            balance BIGINT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_credit_operations_key (idempotency_key),
+            KEY idx_credit_operations_created (created_at)
+        ) ENGINE=InnoDB
+    """)
+
+
+async def _005_manos_compactas(cursor):
+    """Cartas de blackjack codificadas en binario e índice para el historial por usuario"""
+    await _add_column(cursor, "blackjack_sessions", "player_cards", "VARBINARY(16) NULL")
+    await _add_column(cursor, "blackjack_sessions", "dealer_cards", "VARBINARY(16) NULL")
+    # El texto antiguo solo queda para las partidas ya guardadas
+    await cursor.execute("ALTER TABLE blackjack_sessions MODIFY player_hand VARCHAR(255) NULL")
+    await cursor.execute("ALTER TABLE blackjack_sessions MODIFY dealer_hand VARCHAR(255) NULL")
+    await _add_index(cursor, "blackjack_sessions", "idx_blackjack_sessions_user_id", "user_id, id")
+
+
+async def _006_acumulados_por_hora(cursor):
+    """Acumulados por hora y juego del historial de transacciones"""
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS game_rollups (
+            hour DATETIME NOT NULL,
+            game_type VARCHAR(50) NOT NULL,
+            type VARCHAR(20) NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            wagered BIGINT NOT NULL DEFAULT 0,
+            paid BIGINT NOT NULL DEFAULT 0,
+            distinct_users INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, game_type, type)
+        ) ENGINE=InnoDB
+    """)
+    # Usuarios vistos en cada hora aún abierta, para contar los distintos
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS game_rollup_users (
+            hour DATETIME NOT NULL,
+            game_type VARCHAR(50) NOT NULL,
+            type VARCHAR(20) NOT NULL,
+            user_id BIGINT NOT NULL,
+            PRIMARY KEY (hour, game_type, type, user_id)
+        ) ENGINE=InnoDB
+    """)
+    # Lo que ya había en el historial se acumula una sola vez aquí; a partir
+    # de ahora cada bloque del ledger suma lo suyo. Sin importe apostado y
+    # pagado por separado, se deducen del neto como hace el ledger.
+    await cursor.execute("""
+        INSERT INTO game_rollups (hour, game_type, type, count, wagered, paid, distinct_users)
+        SELECT DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00'), game_type, type, COUNT(*),
+               SUM(GREATEST(-amount, 0)), SUM(GREATEST(amount, 0)), COUNT(DISTINCT user_id)
+        FROM transactions
+        WHERE type <> 'reset'
+        GROUP BY 1, 2, 3
+    """)
+    # Las horas que siguen abiertas necesitan sus usuarios para seguir contando
+    await cursor.execute("""
+        INSERT IGNORE INTO game_rollup_users (hour, game_type, type, user_id)
+        SELECT DISTINCT DATE_FORMAT(created_at, '%Y-%m-%d %H:00:00'), game_type, type, user_id
+        FROM transactions
+        WHERE type <> 'reset' AND created_at >= DATE_FORMAT(NOW() - INTERVAL 1 HOUR, '%Y-%m-%d %H:00:00')
+    """)
+
+
+async def _007_indice_historial_transacciones(cursor):
+    """Índice para paginar !historial por id"""
+    await _add_index(cursor, "transactions", "idx_transactions_user_id", "user_id, id")
+
+
+async def _008_archivo_transacciones(cursor):
+    """Saldos acumulados de las transacciones archivadas por db.archive"""
+    # Por usuario: lo archivado suma `amount` sobre `base` (NULL = el saldo
+    # inicial que le corresponda, el de STARTING_CREDITS o el último reset)
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_archive_balances (
+            user_id BIGINT NOT NULL PRIMARY KEY,
+            base BIGINT NULL,
+            amount BIGINT NOT NULL DEFAULT 0,
+            archived_rows BIGINT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB
+    """)
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_archive_state (
+            id TINYINT NOT NULL PRIMARY KEY,
+            archived_through BIGINT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB
+    """)
+    await cursor.execute("INSERT IGNORE INTO transaction_archive_state (id, archived_through) VALUES (1, 0)")
+
+
+async def _009_nombres_usuario(cursor):
+    """Nombres para mostrar de los usuarios, para no pedirlos a Discord en cada !top"""
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_names (
+            user_id BIGINT NOT NULL PRIMARY KEY,
+            display_name VARCHAR(100) NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            KEY idx_user_names_updated (updated_at)
+        ) ENGINE=InnoDB
+    """)
+
+
+async def _010_rangos_de_reset(cursor):
+    """Rango de usuarios y créditos de cada reset de la economía"""
+    # Una fila por fila 'reset' de transactions: se aplica a (user_from, user_to]
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS economy_resets (
+            transaction_id BIGINT NOT NULL PRIMARY KEY,
+            user_from BIGINT NOT NULL,
+            user_to BIGINT NOT NULL,
+            credits BIGINT NOT NULL
+        ) ENGINE=InnoDB
+    """)
+    # Los resets anteriores solo tenían el rango en el texto de `details`
+    await cursor.execute("SELECT id, details FROM transactions WHERE type = 'reset' AND user_id = 0")
+    filas = []
+    for tx_id, details in await cursor.fetchall():
+        match = _RESET_DETAILS.search(details or "")
+        if match:
+            filas.append((tx_id, *(int(g) for g in match.groups())))
+        else:
+            logger.warning(f"⚠️ Fila de reset {tx_id} sin rango reconocible: {details!r}")
+    if filas:
+        await cursor.executemany("""
+            INSERT IGNORE INTO economy_resets (transaction_id, user_from, user_to, credits)
+            VALUES (%s, %s, %s, %s)
+        """, filas)
+
+
+async def _011_cartas_hasta_32(cursor):
+    """Columnas de cartas de blackjack con sitio para la mano más larga posible"""
+    # VARBINARY(16) se quedaba corto: una mano puede llegar a 22 cartas
+    await cursor.execute("ALTER TABLE blackjack_sessions MODIFY player_cards VARBINARY(32) NULL")
+    await cursor.execute("ALTER TABLE blackjack_sessions MODIFY dealer_cards VARBINARY(32) NULL")
+
+
+MIGRATIONS = [
+    (1, _001_tablas_base),
+    (2, _002_columnas_estadisticas),
+    (3, _003_indices_leaderboard_historial),
+    (4, _004_operaciones_idempotentes),
+    (5, _005_manos_compactas),
+    (6, _006_acumulados_por_hora),
+    (7, _007_indice_historial_transacciones),
+    (8, _008_archivo_transacciones),
+    (9, _009_nombres_usuario),
+    (10, _010_rangos_de_reset),
+    (11, _011_cartas_hasta_32),
+]
+
+
+async def run_migrations(db) -> int:
+    """Aplica las migraciones pendientes y devuelve la versión final del esquema"""
+    async with db.connection() as conn:
+        async with await conn.cursor() as cursor:
+            await cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT NOT NULL PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB
+            """)
+            await cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            (actual,) = await cursor.fetchone()
+
+            for version, migration in MIGRATIONS:
+                if version <= actual:
+                    continue
+                descripcion = migration.__doc__ or migration.__name__
+                logger.info(f"🛠️ Aplicando migración {version}: {descripcion}")
+                try:
+                    await migration(cursor)
+                    await cursor.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (version, descripcion)
+                    )
+                except Error as e:
+                    logger.error(f"❌ Error en la migración {version}: {e}")
+                    raise
+                actual = version
+
+    logger.info(f"✅ Esquema de base de datos en la versión {actual}")
+    return actual
+
+
+async def missing_indexes(db) -> list:
+    """Índices de REQUIRED_INDEXES que no existen en la base de datos"""
+    faltan = []
+    async with db.connection() as conn:
+        async with await conn.cursor() as cursor:
+            for table, index, columns in REQUIRED_INDEXES:
+                if not await _index_exists(cursor, table, index):
+                    faltan.append((table, index, columns))
+    return faltan
+
+
+async def check_schema(db):
+    """Migra el esquema al arrancar y avisa de los índices que falten"""
+    if db.backend.name == "sqlite":
+        # SQLiteBackend crea el esquema completo al abrir el archivo
+        return
+    try:
+        await run_migrations(db)
+        for table, index, columns in await missing_indexes(db):
+            logger.warning(f"⚠️ Falta el índice {index} en {table}({columns}); las consultas harán recorridos completos")
+    except Error as e:
+        logger.error(f"❌ No se pudo verificar el esquema: {e}")
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+
+class NameCache:
+    """Nombres para mostrar de los usuarios, LRU con caducidad.
+
+    Evita una petición a la API de Discord por cada usuario que no está en
+    la caché de miembros del bot. Se guarda en la tabla `user_names` para
+    sobrevivir a los reinicios, así que la caducidad va en tiempo de reloj
+    (no monotónico). Un nombre caducado se sigue devolviendo como respaldo
+    hasta que se consigue el nuevo.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # user_id -> (nombre, guardado_en)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: int) -> Tuple[Optional[str], bool]:
+        """(nombre o None, si hay que volver a pedirlo)"""
+        entry = self._data.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None, True
+        nombre, guardado = entry
+        self._data.move_to_end(user_id)
+        if time.time() - guardado >= self.ttl:
+            self.misses += 1
+            return nombre, True
+        self.hits += 1
+        return nombre, False
+
+    def set(self, user_id: int, name: str, saved_at: float = None):
+        self._data[user_id] = (name, saved_at if saved_at is not None else time.time())
+        self._data.move_to_end(user_id)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def load(self, rows: Iterable[Tuple[int, str, float]]):
+        """Carga (user_id, nombre, guardado_en) de la base de datos, más recientes primero"""
+        for user_id, name, saved_at in reversed(list(rows)):
+            self.set(user_id, name, saved_at)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
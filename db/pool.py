@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from mysql.connector import Error, InterfaceError, OperationalError
+from mysql.connector.aio import connect
+
+logger = logging.getLogger(__name__)
+
+# CR_SERVER_GONE_ERROR, CR_SERVER_LOST, CR_SERVER_LOST_EXTENDED
+_CONNECTION_LOST_ERRNOS = {2006, 2013, 2055}
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """True si el error indica que la conexión con el servidor se cayó"""
+    if isinstance(exc, (ConnectionError, asyncio.IncompleteReadError)):
+        return True
+    if isinstance(exc, (InterfaceError, OperationalError)):
+        return exc.errno in _CONNECTION_LOST_ERRNOS or exc.errno is None or exc.errno == -1
+    return False
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones MySQL asíncronas.
+
+    Las conexiones se abren bajo demanda (nunca más de `max_size`) y se
+    reutilizan al devolverse. Si todas están ocupadas, quien pide una espera
+    a que se libere en vez de fallar. Lleva estadísticas de uso para poder
+    dimensionar DB_POOL_SIZE.
+
+    No se hace ping al prestar una conexión: si el servidor la cerró, el
+    error aparece en la consulta, la conexión se descarta y la siguiente
+    petición abre otra nueva.
+    """
+
+    def __init__(self, max_size: int, connect_attempts: int = 3, retry_delay: float = 0.5, **config):
+        self.max_size = max_size
+        self.connect_attempts = connect_attempts
+        self.retry_delay = retry_delay
+        self.config = config
+        self._idle = deque()
+        self._created = 0
+        self._in_use = 0
+        self._cond = asyncio.Condition()
+        self._closed = False
+
+        # Estadísticas
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.opened = 0
+        self.discarded = 0
+        self.dropped = 0
+        self.peak_in_use = 0
+
+    async def _open(self):
+        """Abre una conexión, reintentando con espera creciente sin bloquear el loop"""
+        delay = self.retry_delay
+        for attempt in range(self.connect_attempts):
+            try:
+                conn = await connect(**self.config)
+                self.opened += 1
+                return conn
+            except Error as e:
+                logger.error(f"❌ Error conectando a la base de datos (intento {attempt + 1}/{self.connect_attempts}): {e}")
+                if attempt == self.connect_attempts - 1:
+                    raise
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def acquire(self):
+        """Toma una conexión libre, abre una nueva o espera a que se libere"""
+        if self._closed:
+            raise Error("El pool de conexiones está cerrado")
+
+        inicio = time.monotonic()
+        waited = False
+        conn = None
+        async with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                waited = True
+                await self._cond.wait()
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1  # Reservamos el hueco antes de conectar
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+
+        self.acquisitions += 1
+        if waited:
+            self.waits += 1
+            self.wait_time += time.monotonic() - inicio
+
+        if conn is not None:
+            return conn
+        try:
+            return await self._open()
+        except BaseException:
+            await self._forget(None)
+            raise
+
+    async def release(self, conn, discard: bool = False):
+        """Devuelve una conexión al pool (o la descarta si quedó inservible)"""
+        if discard or self._closed:
+            await self._forget(conn)
+            return
+        async with self._cond:
+            self._idle.append(conn)
+            self._in_use -= 1
+            self._cond.notify()
+
+    async def _forget(self, conn):
+        if conn is not None:
+            self.discarded += 1
+            try:
+                await conn.close()
+            except Exception:
+                pass
+        async with self._cond:
+            self._created -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Presta una conexión durante el bloque `async with`"""
+        conn = await self.acquire()
+        try:
+            yield conn
+        except BaseException as e:
+            if is_connection_error(e):
+                # Conexión caída: se descarta y la próxima se abre de nuevo
+                self.dropped += 1
+                logger.warning("🔌 Conexión con la base de datos perdida, se descarta")
+                await self.release(conn, discard=True)
+            else:
+                # La conexión puede quedar a medias: se deshace la
+                # transacción abierta o se descarta si ya no sirve
+                await self.release(conn, discard=not await _reset(conn))
+            raise
+        else:
+            await self.release(conn)
+
+    async def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al volver"""
+        self._closed = True
+        async with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._created -= len(idle)
+        for conn in idle:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        """Foto del uso del pool"""
+        return {
+            "max_size": self.max_size,
+            "open": self._created,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "peak_in_use": self.peak_in_use,
+            "acquisitions": self.acquisitions,
+            "waits": self.waits,
+            "avg_wait_ms": (self.wait_time / self.waits * 1000) if self.waits else 0.0,
+            "opened": self.opened,
+            "discarded": self.discarded,
+            "dropped": self.dropped,
+        }
+
+
+async def _reset(conn) -> bool:
+    try:
+        if conn.in_transaction:
+            await conn.rollback()
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,232 @@
+"""Conciliación del historial de transacciones con los balances.
+
+Recalcula el balance esperado de cada usuario sumando `transactions` y lo
+compara con `users.credits`. Se ejecuta aparte del bot:
+
+    python -m db.reconcile --output conciliacion.csv
+
+Las dos tablas se recorren por rangos de clave primaria con un cursor sin
+buffer, así que la memoria depende del número de usuarios y no del de
+transacciones. Solo hace lecturas consistentes en autocommit (sin FOR
+UPDATE ni transacciones largas), de modo que no bloquea `users` mientras el
+bot sigue jugando. Las transacciones que `db.archive` ya sacó de la tabla
+se toman de su saldo archivado por usuario. Con el bot en marcha pueden aparecer diferencias
+pasajeras: apuestas reservadas aún sin liquidar y filas del historial que
+todavía están en el buffer del ledger.
+"""
+import argparse
+import csv
+import logging
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from config import DB_CONFIG, STARTING_CREDITS
+
+logger = logging.getLogger(__name__)
+
+class _Resets:
+    """Rangos de user_id restablecidos por !restart, en orden de id de la fila de reset.
+
+    Los resets no se aplican a los saldos al leerlos (eso obligaría a recorrer
+    todos los usuarios por cada uno): cada saldo recuerda el id de la última
+    transacción que sumó, y el reset se aplica al volver a tocar ese usuario
+    o al cerrar su cuenta con `rebase`.
+    """
+
+    def __init__(self):
+        self._ids: List[int] = []
+        self._rangos: List[Tuple[int, int, int]] = []  # (desde, hasta, créditos)
+
+    def add(self, reset_id: int, desde: int, hasta: int, credits: int):
+        self._ids.append(reset_id)
+        self._rangos.append((desde, hasta, credits))
+
+    def latest(self, user_id: int, after_id: int) -> Optional[int]:
+        """Créditos del último reset posterior a `after_id` que cubre al usuario"""
+        primero = bisect_right(self._ids, after_id)
+        for i in range(len(self._rangos) - 1, primero - 1, -1):
+            desde, hasta, credits = self._rangos[i]
+            if desde < user_id <= hasta:
+                return credits
+        return None
+
+    def base(self, user_id: int) -> int:
+        """Balance de partida de un usuario sin transacciones vistas"""
+        credits = self.latest(user_id, -1)
+        return STARTING_CREDITS if credits is None else credits
+
+    def rebase(self, user_id: int, saldo: Tuple[int, int]) -> int:
+        """Balance de un saldo (valor, id de su última transacción) tras los resets posteriores"""
+        valor, visto = saldo
+        credits = self.latest(user_id, visto)
+        return valor if credits is None else credits
+
+
+def _stream(conn, query: str, params: tuple, batch: int):
+    """Itera las filas de una consulta sin cargarlas todas en memoria"""
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def archived_through(conn) -> int:
+    """Último id movido al archivo por db.archive (0 si nunca se archivó)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT archived_through FROM transaction_archive_state WHERE id = 1")
+        fila = cursor.fetchone()
+        return fila[0] if fila else 0
+    except mysql.connector.Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return 0
+        raise
+    finally:
+        cursor.close()
+
+
+def _load_archive(conn, esperados: Dict[int, Tuple[int, int]], resets: _Resets, hasta_id: int, fetch_size: int):
+    """Parte de los saldos archivados hasta `hasta_id`"""
+    # Los resets se quedan en `transactions`; los ya archivados solo dan el saldo inicial
+    for tx_id, desde, hasta, credits in _stream(conn, """
+        SELECT t.id, r.user_from, r.user_to, r.credits
+        FROM transactions t
+        LEFT JOIN economy_resets r ON r.transaction_id = t.id
+        WHERE t.id <= %s AND t.type = 'reset' AND t.user_id = 0
+        ORDER BY t.id
+    """, (hasta_id,), fetch_size):
+        if desde is None:
+            logger.warning(f"⚠️ Fila de reset {tx_id} sin rango en economy_resets")
+        else:
+            resets.add(tx_id, desde, hasta, credits)
+
+    for user_id, base, amount in _stream(conn, """
+        SELECT user_id, base, amount FROM transaction_archive_balances
+    """, (), fetch_size):
+        # El archivo ya aplicó los resets archivados: cuenta como visto hasta `hasta_id`
+        esperados[user_id] = ((resets.base(user_id) if base is None else base) + amount, hasta_id)
+
+
+def expected_balances(conn, chunk_size: int, fetch_size: int) -> Tuple[Dict[int, Tuple[int, int]], _Resets, int]:
+    """Saldo por usuario según `transactions` (hasta el id máximo actual).
+
+    Cada saldo es (valor, id de su última transacción); el balance esperado
+    sale de `_Resets.rebase`, que aplica los resets posteriores a ese id.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM transactions")
+    (hasta_id,) = cursor.fetchone()
+    cursor.close()
+
+    esperados: Dict[int, Tuple[int, int]] = {}
+    resets = _Resets()
+    ultimo = archived_through(conn)
+    if ultimo:
+        _load_archive(conn, esperados, resets, ultimo, fetch_size)
+        logger.info(f"🗄️ {len(esperados):,} saldos archivados cargados (id ≤ {ultimo:,})")
+    leidas = 0
+    inicio = time.monotonic()
+
+    while ultimo < hasta_id:
+        limite = min(ultimo + chunk_size, hasta_id)
+        for tx_id, user_id, tipo, amount, desde, hasta, credits in _stream(conn, """
+            SELECT t.id, t.user_id, t.type, t.amount, r.user_from, r.user_to, r.credits
+            FROM transactions t
+            LEFT JOIN economy_resets r ON r.transaction_id = t.id
+            WHERE t.id > %s AND t.id <= %s
+            ORDER BY t.id
+        """, (ultimo, limite), fetch_size):
+            leidas += 1
+            if tipo == "reset" and user_id == 0:
+                if desde is None:
+                    logger.warning(f"⚠️ Fila de reset {tx_id} sin rango en economy_resets")
+                    continue
+                # Se aplica a cada usuario cuando vuelva a aparecer o al final
+                resets.add(tx_id, desde, hasta, credits)
+                continue
+
+            saldo = esperados.get(user_id)
+            valor = resets.base(user_id) if saldo is None else resets.rebase(user_id, saldo)
+            esperados[user_id] = (valor + amount, tx_id)
+
+        ultimo = limite
+        logger.info(f"📜 {leidas:,} transacciones leídas (id ≤ {ultimo:,} de {hasta_id:,}) "
+                    f"en {time.monotonic() - inicio:.0f}s")
+
+    return esperados, resets, leidas
+
+
+def reconcile(output: str, chunk_size: int = 100_000, fetch_size: int = 5_000, tolerance: int = 0) -> dict:
+    """Escribe en `output` (CSV) los usuarios cuyo balance no cuadra con su historial"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    # Cada consulta es su propia lectura consistente: sin bloqueos ni snapshots largos
+    conn.autocommit = True
+    try:
+        esperados, resets, transacciones = expected_balances(conn, chunk_size, fetch_size)
+
+        resumen = {"transacciones": transacciones, "usuarios": 0, "discrepancias": 0, "diferencia_total": 0}
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user_id", "credits", "esperado", "diferencia"])
+
+            ultimo = -1
+            while True:
+                filas = 0
+                for user_id, credits in _stream(conn, """
+                    SELECT user_id, credits FROM users
+                    WHERE user_id > %s
+                    ORDER BY user_id
+                    LIMIT %s
+                """, (ultimo, chunk_size), fetch_size):
+                    filas += 1
+                    ultimo = user_id
+                    saldo = esperados.pop(user_id, None)
+                    esperado = resets.base(user_id) if saldo is None else resets.rebase(user_id, saldo)
+                    diferencia = credits - esperado
+                    if abs(diferencia) > tolerance:
+                        writer.writerow([user_id, credits, esperado, diferencia])
+                        resumen["discrepancias"] += 1
+                        resumen["diferencia_total"] += diferencia
+                resumen["usuarios"] += filas
+                if filas < chunk_size:
+                    break
+
+            # Transacciones de usuarios que ya no existen en `users`
+            for user_id, saldo in sorted(esperados.items()):
+                writer.writerow([user_id, "", resets.rebase(user_id, saldo), ""])
+                resumen["discrepancias"] += 1
+
+        logger.info(
+            f"✅ Conciliación terminada: {resumen['usuarios']:,} usuarios, "
+            f"{resumen['transacciones']:,} transacciones, {resumen['discrepancias']:,} discrepancias "
+            f"(diferencia total {resumen['diferencia_total']:+,}) → {output}"
+        )
+        return resumen
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara users.credits con la suma de transactions")
+    parser.add_argument("--output", default="conciliacion.csv", help="archivo CSV del informe")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="ids por consulta")
+    parser.add_argument("--fetch-size", type=int, default=5_000, help="filas por lectura del cursor")
+    parser.add_argument("--tolerance", type=int, default=0, help="diferencia máxima que no se informa")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    reconcile(args.output, args.chunk_size, args.fetch_size, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
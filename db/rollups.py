@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+# Tipos de movimiento que no son actividad de juego
+_EXCLUIDOS = {"reset"}
+
+# Cuánto se guardan los usuarios de cada hora. El ledger puede escribir
+# filas con mucho retraso (reintentos mientras la base de datos no
+# responde); pasado este margen, un bloque tardío ya no suma sus usuarios
+_RETENCION_USUARIOS = timedelta(hours=24)
+
+
+def _hora(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+async def apply_rollups(cursor, rows: Iterable[tuple]):
+    """Suma un lote del ledger a los acumulados por (hora, game_type, type).
+
+    `rows` son filas del ledger: (user_id, type, amount, game_type, details,
+    created_at, wagered, paid). Se ejecuta con el cursor de la misma
+    transacción que inserta las filas en `transactions`, así que los
+    acumulados nunca cuentan una fila que no llegó a escribirse.
+    """
+    acumulados: Dict[Tuple[datetime, str, str], list] = {}
+    usuarios = set()
+    for user_id, tipo, _amount, game_type, _details, created_at, wagered, paid in rows:
+        if tipo in _EXCLUIDOS:
+            continue
+        clave = (_hora(created_at), game_type, tipo)
+        fila = acumulados.setdefault(clave, [0, 0, 0])
+        fila[0] += 1
+        fila[1] += wagered
+        fila[2] += paid
+        usuarios.add(clave + (user_id,))
+
+    if not acumulados:
+        return
+
+    await cursor.executemany("""
+        INSERT INTO game_rollups (hour, game_type, type, count, wagered, paid)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            count = count + VALUES(count),
+            wagered = wagered + VALUES(wagered),
+            paid = paid + VALUES(paid)
+    """, [clave + tuple(valores) for clave, valores in acumulados.items()])
+
+    # Usuarios distintos: se apunta cada usuario una vez por clave y se recuenta.
+    # El recuento nunca baja: si la hora ya se purgó, solo ve a los tardíos
+    await cursor.executemany("""
+        INSERT IGNORE INTO game_rollup_users (hour, game_type, type, user_id)
+        VALUES (%s, %s, %s, %s)
+    """, list(usuarios))
+
+    claves = list(acumulados)
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(claves))
+    await cursor.execute(f"""
+        UPDATE game_rollups AS r
+        SET distinct_users = GREATEST(distinct_users, (
+            SELECT COUNT(*) FROM game_rollup_users u
+            WHERE u.hour = r.hour AND u.game_type = r.game_type AND u.type = r.type
+        ))
+        WHERE (r.hour, r.game_type, r.type) IN ({placeholders})
+    """, tuple(valor for clave in claves for valor in clave))
+
+
+async def purge_rollup_users(cursor, now: datetime = None):
+    """Olvida los usuarios de las horas cerradas hace más de _RETENCION_USUARIOS"""
+    limite = _hora(now or datetime.now()) - _RETENCION_USUARIOS
+    await cursor.execute("DELETE FROM game_rollup_users WHERE hour < %s", (limite,))
@@ -0,0 +1,97 @@
+from collections import Counter
+from typing import NamedTuple
+
+# Sentencias que se ejecutan en cada apuesta. Se preparan una vez por
+# conexión y luego solo se envían los parámetros.
+HOT_STATEMENTS = {
+    "add_credits": "UPDATE users SET credits = LAST_INSERT_ID(credits + %s) WHERE user_id = %s",
+    "place_bet": "UPDATE users SET credits = LAST_INSERT_ID(credits - %s) WHERE user_id = %s AND credits >= %s",
+    # Créditos y estadísticas de la partida en el mismo UPDATE
+    "credits_win": "UPDATE users SET credits = LAST_INSERT_ID(credits + %s), games_won = games_won + 1, "
+                   "total_winnings = total_winnings + %s, games_played = games_played + 1 WHERE user_id = %s",
+    "credits_loss": "UPDATE users SET credits = LAST_INSERT_ID(credits + %s), games_played = games_played + 1 "
+                    "WHERE user_id = %s",
+    "move_credits": "UPDATE users SET credits = credits + %s, games_played = games_played + %s, "
+                    "games_won = games_won + %s, total_winnings = total_winnings + %s WHERE user_id = %s",
+    # Clave de idempotencia de una operación de créditos (índice único)
+    "claim_key": "INSERT INTO credit_operations (idempotency_key, user_id, balance) VALUES (%s, %s, %s)",
+    # Mano de blackjack con las cartas codificadas (un byte por carta)
+    "save_hand": "INSERT INTO blackjack_sessions (user_id, bet_amount, result, payout, player_cards, dealer_cards) "
+                 "VALUES (%s, %s, %s, %s, %s, %s)",
+}
+
+
+class StatementResult(NamedTuple):
+    """Lo que devuelve el servidor al ejecutar una sentencia sin resultados"""
+    rowcount: int
+    lastrowid: int
+
+
+class PreparedStatements:
+    """Sentencias preparadas en el servidor, por conexión del pool.
+
+    Cada conexión guarda el statement_id de cada sentencia y las ejecuciones
+    siguientes envían solo COM_STMT_EXECUTE con los parámetros: una ida y
+    vuelta, como una consulta de texto, pero sin que el servidor vuelva a
+    parsearla. No se pasa por `cursor(prepared=True)` porque ese cursor
+    manda además un COM_STMT_RESET (y espera su OK) antes de cada
+    ejecución, y aquí nunca se envían datos largos que haya que limpiar.
+    Las conexiones nuevas (por ejemplo tras una reconexión) empiezan sin
+    sentencias y preparan cada una la primera vez que la usan.
+    """
+
+    def __init__(self, statements: dict = None):
+        self.statements = statements or HOT_STATEMENTS
+        self.prepares = Counter()
+        self.executions = Counter()
+
+    async def execute(self, conn, name: str, params: tuple) -> StatementResult:
+        """Ejecuta la sentencia `name` en `conn` y devuelve filas afectadas e id"""
+        # El caché vive en la conexión: se va con ella cuando el pool la descarta
+        prepared = getattr(conn, "_casino_prepared", None)
+        if prepared is None:
+            prepared = conn._casino_prepared = {}
+
+        await conn.handle_unread_result()
+        statement = prepared.get(name)
+        if statement is None:
+            sql = self.statements[name].replace("%s", "?").encode()
+            statement = prepared[name] = await conn.cmd_stmt_prepare(sql)
+            self.prepares[name] += 1
+
+        self.executions[name] += 1
+        result = await conn.cmd_stmt_execute(
+            statement["statement_id"], data=params, parameters=statement["parameters"]
+        )
+        return StatementResult(result.get("affected_rows", 0), result.get("insert_id", 0))
+
+    def stats(self) -> dict:
+        """Por sentencia: (preparaciones, ejecuciones, reutilizaciones)"""
+        return {
+            name: (self.prepares[name], self.executions[name], self.executions[name] - self.prepares[name])
+            for name in self.statements
+            if self.executions[name]
+        }
+
+
+class CursorStatements(PreparedStatements):
+    """Las mismas sentencias ejecutadas con un cursor normal (SQLite).
+
+    sqlite3 guarda compiladas las últimas sentencias de cada conexión, así
+    que basta con enviar el texto: la primera ejecución en cada conexión
+    cuenta como preparación y las demás como reutilizaciones.
+    """
+
+    async def execute(self, conn, name: str, params: tuple) -> StatementResult:
+        """Ejecuta la sentencia `name` en `conn` y devuelve filas afectadas e id"""
+        usadas = getattr(conn, "_casino_prepared", None)
+        if usadas is None:
+            usadas = conn._casino_prepared = set()
+        if name not in usadas:
+            usadas.add(name)
+            self.prepares[name] += 1
+
+        self.executions[name] += 1
+        async with await conn.cursor() as cursor:
+            await cursor.execute(self.statements[name], params)
+            return StatementResult(cursor.rowcount, cursor.lastrowid)
@@ -1,5 +1,35 @@
+import ast
 import random
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
+
+SUITS = ["♠", "♥", "♦", "♣"]
+VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+
+# Cada carta se guarda como un byte: índice del valor * 4 + índice del palo
+_CARD_INDEX = {f"{value}{suit}": v * 4 + s for v, value in enumerate(VALUES) for s, suit in enumerate(SUITS)}
+_INDEX_CARD = {index: card for card, index in _CARD_INDEX.items()}
+
+# Tamaño de las columnas player_cards/dealer_cards. Con 6 barajas la mano
+# más larga posible son 21 ases y la carta que pasa de 21: 22 cartas
+MAX_HAND_CARDS = 32
+
+
+def encode_hand(hand: List[str]) -> bytes:
+    """Codifica una mano en un byte por carta (para guardarla en la base de datos)"""
+    if len(hand) > MAX_HAND_CARDS:
+        raise ValueError(f"Mano de {len(hand)} cartas: no cabe en {MAX_HAND_CARDS} bytes")
+    return bytes(_CARD_INDEX[card] for card in hand)
+
+
+def decode_hand(data: Optional[Union[bytes, str]]) -> List[str]:
+    """Decodifica una mano guardada con `encode_hand` (o con el formato antiguo de texto)"""
+    if not data:
+        return []
+    if isinstance(data, str):
+        # Partidas antiguas: repr de la lista de cartas
+        return list(ast.literal_eval(data))
+    return [_INDEX_CARD[index] for index in data]
+
 
 class BlackjackGame:
     def __init__(self, bet: int, user_id: int):
@@ -20,9 +50,7 @@ class BlackjackGame:
 
     def generate_deck(self) -> List[str]:
         """Genera un mazo de 6 barajas para mejor aleatoriedad"""
-        suits = ["♠", "♥", "♦", "♣"]
-        values = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-        deck = [f"{value}{suit}" for value in values for suit in suits] * 6
+        deck = [f"{value}{suit}" for value in VALUES for suit in SUITS] * 6
         random.shuffle(deck)
         return deck
 
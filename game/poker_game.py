@@ -3,12 +3,10 @@
 import random
 from typing import Dict, List, Optional, Tuple
 from game.poker_hands import PokerHandEvaluator
-from db.database import Database  # <--- IMPORTACIÓN DE TU CLASE
-
-db = Database() # <--- INSTANCIA DE TU BASE DE DATOS
 
 class PokerGame:
-    def __init__(self, game_id: str, creator_id: int, min_bet: int = 50):
+    def __init__(self, db, game_id: str, creator_id: int, min_bet: int = 50):
+        self.db = db  # Servicio de base de datos compartido (bot.db)
         self.game_id = game_id
         self.creator_id = creator_id
         self.min_bet = min_bet
@@ -35,12 +33,12 @@ class PokerGame:
         random.shuffle(deck)
         return deck
 
-    def add_player(self, user_id: int, user_name: str) -> bool:
+    async def add_player(self, user_id: int, user_name: str) -> bool:
         if len(self.players) >= 6 or user_id in self.players:
             return False
         
         # Usa la DB real para obtener los créditos
-        credits = db.get_credits(user_id)
+        credits = await self.db.get_credits(user_id)
         if credits < self.big_blind * 10:
             return False
             
@@ -50,14 +48,14 @@ class PokerGame:
         }
         return True
 
-    def start_game(self) -> bool:
+    async def start_game(self) -> bool:
         if len(self.players) < 2: return False
         self.game_started = True
         self.player_order = list(self.players.keys())
-        self.start_new_hand()
+        await self.start_new_hand()
         return True
 
-    def start_new_hand(self):
+    async def start_new_hand(self):
         # ... (código sin cambios, prepara la mano)
         self.deck = self.create_deck()
         self.community_cards = []
@@ -79,18 +77,18 @@ class PokerGame:
             player["bet_this_round"] = 0; player["has_acted"] = False
         
         self.dealer_pos = (self.dealer_pos + 1) % len(self.player_order)
-        self._post_blinds()
+        await self._post_blinds()
         self.game_phase = "preflop"
         self.current_player_idx = (self.dealer_pos + 3) % len(self.player_order) if len(self.player_order) > 2 else self.dealer_pos
         self.current_bet = self.big_blind
 
-    def _post_blinds(self):
+    async def _post_blinds(self):
         num_players = len(self.player_order)
         sb_pos = (self.dealer_pos + 1) % num_players
         bb_pos = (self.dealer_pos + 2) % num_players
         
-        self._make_bet(self.player_order[sb_pos], self.small_blind)
-        self._make_bet(self.player_order[bb_pos], self.big_blind)
+        await self._make_bet(self.player_order[sb_pos], self.small_blind)
+        await self._make_bet(self.player_order[bb_pos], self.big_blind)
 
     def get_next_player(self) -> Optional[int]:
         # ... (código sin cambios)
@@ -102,12 +100,12 @@ class PokerGame:
                 return player_id
         return None
 
-    def _make_bet(self, player_id: int, amount: int) -> bool:
+    async def _make_bet(self, player_id: int, amount: int) -> bool:
         player = self.players[player_id]
         bet_amount = min(amount, player["chips"])
         
         # Usa la DB real para actualizar créditos
-        success = db.update_credits(player_id, -bet_amount, "bet", "poker", f"Apuesta poker: {bet_amount}")
+        success = await self.db.update_credits(player_id, -bet_amount, "bet", "poker", f"Apuesta poker: {bet_amount}")
         if not success: return False
             
         player["chips"] -= bet_amount
@@ -123,7 +121,7 @@ class PokerGame:
                     p["has_acted"] = False
         return True
 
-    def player_action(self, player_id: int, action: str, amount: int = 0) -> bool:
+    async def player_action(self, player_id: int, action: str, amount: int = 0) -> bool:
         # ... (código sin cambios)
         if player_id != self.player_order[self.current_player_idx]: return False
         player = self.players[player_id]
@@ -132,12 +130,12 @@ class PokerGame:
         elif action == "check":
             if player["bet_this_round"] < self.current_bet: return False
         elif action == "call":
-            if not self._make_bet(player_id, self.current_bet - player["bet_this_round"]): return False
+            if not await self._make_bet(player_id, self.current_bet - player["bet_this_round"]): return False
         elif action == "raise":
             required_bet = self.current_bet - player["bet_this_round"]
             total_bet = required_bet + amount
             if amount < self.big_blind or total_bet > player['chips']: return False
-            if not self._make_bet(player_id, total_bet): return False
+            if not await self._make_bet(player_id, total_bet): return False
         
         player["has_acted"] = True
         return True
@@ -168,15 +166,15 @@ class PokerGame:
         if self.game_phase == "flop": self.community_cards.extend([self.deck.pop() for _ in range(3)])
         elif self.game_phase in ["turn", "river"]: self.community_cards.append(self.deck.pop())
 
-    def determine_winner(self) -> List[Tuple[int, int, str]]:
+    async def determine_winner(self) -> List[Tuple[int, int, str]]:
         active_players = [(pid, p) for pid, p in self.players.items() if pid in self.player_order and not p["folded"]]
         
         # GANA POR ABANDONO
         if len(active_players) == 1:
             winner_id = active_players[0][0]
             prize = self.pot
-            self.award_pot(winner_id, prize, "Ganador por abandono")
-            self.record_losses([p[0] for p in self.players.items() if p[0] != winner_id and p[0] in self.player_order])
+            await self.award_pot(winner_id, prize, "Ganador por abandono")
+            await self.record_losses([p[0] for p in self.players.items() if p[0] != winner_id and p[0] in self.player_order])
             return [(winner_id, prize, "Ganador por abandono")]
 
         # SHOWDOWN
@@ -191,24 +189,24 @@ class PokerGame:
         winner_ids = [w[0] for w in winners]
 
         for winner_id, rank in winners:
-            self.award_pot(winner_id, prize_per_winner, rank[2])
+            await self.award_pot(winner_id, prize_per_winner, rank[2])
             results.append((winner_id, prize_per_winner, rank[2]))
         
         loser_ids = [pid for pid in self.player_order if pid not in winner_ids]
-        self.record_losses(loser_ids)
+        await self.record_losses(loser_ids)
         
         self.pot = 0
         return results
 
-    def award_pot(self, player_id: int, amount: int, hand_name: str):
+    async def award_pot(self, player_id: int, amount: int, hand_name: str):
         # Usa la DB real con transaction_type='win'
-        db.update_credits(player_id, amount, "win", "poker", f"Gana con {hand_name}")
+        await self.db.update_credits(player_id, amount, "win", "poker", f"Gana con {hand_name}")
         if player_id in self.players: self.players[player_id]["chips"] += amount
 
-    def record_losses(self, loser_ids: List[int]):
+    async def record_losses(self, loser_ids: List[int]):
         # Registra la partida jugada para los perdedores
         for loser_id in loser_ids:
-            db.update_credits(loser_id, 0, "loss", "poker", "Participó en la mano")
+            await self.db.update_credits(loser_id, 0, "loss", "poker", "Participó en la mano")
             
     def get_game_state(self) -> dict:
         player_states = {}
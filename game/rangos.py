@@ -0,0 +1,19 @@
+from bisect import bisect_right
+from typing import Optional
+
+from config import RANGOS
+
+# (créditos mínimos, rango) de menor a mayor, para buscar con bisect
+_RANGOS_ORDENADOS = sorted((datos["min_creditos"], rango_id) for rango_id, datos in RANGOS.items())
+_UMBRALES = [minimo for minimo, _ in _RANGOS_ORDENADOS]
+
+
+def rango_para(creditos: int) -> int:
+    """Rango que corresponde a `creditos` según los umbrales de RANGOS"""
+    posicion = bisect_right(_UMBRALES, creditos)
+    return _RANGOS_ORDENADOS[posicion - 1][1] if posicion else 0
+
+
+def cruza_umbral(anterior: Optional[int], nuevo: int) -> bool:
+    """Si pasar de `anterior` a `nuevo` créditos cambia de rango (None = no se sabe)"""
+    return anterior is None or rango_para(anterior) != rango_para(nuevo)